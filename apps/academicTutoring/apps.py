@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class AcademicTutoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.academicTutoring'
+
+    def ready(self):
+        from django.db import transaction
+        from django.db.models.signals import post_save
+        from .models import SessionMaterial
+        from .material_extraction import enqueue_extraction
+
+        def _on_material_saved(sender, instance, created, **kwargs):
+            if created and instance.type == 'file':
+                # El worker extrae el texto en segundo plano
+                transaction.on_commit(lambda: enqueue_extraction(instance))
+
+        post_save.connect(
+            _on_material_saved,
+            sender=SessionMaterial,
+            dispatch_uid='academicTutoring.material_extraction',
+        )
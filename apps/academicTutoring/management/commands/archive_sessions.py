@@ -0,0 +1,23 @@
+"""
+Django management command para archivar sesiones completadas.
+
+Uso:
+    python manage.py archive_sessions
+
+Pensado para ejecutarse periódicamente (Railway Cron, p. ej. cada hora).
+Archiva en dos sentencias UPDATE las sesiones vencidas según
+PlatformConfig.session_archive_days y las que ya cumplen el checklist de
+comisión (video + simulacro aprobado + PDF).
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.academicTutoring.services import archive_sessions
+
+
+class Command(BaseCommand):
+    help = 'Archiva sesiones vencidas o con el checklist de comisión completo'
+
+    def handle(self, *args, **options):
+        archived = archive_sessions()
+        self.stdout.write(self.style.SUCCESS(f'{archived} sesiones archivadas.'))
@@ -0,0 +1,409 @@
+"""
+Django management command para generar datos sintéticos a escala de producción.
+
+Uso:
+    python manage.py generate_synthetic_data --tutors 200 --students 5000 --seed 7
+    python manage.py generate_synthetic_data --flush     # borra la corrida anterior
+
+Crea tutores, estudiantes, materias, sesiones, materiales, simuladores,
+preguntas, intentos, respuestas, perfiles de temas débiles y notificaciones
+con distribuciones realistas (tutores populares, historiales de largo
+alcance, aciertos según la habilidad del estudiante y la dificultad).
+
+- Determinista: misma --seed ⇒ mismos datos.
+- Inserta con bulk_create en lotes de --batch-size.
+- La contraseña se hashea una sola vez y se reutiliza para todos.
+
+Los usuarios sintéticos usan el dominio SYNTHETIC_EMAIL_DOMAIN; --flush los
+borra en cascada junto con todo lo que cuelga de ellos. Solo corre con
+DEBUG=True salvo que se pase --force.
+"""
+
+import random
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import (
+    User, TutorProfile, ClientProfile, Notification, Subject, KnowledgeArea,
+)
+from apps.academicTutoring.models import ClassSession, SessionMaterial
+from apps.simulators.models import (
+    Simulator, SimulatorQuestion, SimulatorAttempt, SimulatorResponse,
+    StudentWeakTopicProfile,
+)
+
+SYNTHETIC_EMAIL_DOMAIN = 'synthetic.edulatam.test'
+SYNTHETIC_PASSWORD = 'Sintetico-123'
+
+FALLBACK_SUBJECTS = {
+    'Matematicas': ['Algebra', 'Calculo', 'Estadistica', 'Trigonometria'],
+    'Ciencias Naturales': ['Fisica', 'Quimica', 'Biologia'],
+    'Programacion e Informatica': ['Python', 'Bases de Datos', 'Algoritmos'],
+    'Idiomas': ['Ingles', 'Frances'],
+    'Administracion y Contabilidad': ['Contabilidad', 'Finanzas'],
+}
+
+FIRST_NAMES = [
+    'Ana', 'Luis', 'María', 'José', 'Camila', 'Diego', 'Valeria', 'Andrés',
+    'Sofía', 'Mateo', 'Daniela', 'Carlos', 'Gabriela', 'Javier', 'Lucía', 'Pablo',
+]
+LAST_NAMES = [
+    'García', 'Rodríguez', 'Pérez', 'Torres', 'Zambrano', 'Vera', 'Mendoza',
+    'Castro', 'Herrera', 'Andrade', 'Morales', 'Cedeño', 'Paredes', 'Ortiz',
+]
+CITIES = ['Quito', 'Guayaquil', 'Cuenca', 'Manta', 'Loja', 'Ambato']
+
+# Reparto de la dificultad igual al contrato del generador IA (20/20/10)
+DIFFICULTY_WEIGHTS = (('low', 0.4), ('medium', 0.4), ('high', 0.2))
+DIFFICULTY_PENALTY = {'low': 0.15, 'medium': 0.0, 'high': -0.2}
+SIMULATOR_STATUS_WEIGHTS = (
+    ('approved', 0.6), ('pending_approval', 0.2),
+    ('published', 0.1), ('rejected', 0.1),
+)
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+
+class Command(BaseCommand):
+    help = 'Genera un conjunto de datos sintético y determinista para pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tutors', type=int, default=50)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--sessions-per-student', type=float, default=8.0,
+                            help='Promedio de sesiones por estudiante (distribución exponencial)')
+        parser.add_argument('--questions', type=int, default=20,
+                            help='Preguntas por simulador')
+        parser.add_argument('--notifications-per-user', type=int, default=15)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--flush', action='store_true',
+                            help='Solo borra los datos sintéticos existentes')
+        parser.add_argument('--force', action='store_true',
+                            help='Permite correr con DEBUG=False')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Solo para desarrollo: usa --force si DEBUG=False.')
+
+        if options['flush']:
+            deleted, _ = User.objects.filter(
+                email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}'
+            ).delete()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} filas sintéticas eliminadas.'))
+            return
+
+        if User.objects.filter(email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}').exists():
+            raise CommandError('Ya existen datos sintéticos: ejecuta primero con --flush.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.counts = {}
+
+        with transaction.atomic():
+            subjects = self._subjects()
+            tutors, students = self._users(options['tutors'], options['students'], subjects)
+            sessions = self._sessions(tutors, students, options['sessions_per_student'])
+            self._materials(sessions)
+            simulators = self._simulators(sessions)
+            questions = self._questions(simulators, options['questions'])
+            attempts = self._attempts(simulators, questions, students)
+            self._weak_topics(attempts)
+            self._notifications(tutors + students, options['notifications_per_user'])
+
+        summary = ', '.join(f'{n} {label}' for label, n in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Datos sintéticos creados: {summary}.'))
+
+    # ─── Helpers ──────────────────────────────────────────────
+
+    def _bulk(self, model, objs, label=None):
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if label:
+            self.counts[label] = self.counts.get(label, 0) + len(created)
+        return created
+
+    def _backdate(self, model, objs, fields):
+        """bulk_update no pasa por pre_save, así que respeta fechas pasadas en auto_now."""
+        model.objects.bulk_update(objs, fields, batch_size=self.batch_size)
+
+    def _past_datetime(self, max_days):
+        return self.now - timedelta(
+            days=self.rng.uniform(0, max_days), minutes=self.rng.randint(0, 1439)
+        )
+
+    # ─── Catálogo ─────────────────────────────────────────────
+
+    def _subjects(self):
+        if not Subject.objects.exists():
+            for area_name, names in FALLBACK_SUBJECTS.items():
+                area, _ = KnowledgeArea.objects.get_or_create(name=area_name)
+                for name in names:
+                    Subject.objects.get_or_create(name=name, defaults={'knowledge_area': area})
+            self.counts['materias'] = Subject.objects.count()
+        # Orden estable para que la semilla reproduzca las mismas elecciones
+        return list(Subject.objects.order_by('name'))
+
+    # ─── Usuarios ─────────────────────────────────────────────
+
+    def _users(self, n_tutors, n_students, subjects):
+        rng = self.rng
+        password = make_password(SYNTHETIC_PASSWORD)
+
+        def build(user_type, i):
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            prefix = 'tutor' if user_type == 'tutor' else 'estudiante'
+            return User(
+                email=f'{prefix}{i}@{SYNTHETIC_EMAIL_DOMAIN}',
+                username=f'synth-{prefix}{i}',
+                name=name, user_type=user_type, password=password,
+                country_code='EC',
+            )
+
+        tutors = self._bulk(User, [build('tutor', i) for i in range(n_tutors)], 'tutores')
+        students = self._bulk(User, [build('client', i) for i in range(n_students)], 'estudiantes')
+
+        self._bulk(TutorProfile, [
+            TutorProfile(
+                user=tutor, city=rng.choice(CITIES), country='Ecuador',
+                hourly_rate=Decimal(rng.randrange(8, 40)),
+                is_approved=True, welcome_shown=True,
+            )
+            for tutor in tutors
+        ])
+        self._bulk(ClientProfile, [
+            ClientProfile(
+                user=student, city=rng.choice(CITIES), country='Ecuador',
+                student_type=rng.choice(['universitario', 'autodidacta']),
+            )
+            for student in students
+        ])
+
+        # Cada tutor enseña 1-4 materias
+        profiles = TutorProfile.objects.filter(user__in=tutors).order_by('user_id')
+        through = TutorProfile.subjects_taught.through
+        links = []
+        self.tutor_subjects = {}
+        for profile in profiles:
+            taught = rng.sample(subjects, k=min(len(subjects), rng.randint(1, 4)))
+            self.tutor_subjects[profile.user_id] = [s.name for s in taught]
+            links.extend(through(tutorprofile_id=profile.pk, subject_id=s.pk) for s in taught)
+        self._bulk(through, links)
+
+        # Popularidad con cola larga: pocos tutores concentran muchas sesiones
+        self.tutor_weights = [rng.paretovariate(1.2) for _ in tutors]
+        # Habilidad latente de cada estudiante (probabilidad base de acierto)
+        self.ability = {s.pk: min(0.95, max(0.15, rng.gauss(0.62, 0.15))) for s in students}
+        return tutors, students
+
+    # ─── Sesiones y materiales ────────────────────────────────
+
+    def _sessions(self, tutors, students, mean_sessions):
+        rng = self.rng
+        today = self.now.date()
+        sessions = []
+        for student in students:
+            count = min(60, int(rng.expovariate(1 / mean_sessions)) + 1)
+            for tutor in rng.choices(tutors, weights=self.tutor_weights, k=count):
+                offset = rng.randint(-365, 30)
+                if offset < 0:
+                    status = _weighted(rng, (('completed', 0.8), ('cancelled', 0.15), ('pending', 0.05)))
+                else:
+                    status = _weighted(rng, (('confirmed', 0.6), ('pending', 0.35), ('cancelled', 0.05)))
+                completed = status == 'completed'
+                sessions.append(ClassSession(
+                    tutor=tutor, client=student,
+                    subject=rng.choice(self.tutor_subjects[tutor.pk]),
+                    scheduled_date=today + timedelta(days=offset),
+                    scheduled_time=time(rng.randint(7, 21), rng.choice((0, 30))),
+                    duration=rng.choice((60, 60, 90, 120)),
+                    status=status,
+                    recording_url=(
+                        f'https://videos.example.com/{rng.getrandbits(48):x}'
+                        if completed and rng.random() < 0.7 else None
+                    ),
+                    student_rating=rng.randint(3, 5) if completed and rng.random() < 0.5 else None,
+                    is_archived=completed and offset < -60 and rng.random() < 0.8,
+                ))
+        sessions = self._bulk(ClassSession, sessions, 'sesiones')
+
+        # updated_at refleja la última actividad (≈ fecha de la sesión)
+        for s in sessions:
+            s.updated_at = timezone.make_aware(
+                datetime.combine(min(s.scheduled_date, today), s.scheduled_time)
+            )
+            if s.is_archived:
+                s.archived_at = s.updated_at + timedelta(days=30)
+        self._backdate(ClassSession, sessions, ['updated_at', 'archived_at'])
+        return sessions
+
+    def _materials(self, sessions):
+        rng = self.rng
+        materials = []
+        for s in sessions:
+            for _ in range(rng.choice((0, 1, 1, 2, 3))):
+                if rng.random() < 0.6:
+                    name = f'{s.subject.lower()}-{rng.getrandbits(32):x}.pdf'
+                    materials.append(SessionMaterial(
+                        session=s, type='file', file=f'sessions/materials/{name}',
+                        filename=name, uploaded_by_id=s.client_id,
+                    ))
+                else:
+                    materials.append(SessionMaterial(
+                        session=s, type='url', uploaded_by_id=s.client_id,
+                        url=f'https://docs.example.com/{rng.getrandbits(40):x}',
+                    ))
+        self._bulk(SessionMaterial, materials, 'materiales')
+
+    # ─── Simuladores ──────────────────────────────────────────
+
+    def _simulators(self, sessions):
+        rng = self.rng
+        simulators = [
+            Simulator(
+                session=s, tutor_id=s.tutor_id, student_id=s.client_id,
+                simulator_type=rng.choice(('diagnostic', 'diagnostic', 'reinforcement')),
+                status=_weighted(rng, SIMULATOR_STATUS_WEIGHTS),
+                generation_status='done',
+                title=f'Diagnóstico — {s.subject}', subject=s.subject,
+                tutor_reviewed_at=self.now,
+            )
+            for s in sessions
+            if s.status == 'completed' and rng.random() < 0.7
+        ]
+        return self._bulk(Simulator, simulators, 'simuladores')
+
+    def _questions(self, simulators, per_simulator):
+        rng = self.rng
+        questions = []
+        for sim in simulators:
+            topics = [f'{sim.subject.lower()} — tema {n}' for n in range(1, rng.randint(3, 6) + 1)]
+            for order in range(1, per_simulator + 1):
+                questions.append(SimulatorQuestion(
+                    simulator=sim, order=order,
+                    topic_tag=rng.choice(topics),
+                    difficulty=_weighted(rng, DIFFICULTY_WEIGHTS),
+                    statement=f'Pregunta {order} de {sim.subject}: ¿cuál es la opción correcta?',
+                    option_a='Opción A', option_b='Opción B',
+                    option_c='Opción C', option_d='Opción D',
+                    correct_option=rng.choice('ABCD'),
+                    explanation='Explicación generada para pruebas de carga.',
+                ))
+        questions = self._bulk(SimulatorQuestion, questions, 'preguntas')
+
+        by_simulator = defaultdict(list)
+        for q in questions:
+            by_simulator[q.simulator_id].append(q)
+        return by_simulator
+
+    def _attempts(self, simulators, questions, students):
+        rng = self.rng
+        attempts = []
+        plans = []
+        for sim in simulators:
+            if sim.status not in ('approved', 'published'):
+                continue
+            for number in range(1, rng.choice((0, 1, 1, 2, 3)) + 1):
+                attempts.append(SimulatorAttempt(
+                    simulator=sim, student_id=sim.student_id,
+                    attempt_number=number, status='completed',
+                ))
+                plans.append((sim, self._past_datetime(300)))
+        attempts = self._bulk(SimulatorAttempt, attempts, 'intentos')
+
+        responses = []
+        for attempt, (sim, started) in zip(attempts, plans):
+            attempt.started_at = started
+            # Cada reintento mejora un poco
+            base = self.ability[sim.student_id] + 0.05 * (attempt.attempt_number - 1)
+            topic_stats = defaultdict(lambda: {'correct': 0, 'total': 0})
+            correct = incorrect = unanswered = total_time = 0
+            for q in questions[sim.pk]:
+                spent = int(rng.lognormvariate(3.4, 0.5))
+                total_time += spent
+                if rng.random() < 0.03:
+                    selected, is_correct = None, False
+                    unanswered += 1
+                else:
+                    is_correct = rng.random() < base + DIFFICULTY_PENALTY[q.difficulty]
+                    selected = q.correct_option if is_correct else rng.choice(
+                        [o for o in 'ABCD' if o != q.correct_option]
+                    )
+                    correct += is_correct
+                    incorrect += not is_correct
+                topic_stats[q.topic_tag]['total'] += 1
+                topic_stats[q.topic_tag]['correct'] += is_correct
+                responses.append(SimulatorResponse(
+                    attempt=attempt, question=q, selected_option=selected,
+                    is_correct=is_correct, time_spent_seconds=spent,
+                ))
+            total = correct + incorrect + unanswered
+            attempt.correct_count = correct
+            attempt.incorrect_count = incorrect
+            attempt.unanswered_count = unanswered
+            attempt.score = round(correct / total * 100, 2) if total else 0
+            attempt.total_time_seconds = total_time
+            attempt.finished_at = attempt.started_at + timedelta(seconds=total_time)
+            attempt.performance_by_topic = {
+                topic: {**stats, 'pct': round(stats['correct'] / stats['total'] * 100, 1)}
+                for topic, stats in topic_stats.items()
+            }
+        self._bulk(SimulatorResponse, responses, 'respuestas')
+        self._backdate(SimulatorAttempt, attempts, [
+            'started_at', 'finished_at', 'score', 'correct_count', 'incorrect_count',
+            'unanswered_count', 'total_time_seconds', 'performance_by_topic',
+        ])
+        return attempts
+
+    def _weak_topics(self, attempts):
+        totals = defaultdict(lambda: [0, 0, 0])  # vistas, correctas, fallos consecutivos
+        for attempt in sorted(attempts, key=lambda a: a.started_at):
+            subject = attempt.simulator.subject
+            for topic, stats in attempt.performance_by_topic.items():
+                entry = totals[(attempt.student_id, subject, topic)]
+                entry[0] += stats['total']
+                entry[1] += stats['correct']
+                entry[2] = entry[2] + 1 if stats['pct'] < 60 else 0
+        self._bulk(StudentWeakTopicProfile, [
+            StudentWeakTopicProfile(
+                student_id=student_id, subject=subject, topic_tag=topic,
+                total_questions_seen=seen, total_correct=correct,
+                cumulative_score_pct=round(correct / seen * 100, 2) if seen else 0,
+                consecutive_failures=failures,
+            )
+            for (student_id, subject, topic), (seen, correct, failures) in totals.items()
+        ], 'temas débiles')
+
+    # ─── Notificaciones ───────────────────────────────────────
+
+    def _notifications(self, users, per_user):
+        rng = self.rng
+        messages = [
+            'Tu sesión fue confirmada.', 'Nuevo simulacro disponible.',
+            'La grabación de tu clase ya está disponible.',
+            'Tienes una nueva solicitud de sesión.', 'Tu simulacro fue aprobado.',
+        ]
+        notifications = []
+        for user in users:
+            for _ in range(rng.randint(0, per_user * 2)):
+                created = self._past_datetime(90)
+                is_read = rng.random() < 0.7
+                notifications.append(Notification(
+                    recipient=user, message=rng.choice(messages), is_read=is_read,
+                    read_at=created + timedelta(hours=rng.randint(1, 48)) if is_read else None,
+                ))
+                notifications[-1]._synthetic_created = created
+        notifications = self._bulk(Notification, notifications, 'notificaciones')
+        for n in notifications:
+            n.created_at = n._synthetic_created
+        self._backdate(Notification, notifications, ['created_at'])
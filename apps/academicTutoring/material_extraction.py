@@ -0,0 +1,278 @@
+"""
+Extracción de texto de los materiales de sesión (PDF, DOCX, TXT).
+
+- enqueue_extraction()      → registra la extracción pendiente (al subir)
+- claim_next_extraction()   → el worker toma la siguiente pendiente
+- run_extraction()          → descarga, extrae, normaliza y guarda el texto
+- ensure_extracted()        → extracción inmediata si aún no está lista
+- material_text()           → texto listo de un material (o '')
+
+El archivo se lee del storage (S3 en producción) en bloques hacia un
+archivo temporal mientras se calcula su sha256; si ya existe una extracción
+con el mismo hash se reutiliza su texto. El parseo (CPU, material_parsing)
+corre en un pool de procesos 'spawn', un archivo por tarea
+(MATERIAL_EXTRACTION_PROCESSES; 0 = en el mismo proceso). Un archivo que
+pasa de MATERIAL_EXTRACTION_TIMEOUT termina sus procesos y el pool se
+recrea. Lo ejecuta el worker de `run_generation_worker`.
+
+pypdf y python-docx son opcionales: sin ellos la extracción queda como
+'unsupported' y el prompt solo menciona el archivo adjunto.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .material_parsing import extract_file, normalize_text
+from .models import MaterialExtraction
+
+logger = logging.getLogger(__name__)
+
+Extraction = MaterialExtraction
+
+EXTRACTORS = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.txt': 'text',
+    '.md': 'text',
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ─────────────────────────────────────────────────────────────
+# Pool de procesos para el parseo
+# ─────────────────────────────────────────────────────────────
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn': el worker es multihilo y fork copiaría sus locks tomados
+            _pool = ProcessPoolExecutor(
+                max_workers=_setting('MATERIAL_EXTRACTION_PROCESSES', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _recycle_pool(pool):
+    """
+    Descarta un pool con un parseo colgado: .result(timeout) no detiene al
+    proceso hijo, así que se terminan sus procesos y el siguiente parseo
+    crea un pool nuevo. Las demás tareas de ese pool fallan (BrokenProcessPool)
+    y sus extracciones quedan 'failed'.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse(path, kind):
+    args = (
+        path, kind,
+        _setting('MATERIAL_EXTRACTION_MAX_PAGES', 100),
+        _setting('MATERIAL_EXTRACTION_MAX_CHARS', 200000),
+    )
+    if _setting('MATERIAL_EXTRACTION_PROCESSES', 2) <= 0:
+        return extract_file(*args)
+    pool = _get_pool()
+    future = pool.submit(extract_file, *args)
+    try:
+        return future.result(timeout=_setting('MATERIAL_EXTRACTION_TIMEOUT', 120))
+    except FutureTimeout:
+        logger.warning('Material parse timed out (%s); recycling the process pool', path)
+        _recycle_pool(pool)
+        raise
+
+
+# ─────────────────────────────────────────────────────────────
+# Cola
+# ─────────────────────────────────────────────────────────────
+
+def extraction_kind(material):
+    if material.type != 'file' or not material.file:
+        return None
+    ext = os.path.splitext(material.file.name)[1].lower()
+    return EXTRACTORS.get(ext)
+
+
+def enqueue_extraction(material):
+    """
+    Registra la extracción de un material de tipo archivo.
+
+    Returns:
+        tuple: (success, extraction, error_message)
+    """
+    if material.type != 'file' or not material.file:
+        return False, None, 'El material no es un archivo.'
+    status = Extraction.Status.PENDING if extraction_kind(material) else Extraction.Status.UNSUPPORTED
+    extraction, created = Extraction.objects.get_or_create(
+        material=material, defaults={'status': status}
+    )
+    if not created:
+        return False, extraction, 'La extracción ya estaba registrada.'
+    return True, extraction, None
+
+
+def _claimable():
+    """Pendientes, o 'running' abandonadas por un worker caído."""
+    stale = timezone.now() - timedelta(
+        seconds=_setting('SIMULATOR_JOB_STALE_SECONDS', 600)
+    )
+    return Q(status=Extraction.Status.PENDING) | Q(
+        status=Extraction.Status.RUNNING, updated_at__lt=stale
+    )
+
+
+def _claim(pk):
+    """UPDATE condicional: True si esta llamada se quedó con la extracción."""
+    return bool(Extraction.objects.filter(_claimable(), pk=pk).update(
+        status=Extraction.Status.RUNNING, updated_at=timezone.now()
+    ))
+
+
+def claim_next_extraction():
+    """
+    Toma la extracción pendiente más antigua (o una 'running' abandonada
+    por un worker caído). UPDATE condicional: seguro con varios workers.
+    """
+    candidates = Extraction.objects.filter(_claimable()).order_by(
+        'created_at'
+    ).values_list('pk', flat=True)[:5]
+
+    for pk in candidates:
+        if _claim(pk):
+            return Extraction.objects.select_related('material').get(pk=pk)
+    return None
+
+
+# ─────────────────────────────────────────────────────────────
+# Extracción
+# ─────────────────────────────────────────────────────────────
+
+def _download(material, target):
+    """Copia el archivo del storage en bloques; devuelve su sha256."""
+    digest = hashlib.sha256()
+    material.file.open('rb')
+    try:
+        for chunk in material.file.chunks():
+            digest.update(chunk)
+            target.write(chunk)
+    finally:
+        material.file.close()
+    target.flush()
+    return digest.hexdigest()
+
+
+def run_extraction(extraction):
+    """Extrae y guarda el texto de un material. Devuelve la extracción."""
+    material = extraction.material
+    kind = extraction_kind(material)
+    fields = ['status', 'text', 'content_hash', 'page_count', 'char_count',
+              'error', 'extracted_at', 'updated_at']
+    extraction.extracted_at = timezone.now()
+
+    if kind is None:
+        extraction.status = Extraction.Status.UNSUPPORTED
+        extraction.save(update_fields=fields)
+        return extraction
+
+    suffix = os.path.splitext(material.file.name)[1].lower()
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        with tmp:
+            extraction.content_hash = _download(material, tmp)
+
+        previous = Extraction.objects.filter(
+            content_hash=extraction.content_hash, status=Extraction.Status.DONE
+        ).exclude(pk=extraction.pk).only('text', 'page_count').first()
+        if previous is not None:
+            blocks, page_count = [previous.text], previous.page_count
+        else:
+            blocks, page_count = _parse(tmp.name, kind)
+    except ImportError as e:
+        extraction.status = Extraction.Status.UNSUPPORTED
+        extraction.error = f'Dependencia no instalada: {e.name}'[:255]
+        extraction.save(update_fields=fields)
+        return extraction
+    except Exception as e:
+        logger.warning('Material %s extraction failed: %s', material.pk, e)
+        extraction.status = Extraction.Status.FAILED
+        extraction.error = str(e)[:255]
+        extraction.save(update_fields=fields)
+        return extraction
+    finally:
+        os.unlink(tmp.name)
+
+    extraction.text = normalize_text(
+        '\n\n'.join(blocks), _setting('MATERIAL_EXTRACTION_MAX_CHARS', 200000)
+    )
+    extraction.page_count = page_count
+    extraction.char_count = len(extraction.text)
+    extraction.status = Extraction.Status.DONE
+    extraction.error = ''
+    extraction.save(update_fields=fields)
+    logger.info('Material %s extracted: %s chars, %s pages',
+                material.pk, extraction.char_count, page_count)
+    return extraction
+
+
+def ensure_extracted(material):
+    """
+    Garantiza que un material de tipo archivo tenga su texto extraído
+    (para cuando la generación llega antes que el worker).
+
+    Solo se extrae aquí si se gana la extracción con el mismo UPDATE
+    condicional que claim_next_extraction(). Si otro worker la tiene, se
+    espera a que termine (hasta MATERIAL_EXTRACTION_TIMEOUT); si no
+    termina, la generación sigue sin ese texto.
+    """
+    if material.type != 'file' or not material.file:
+        return None
+    try:
+        extraction = material.extraction
+    except Extraction.DoesNotExist:
+        _, extraction, _ = enqueue_extraction(material)
+    active = (Extraction.Status.PENDING, Extraction.Status.RUNNING)
+    if extraction.status in active:
+        if _claim(extraction.pk):
+            extraction.material = material
+            run_extraction(extraction)
+        else:
+            deadline = time.monotonic() + _setting('MATERIAL_EXTRACTION_TIMEOUT', 120)
+            extraction.refresh_from_db()
+            while extraction.status in active and time.monotonic() < deadline:
+                time.sleep(1)
+                extraction.refresh_from_db()
+    material.extraction = extraction
+    return extraction
+
+
+def material_text(material):
+    """Texto extraído y listo de un material, o '' si no hay."""
+    try:
+        extraction = material.extraction
+    except Extraction.DoesNotExist:
+        return ''
+    if extraction.status != Extraction.Status.DONE:
+        return ''
+    return extraction.text
@@ -0,0 +1,65 @@
+"""
+Parseo de archivos de materiales (PDF, DOCX, TXT) a texto.
+
+- extract_file()    → bloques de texto por página/párrafo y número de páginas
+- normalize_text()  → une palabras cortadas por guion y colapsa espacios
+
+Corre en los procesos de material_extraction (contexto 'spawn'): este
+módulo no importa Django, así que un proceso hijo lo carga sin settings.
+"""
+import re
+import unicodedata
+
+
+def _extract_pdf(path, max_pages, max_chars):
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages, total = [], 0
+    for page in reader.pages[:max_pages]:
+        text = page.extract_text() or ''
+        pages.append(text)
+        total += len(text)
+        if total >= max_chars:
+            break
+    return pages, len(reader.pages)
+
+
+def _extract_docx(path, max_pages, max_chars):
+    from docx import Document
+
+    document = Document(path)
+    blocks, total = [], 0
+    for paragraph in document.paragraphs:
+        blocks.append(paragraph.text)
+        total += len(paragraph.text)
+        if total >= max_chars:
+            return blocks, 0
+    for table in document.tables:
+        for row in table.rows:
+            blocks.append(' | '.join(cell.text for cell in row.cells))
+    return blocks, 0
+
+
+def _extract_text_file(path, max_pages, max_chars):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return [f.read(max_chars)], 0
+
+
+def extract_file(path, kind, max_pages, max_chars):
+    """Devuelve (bloques de texto por página/párrafo, número de páginas)."""
+    extractor = {
+        'pdf': _extract_pdf,
+        'docx': _extract_docx,
+        'text': _extract_text_file,
+    }[kind]
+    return extractor(path, max_pages, max_chars)
+
+
+def normalize_text(text, max_chars=None):
+    """Une palabras cortadas por guion, colapsa espacios y líneas vacías."""
+    text = unicodedata.normalize('NFC', text.replace('\x00', ''))
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    text = re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+    return text[:max_chars] if max_chars else text
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [('academicTutoring', '0021_platformconfig_min_pdf_ratio')]
+    operations = [
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(fields=['tutor', 'status', 'scheduled_date'], name='session_tutor_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(fields=['client', 'status', 'scheduled_date'], name='session_client_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(
+                fields=['status', 'updated_at'],
+                condition=models.Q(is_archived=False),
+                name='session_unarchived_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='sessionmaterial',
+            index=models.Index(fields=['session', 'type'], name='material_session_type_idx'),
+        ),
+    ]
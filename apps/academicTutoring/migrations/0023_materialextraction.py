@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academicTutoring', '0022_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialExtraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Lista'), ('failed', 'Fallida'), ('unsupported', 'Formato no soportado')], default='pending', max_length=12, verbose_name='Estado')),
+                ('text', models.TextField(blank=True, default='', verbose_name='Texto normalizado')),
+                ('content_hash', models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Hash del archivo (sha256)')),
+                ('page_count', models.PositiveIntegerField(default=0, verbose_name='Páginas')),
+                ('char_count', models.PositiveIntegerField(default=0, verbose_name='Caracteres')),
+                ('error', models.CharField(blank=True, default='', max_length=255, verbose_name='Error')),
+                ('extracted_at', models.DateTimeField(blank=True, null=True, verbose_name='Extraído el')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='extraction', to='academicTutoring.sessionmaterial', verbose_name='Material')),
+            ],
+            options={
+                'verbose_name': 'Extracción de material',
+                'verbose_name_plural': 'Extracciones de material',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='extraction_pending_idx')],
+            },
+        ),
+    ]
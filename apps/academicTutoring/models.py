@@ -2,7 +2,7 @@ from datetime import timedelta
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef, Subquery
 import uuid
  
 # Importar GIS models solo si está disponible en settings
@@ -241,6 +241,49 @@ class ClassSessionManager(models.Manager):
             
         return qs.order_by('scheduled_date', 'scheduled_time')
 
+    def commission_flags(self):
+        """
+        Subconsultas EXISTS correlacionadas con la sesión externa (OuterRef('pk')).
+
+        Returns:
+            dict: nombre del flag → Exists(...), listo para annotate() o filter()
+        """
+        from apps.simulators.models import Simulator
+
+        simulators = Simulator.objects.filter(session=OuterRef('pk'))
+        return {
+            'pending_sim': Exists(simulators.filter(status='pending_approval')),
+            'approved_sim': Exists(simulators.filter(status='approved')),
+            'has_any_sim': Exists(simulators),
+            'sim_generating': Exists(simulators.filter(generation_status='generating')),
+            'has_pdf': Exists(SessionMaterial.objects.filter(
+                session=OuterRef('pk'), file__iendswith='.pdf'
+            )),
+        }
+
+    def get_tutor_history(self, tutor, status):
+        """
+        Sesiones no archivadas del tutor para el historial, con los flags
+        de simulacro y PDF anotados en SQL (sin consultas por sesión).
+        """
+        from apps.simulators.models import SimulatorGenerationJob
+
+        flags = self.commission_flags()
+        # Trabajo de generación en cola o en proceso, para mostrar el progreso
+        active_job = SimulatorGenerationJob.objects.filter(
+            session=OuterRef('pk'),
+            status__in=SimulatorGenerationJob.ACTIVE_STATUSES
+        ).order_by('-created_at').values('pk')[:1]
+        return self.get_queryset().filter(
+            tutor=tutor,
+            status=status,
+            is_archived=False
+        ).select_related('client').prefetch_related(
+            'materials'
+        ).annotate(
+            generation_job_id=Subquery(active_job), **flags
+        ).order_by('-scheduled_date')
+
 
 class ClassSession(models.Model):
     """Model for class sessions between tutors and clients"""
@@ -422,6 +465,17 @@ class ClassSession(models.Model):
         ordering = ['-scheduled_date', '-scheduled_time']
         verbose_name = 'Sesión de Clase'
         verbose_name_plural = 'Sesiones de Clase'
+        indexes = [
+            # Dashboards e historial: sesiones del tutor/cliente por estado y fecha
+            models.Index(fields=['tutor', 'status', 'scheduled_date'], name='session_tutor_status_date_idx'),
+            models.Index(fields=['client', 'status', 'scheduled_date'], name='session_client_status_date_idx'),
+            # Archivado periódico: solo interesan las sesiones aún no archivadas
+            models.Index(
+                fields=['status', 'updated_at'],
+                condition=models.Q(is_archived=False),
+                name='session_unarchived_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.subject} - {self.tutor.name} con {self.client.name} ({self.get_status_display()})"
@@ -811,6 +865,69 @@ class SessionMaterial(models.Model):
         verbose_name = 'Material de Sesión'
         verbose_name_plural = 'Materiales de Sesión'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['session', 'type'], name='material_session_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_type_display()} — {self.session}"
+
+
+class MaterialExtraction(models.Model):
+    """
+    Texto extraído de un SessionMaterial de tipo archivo (PDF, DOCX, TXT).
+
+    Se llena en segundo plano al subir el archivo (ver
+    apps/academicTutoring/material_extraction.py) para que la generación
+    de simuladores lea el texto listo. content_hash permite reutilizar la
+    extracción cuando el mismo archivo se sube a otra sesión.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pendiente'
+        RUNNING = 'running', 'En proceso'
+        DONE = 'done', 'Lista'
+        FAILED = 'failed', 'Fallida'
+        UNSUPPORTED = 'unsupported', 'Formato no soportado'
+
+    material = models.OneToOneField(
+        SessionMaterial,
+        on_delete=models.CASCADE,
+        related_name='extraction',
+        verbose_name='Material'
+    )
+    status = models.CharField(
+        max_length=12,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Estado'
+    )
+    text = models.TextField(blank=True, default='', verbose_name='Texto normalizado')
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        verbose_name='Hash del archivo (sha256)'
+    )
+    page_count = models.PositiveIntegerField(default=0, verbose_name='Páginas')
+    char_count = models.PositiveIntegerField(default=0, verbose_name='Caracteres')
+    error = models.CharField(max_length=255, blank=True, default='', verbose_name='Error')
+    extracted_at = models.DateTimeField(null=True, blank=True, verbose_name='Extraído el')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Extracción de material'
+        verbose_name_plural = 'Extracciones de material'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='pending'),
+                name='extraction_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Extracción {self.get_status_display()} — {self.material}"
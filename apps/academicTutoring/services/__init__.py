@@ -3,9 +3,12 @@ Service functions for academicTutoring app.
 Handles business logic for session management and tutoring operations.
 """
 
+from datetime import timedelta
+
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from ..models import ClassSession
+from django.utils import timezone
+from ..models import ClassSession, PlatformConfig
 
 
 def save_expansion_notification(form, request):
@@ -98,10 +101,50 @@ def start_meeting(session, user):
         return False, None, str(e)
 
 
+def archive_sessions(tutor=None):
+    """
+    Archiva sesiones en dos sentencias UPDATE, sin iterar en Python:
+
+    1. Completadas o canceladas sin cambios en `session_archive_days` días.
+    2. Completadas que ya cumplen las 3 condiciones de comisión: video,
+       simulacro aprobado y al menos un PDF (WHERE EXISTS ... AND EXISTS ...).
+
+    Pensada para correr como tarea periódica (`manage.py archive_sessions`).
+
+    Args:
+        tutor: limitar a las sesiones de un tutor (None = todas)
+
+    Returns:
+        int: número de sesiones archivadas
+    """
+    config = PlatformConfig.get_config()
+    now = timezone.now()
+    archive_cutoff = now - timedelta(days=config.session_archive_days)
+
+    qs = ClassSession.objects.filter(is_archived=False)
+    if tutor is not None:
+        qs = qs.filter(tutor=tutor)
+
+    stale = qs.filter(
+        status__in=['completed', 'cancelled'],
+        updated_at__lt=archive_cutoff
+    ).update(is_archived=True, archived_at=now)
+
+    flags = ClassSession.objects.commission_flags()
+    fulfilled = qs.filter(
+        flags['approved_sim'],
+        flags['has_pdf'],
+        status='completed',
+        recording_url__isnull=False,
+    ).exclude(recording_url='').update(is_archived=True, archived_at=now)
+
+    return stale + fulfilled
+
+
 # Backwards compatibility: keep SessionService class for existing code
 from .services import SessionService
 
 __all__ = [
     'SessionError', 'create_session', 'confirm_session', 
-    'cancel_session', 'start_meeting', 'SessionService'
+    'cancel_session', 'start_meeting', 'archive_sessions', 'SessionService'
 ]
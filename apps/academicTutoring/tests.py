@@ -2,11 +2,17 @@
 Comprehensive test suite for core app
 Tests class booking, meeting integration, geographical search, and session workflow
 """
-from django.test import TestCase, Client
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from datetime import date, time, timedelta
-from apps.academicTutoring.models import ClassSession, TutorLead
+from apps.academicTutoring import material_extraction
+from apps.academicTutoring.models import ClassSession, MaterialExtraction, SessionMaterial, TutorLead
 from apps.academicTutoring.forms import SessionRequestForm, SessionConfirmationForm, TutorLeadForm
 from apps.academicTutoring.services.meeting_service import (
     generate_google_meet_url,
@@ -15,7 +21,8 @@ from apps.academicTutoring.services.meeting_service import (
     create_meeting_for_session,
     update_session_with_meeting
 )
-from apps.accounts.test_utils import UserFactory
+from apps.accounts.test_utils import UserFactory, QueryBudgetTestMixin
+from apps.simulators.ai_generator import build_user_prompt
 
 
 class ClassSessionModelTest(TestCase):
@@ -607,3 +614,375 @@ class LandingPageTest(TestCase):
         response = client.get(reverse('landing'))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'core/landing.html')
+
+
+class SessionArchivalTest(TestCase):
+    """Test set-based archival and the annotated tutor history"""
+
+    def setUp(self):
+        from apps.academicTutoring.models import SessionMaterial
+        from apps.simulators.models import Simulator
+
+        self.tutor = UserFactory.create_tutor(email='tutor@test.com')
+        self.student = UserFactory.create_client(email='student@test.com')
+        self.sessions = []
+        for i in range(3):
+            session = ClassSession.objects.create(
+                tutor=self.tutor,
+                client=self.student,
+                subject=f'Materia {i}',
+                scheduled_date=date.today() - timedelta(days=1),
+                scheduled_time=time(10, 0),
+                status='completed',
+                recording_url='https://video.test/clase' if i < 2 else None,
+            )
+            SessionMaterial.objects.create(
+                session=session, type='file', file=f'sessions/materials/m{i}.pdf'
+            )
+            Simulator.objects.create(
+                session=session, tutor=self.tutor, student=self.student,
+                title='Sim', subject=session.subject,
+                status='approved' if i == 0 else 'pending_approval',
+            )
+            self.sessions.append(session)
+
+    def test_archives_only_sessions_with_full_commission_checklist(self):
+        from apps.academicTutoring.services import archive_sessions
+
+        self.assertEqual(archive_sessions(), 1)
+        archived = ClassSession.objects.filter(is_archived=True)
+        self.assertEqual(list(archived), [self.sessions[0]])
+        self.assertIsNotNone(archived.get().archived_at)
+
+    def test_archives_stale_sessions(self):
+        from apps.academicTutoring.services import archive_sessions
+
+        ClassSession.objects.filter(pk=self.sessions[2].pk).update(
+            updated_at=timezone.now() - timedelta(days=60)
+        )
+        self.assertEqual(archive_sessions(tutor=self.tutor), 2)
+
+    def test_history_flags_are_annotated_in_constant_queries(self):
+        client = Client()
+        client.force_login(self.tutor)
+        url = reverse('tutor_session_history')
+        client.get(url)  # calienta PlatformConfig
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        baseline = len(ctx.captured_queries)
+
+        for i in range(5):
+            ClassSession.objects.create(
+                tutor=self.tutor, client=self.student, subject=f'Extra {i}',
+                scheduled_date=date.today(), scheduled_time=time(9, 0),
+                status='completed',
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+
+        self.assertEqual(len(ctx.captured_queries), baseline)
+        first = next(s for s in response.context['completed_sessions']
+                     if s.pk == self.sessions[0].pk)
+        self.assertTrue(first.approved_sim)
+        self.assertTrue(first.has_pdf)
+        self.assertFalse(first.pending_sim)
+
+
+class HotPathQueryPlanTest(TestCase):
+    """
+    Las consultas calientes de dashboards, historial y archivado deben usar
+    un índice. Se revisa el plan de ejecución (EXPLAIN) sobre un conjunto de
+    datos sembrado y el test falla si aparece un recorrido secuencial de la
+    tabla (SQLite: `SCAN <tabla>`, PostgreSQL: `Seq Scan on <tabla>`).
+    """
+
+    TUTORS = 20
+    SESSIONS_PER_TUTOR = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        from apps.accounts.models import Notification
+        from apps.academicTutoring.models import SessionMaterial
+        from apps.simulators.models import Simulator, StudentWeakTopicProfile
+
+        cls.tutors = [UserFactory.create_tutor() for _ in range(cls.TUTORS)]
+        cls.clients = [UserFactory.create_client() for _ in range(cls.TUTORS)]
+        statuses = ['pending', 'confirmed', 'completed', 'cancelled']
+        today = date.today()
+
+        ClassSession.objects.bulk_create([
+            ClassSession(
+                tutor=tutor, client=cls.clients[(t + i) % cls.TUTORS],
+                subject=f'Materia {i % 5}',
+                scheduled_date=today + timedelta(days=i - 10),
+                scheduled_time=time(8 + i % 10, 0),
+                status=statuses[i % len(statuses)],
+                is_archived=i % 3 == 0,
+            )
+            for t, tutor in enumerate(cls.tutors)
+            for i in range(cls.SESSIONS_PER_TUTOR)
+        ])
+        sessions = list(ClassSession.objects.all())
+        cls.session = sessions[0]
+
+        SessionMaterial.objects.bulk_create([
+            SessionMaterial(session=s, type='url', url='https://example.com/m')
+            for s in sessions
+        ])
+        Simulator.objects.bulk_create([
+            Simulator(
+                session=s, tutor=s.tutor, student=s.client,
+                title=f'Simulador {s.pk}', subject=s.subject,
+                status='approved' if s.pk % 2 else 'pending_approval',
+            )
+            for s in sessions
+        ])
+        Notification.objects.bulk_create([
+            Notification(recipient=user, message=f'Aviso {n}', is_read=n % 4 != 0)
+            for user in cls.tutors + cls.clients
+            for n in range(20)
+        ])
+        StudentWeakTopicProfile.objects.bulk_create([
+            StudentWeakTopicProfile(
+                student=client, subject=f'Materia {n % 5}', topic_tag=f'tema-{n}',
+                cumulative_score_pct=n * 4,
+            )
+            for client in cls.clients
+            for n in range(25)
+        ])
+
+    def assertUsesIndex(self, queryset):
+        from django.db import connection
+
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {table}')
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            seq_scan = f'Seq Scan on {table}' in plan
+        else:
+            seq_scan = any(
+                line.strip().endswith(f'SCAN {table}')
+                for line in plan.splitlines()
+            )
+        self.assertFalse(seq_scan, f'Recorrido secuencial en {table}:\n{plan}')
+
+    def test_tutor_dashboard_sessions(self):
+        self.assertUsesIndex(
+            ClassSession.objects.get_tutor_sessions(self.tutors[0], status='confirmed')
+        )
+
+    def test_client_dashboard_sessions(self):
+        self.assertUsesIndex(
+            ClassSession.objects.get_client_sessions(self.clients[0], status='pending')
+        )
+
+    def test_tutor_history(self):
+        self.assertUsesIndex(
+            ClassSession.objects.get_tutor_history(self.tutors[0], status='completed')
+        )
+
+    def test_archive_sweep(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        self.assertUsesIndex(
+            ClassSession.objects.filter(
+                is_archived=False,
+                status__in=['completed', 'cancelled'],
+                updated_at__lt=cutoff,
+            )
+        )
+
+    def test_unread_notifications(self):
+        from apps.accounts.models import Notification
+
+        self.assertUsesIndex(
+            Notification.objects.filter(recipient=self.clients[0], is_read=False)
+        )
+
+    def test_session_materials_by_type(self):
+        from apps.academicTutoring.models import SessionMaterial
+
+        self.assertUsesIndex(
+            SessionMaterial.objects.filter(session=self.session, type='url')
+        )
+
+    def test_session_simulators_by_status(self):
+        from apps.simulators.models import Simulator
+
+        self.assertUsesIndex(
+            Simulator.objects.filter(
+                session=self.session, student=self.session.client, status='approved'
+            )
+        )
+
+    def test_student_simulator_list(self):
+        from apps.simulators.models import Simulator
+
+        self.assertUsesIndex(
+            Simulator.objects.filter(student=self.clients[0], status='approved')
+        )
+
+    def test_weak_topics_by_score(self):
+        from apps.simulators.models import StudentWeakTopicProfile
+
+        self.assertUsesIndex(
+            StudentWeakTopicProfile.objects.filter(
+                student=self.clients[0], subject='Materia 1',
+                cumulative_score_pct__lt=60,
+            )
+        )
+
+
+class TutorHistoryQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """El historial del tutor mantiene un número fijo de consultas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from apps.academicTutoring.models import PlatformConfig, SessionMaterial
+        from apps.simulators.models import Simulator
+
+        PlatformConfig.get_config()
+        cls.tutor = UserFactory.create_tutor()
+        for i in range(15):
+            student = UserFactory.create_client()
+            for status in ('completed', 'cancelled'):
+                session = ClassSession.objects.create(
+                    tutor=cls.tutor, client=student, subject=f'Materia {i}',
+                    scheduled_date=date.today() - timedelta(days=i + 1),
+                    scheduled_time=time(9, 0), status=status,
+                )
+            SessionMaterial.objects.create(
+                session=session, type='url', url='https://example.com/guia'
+            )
+            Simulator.objects.create(
+                session=session, tutor=cls.tutor, student=student,
+                title=f'Simulador {i}', subject=session.subject,
+                status='pending_approval',
+            )
+
+    def test_history_within_budget(self):
+        self.client.force_login(self.tutor)
+        self.assertWithinQueryBudget(reverse('tutor_session_history'))
+
+
+class SyntheticDataCommandTest(TestCase):
+    """generate_synthetic_data es determinista y --flush limpia su corrida."""
+
+    def _run(self, *extra):
+        from django.core.management import call_command
+        from io import StringIO
+
+        call_command(
+            'generate_synthetic_data', '--tutors', '3', '--students', '6',
+            '--questions', '5', '--seed', '11', '--force', *extra, stdout=StringIO()
+        )
+
+    def _snapshot(self):
+        from apps.simulators.models import SimulatorResponse
+
+        return (
+            list(ClassSession.objects.order_by('id').values_list(
+                'subject', 'status', 'scheduled_date', 'scheduled_time')),
+            list(SimulatorResponse.objects.order_by('id').values_list(
+                'selected_option', 'time_spent_seconds')),
+        )
+
+    def test_same_seed_same_dataset(self):
+        from apps.accounts.models import User
+
+        self._run()
+        first = self._snapshot()
+        self.assertEqual(User.objects.filter(user_type='tutor').count(), 3)
+        self.assertTrue(first[0])
+
+        self._run('--flush')
+        self.assertFalse(ClassSession.objects.exists())
+
+        self._run()
+        self.assertEqual(self._snapshot(), first)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MATERIAL_EXTRACTION_PROCESSES=0)
+class MaterialExtractionTest(TestCase):
+    """Extracción de texto de materiales en segundo plano"""
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        self.session = ClassSession.objects.create(
+            tutor=self.tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+
+    def _upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SessionMaterial.objects.create(
+                session=self.session, type='file', filename=name,
+                file=SimpleUploadedFile(name, content), uploaded_by=self.tutor,
+            )
+
+    def test_upload_queues_extraction_and_worker_extracts_text(self):
+        material = self._upload('apuntes.txt', 'La regla de la cadena se apli-\ncaba   así.\n\n\n\nFin'.encode())
+        self.assertEqual(material.extraction.status, MaterialExtraction.Status.PENDING)
+
+        extraction = material_extraction.claim_next_extraction()
+        self.assertEqual(extraction.status, MaterialExtraction.Status.RUNNING)
+        self.assertIsNone(material_extraction.claim_next_extraction())
+        material_extraction.run_extraction(extraction)
+
+        extraction.refresh_from_db()
+        self.assertEqual(extraction.status, MaterialExtraction.Status.DONE)
+        self.assertEqual(extraction.text, 'La regla de la cadena se aplicaba así.\n\nFin')
+        self.assertEqual(len(extraction.content_hash), 64)
+
+        material = SessionMaterial.objects.select_related('extraction').get(pk=material.pk)
+        prompt = build_user_prompt(self.session, [material], [])
+        self.assertIn('se aplicaba así', prompt)
+
+    def test_same_file_reuses_previous_extraction(self):
+        first = self._upload('guia.txt', b'Derivadas parciales')
+        material_extraction.ensure_extracted(first)
+        second = self._upload('copia.txt', b'Derivadas parciales')
+
+        with mock.patch.object(material_extraction, 'extract_file') as extract:
+            material_extraction.ensure_extracted(second)
+        extract.assert_not_called()
+        self.assertEqual(material_extraction.material_text(second), 'Derivadas parciales')
+
+    def test_extraction_held_by_another_worker_is_not_run_again(self):
+        material = self._upload('guia.txt', b'Derivadas parciales')
+        self.assertIsNotNone(material_extraction.claim_next_extraction())
+
+        with override_settings(MATERIAL_EXTRACTION_TIMEOUT=0), \
+                mock.patch.object(material_extraction, 'run_extraction') as run:
+            extraction = material_extraction.ensure_extracted(material)
+        run.assert_not_called()
+        self.assertEqual(extraction.status, MaterialExtraction.Status.RUNNING)
+
+    def test_spawned_pool_parses_and_is_recreated_after_recycling(self):
+        path = os.path.join(tempfile.mkdtemp(), 'apuntes.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('Límites laterales')
+
+        with override_settings(MATERIAL_EXTRACTION_PROCESSES=1):
+            try:
+                self.assertEqual(material_extraction._parse(path, 'text'), (['Límites laterales'], 0))
+                pool = material_extraction._pool
+                material_extraction._recycle_pool(pool)
+                self.assertIsNone(material_extraction._pool)
+                self.assertEqual(material_extraction._parse(path, 'text'), (['Límites laterales'], 0))
+                self.assertIsNot(material_extraction._pool, pool)
+            finally:
+                material_extraction._recycle_pool(material_extraction._pool)
+
+    def test_unsupported_format_is_not_queued(self):
+        material = self._upload('diapositivas.pptx', b'binario')
+        self.assertEqual(material.extraction.status, MaterialExtraction.Status.UNSUPPORTED)
+        self.assertIsNone(material_extraction.claim_next_extraction())
+        self.assertIn('[Archivo adjunto: diapositivas.pptx]',
+                      build_user_prompt(self.session, [material], []))
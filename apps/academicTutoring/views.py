@@ -17,6 +17,7 @@ from .services.meeting_service import update_session_with_meeting
 from .utils import send_cancellation_email
 
 from apps.accounts.mixins.roles import ClientRequiredMixin, TutorRequiredMixin
+from subjectSupport.query_budget import query_budget
 from django.core.exceptions import PermissionDenied
 import logging
 
@@ -650,48 +651,19 @@ def institution_search_api(request):
     return JsonResponse({'results': list(institutions)})
 
 
+@query_budget(queries=14)
 class TutorSessionHistoryView(TutorRequiredMixin, TemplateView):
     template_name = 'core/tutor_session_history.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         config = PlatformConfig.get_config()
-        archive_cutoff = timezone.now() - timedelta(
-            days=config.session_archive_days
-        )
 
-        # Auto-archive old completed sessions
-        ClassSession.objects.filter(
-            tutor=self.request.user,
-            status__in=['completed', 'cancelled'],
-            is_archived=False,
-            updated_at__lt=archive_cutoff
-        ).update(is_archived=True, archived_at=timezone.now())
-
-        # Auto-archivo cuando las 3 condiciones de comisión están cumplidas
-        from apps.academicTutoring.models import SessionMaterial as SM
-        completed_all = ClassSession.objects.filter(
-            tutor=self.request.user,
-            status='completed',
-            is_archived=False
+        # El archivado automático corre como tarea periódica
+        # (manage.py archive_sessions), no en cada carga de página.
+        completed = ClassSession.objects.get_tutor_history(
+            self.request.user, 'completed'
         )
-        for sess in completed_all:
-            has_recording = bool(sess.recording_url)
-            has_approved_sim = sess.simulators.filter(status='approved').exists()
-            has_pdf = SM.objects.filter(session=sess, file__iendswith='.pdf').exists()
-            if has_recording and has_approved_sim and has_pdf:
-                sess.is_archived = True
-                sess.archived_at = timezone.now()
-                sess.save(update_fields=['is_archived', 'archived_at'])
-
-        completed = ClassSession.objects.filter(
-            tutor=self.request.user,
-            status='completed',
-            is_archived=False
-        ).select_related('client').prefetch_related(
-            'materials', 'simulators'
-        ).order_by('-scheduled_date')
-
         cancelled = ClassSession.objects.filter(
             tutor=self.request.user,
             status='cancelled',
@@ -703,27 +675,16 @@ class TutorSessionHistoryView(TutorRequiredMixin, TemplateView):
         pending_simulators = Simulator.objects.filter(
             tutor=self.request.user,
             status='pending_approval'
-        ).select_related('student', 'session').order_by('-created_at')
-
-        # Annotate simulator status per completed session
-        for session in completed:
-            session.pending_sim = session.simulators.filter(
-                status='pending_approval'
-            ).first()
-            session.approved_sim = session.simulators.filter(
-                status='approved'
-            ).first()
-            session.has_any_sim = session.simulators.exists()
-            session.sim_generating = session.simulators.filter(
-                generation_status='generating'
-            ).exists()
-            session.has_pdf = SM.objects.filter(
-                session=session, file__iendswith='.pdf'
-            ).exists()
+        ).select_related('student', 'session').prefetch_related(
+            'questions'
+        ).order_by('-created_at')
 
         context['completed_sessions'] = completed
         context['cancelled_sessions'] = cancelled
         context['pending_simulators'] = pending_simulators
+        # Temas débiles de sus estudiantes: agregado materializado, una consulta
+        from apps.simulators.tutor_topics import topics_for_tutor
+        context['weak_topics'] = topics_for_tutor(self.request.user)
         context['archive_days'] = config.session_archive_days
         return context
 
@@ -855,6 +816,9 @@ class SimulatorApproveView(TutorRequiredMixin, View):
             self.simulator.save(update_fields=[
                 'status', 'tutor_reviewed_at', 'tutor_feedback'
             ])
+            # Las preguntas aprobadas pasan al banco compartido por materia
+            from apps.simulators.question_bank import bank_simulator_questions
+            bank_simulator_questions(self.simulator)
             Notification.objects.create(
                 recipient=self.simulator.student,
                 message=(
@@ -871,6 +835,9 @@ class SimulatorApproveView(TutorRequiredMixin, View):
             self.simulator.save(update_fields=[
                 'status', 'tutor_reviewed_at', 'tutor_feedback'
             ])
+            # Regenerar no debe devolver las mismas preguntas desde la caché
+            from apps.simulators.ai_generator import forget_cached_response
+            forget_cached_response(self.simulator.generation_prompt)
             Notification.objects.create(
                 recipient=self.simulator.student,
                 message=(
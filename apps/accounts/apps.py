@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from .models import Notification
+        from .notification_stream import publish_notification
+
+        def _on_notification_saved(sender, instance, created, **kwargs):
+            if created:
+                publish_notification(instance)
+
+        post_save.connect(
+            _on_notification_saved,
+            sender=Notification,
+            dispatch_uid='accounts.notification_stream',
+        )
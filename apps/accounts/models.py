@@ -593,6 +593,16 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Limpieza de leídas (is_read=True, read_at < ...) en los dashboards
+            models.Index(fields=['recipient', 'is_read', 'read_at'], name='notif_recipient_read_idx'),
+            # Campana de no leídas: índice parcial, la mayoría de filas están leídas
+            models.Index(
+                fields=['recipient', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notif_unread_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Notif→{self.recipient.name}: {self.message}"
@@ -0,0 +1,300 @@
+"""
+Stream en vivo de notificaciones (Server-Sent Events).
+
+Este módulo contiene:
+- publish_notification()   → difunde una Notification recién creada
+- NotificationBroker       → fan-out por proceso hacia los clientes conectados
+- notification_stream()    → vista async que mantiene el EventSource abierto
+
+En PostgreSQL el broker escucha el canal LISTEN/NOTIFY, así que todos los
+workers reciben el evento en cuanto se confirma la transacción. En SQLite
+(desarrollo) no existe NOTIFY y el broker consulta la tabla cada pocos
+segundos buscando ids nuevos.
+
+La vista solo mantiene la conexión abierta cuando corre bajo ASGI
+(subjectSupport.asgi). Bajo WSGI responde con las notificaciones pendientes
+y un `retry:` largo, de modo que el navegador reconecta periódicamente sin
+bloquear un worker de gunicorn.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, close_old_connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_CHANNEL = 'edulatam_notifications'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _serialize(notification_id, recipient_id, message, created_at):
+    return {
+        'id': notification_id,
+        'recipient_id': recipient_id,
+        'message': message,
+        'created_at': created_at.isoformat() if created_at else None,
+    }
+
+
+def _uses_listen_notify():
+    return connection.vendor == 'postgresql'
+
+
+# ─────────────────────────────────────────────────────────────
+# Publicación
+# ─────────────────────────────────────────────────────────────
+
+def publish_notification(notification):
+    """
+    Difunde una Notification a los streams abiertos de su destinatario.
+
+    En PostgreSQL emite pg_notify al confirmar la transacción; en otros
+    motores no hace nada porque el broker detecta la fila por polling.
+    """
+    if not _uses_listen_notify():
+        return
+
+    payload = json.dumps(_serialize(
+        notification.pk, notification.recipient_id,
+        notification.message, notification.created_at,
+    ))
+
+    def _notify():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_notify(%s, %s)', [NOTIFICATION_CHANNEL, payload]
+                )
+        except Exception as e:
+            logger.warning('pg_notify failed for notification %s: %s',
+                           notification.pk, e)
+
+    transaction.on_commit(_notify)
+
+
+# ─────────────────────────────────────────────────────────────
+# Broker por proceso
+# ─────────────────────────────────────────────────────────────
+
+class Subscription:
+    """Cola acotada de un cliente conectado."""
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # True si se descartaron eventos por cliente lento: el stream
+        # pedirá al navegador que recargue la lista completa.
+        self.overflowed = False
+
+    def offer(self, event):
+        """Encola sin bloquear; se ejecuta dentro del event loop."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class NotificationBroker:
+    """
+    Reparte notificaciones nuevas entre los streams abiertos del proceso.
+
+    Un único hilo en segundo plano recibe los eventos (LISTEN/NOTIFY o
+    polling) y los entrega a las colas de los usuarios suscritos. El hilo
+    arranca con el primer suscriptor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._thread = None
+
+    def subscribe(self, user_id):
+        subscription = Subscription(
+            user_id,
+            asyncio.get_running_loop(),
+            _setting('NOTIFICATION_STREAM_QUEUE_SIZE', 50),
+        )
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='notification-broker', daemon=True
+                )
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.user_id)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    def dispatch(self, event):
+        with self._lock:
+            targets = list(self._subscribers.get(event['recipient_id'], ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # El loop del cliente ya se cerró
+                self.unsubscribe(subscription)
+
+    # ── Hilo de escucha ──────────────────────────────────────
+
+    def _run(self):
+        while True:
+            try:
+                if _uses_listen_notify():
+                    self._listen()
+                else:
+                    self._poll()
+            except Exception as e:
+                logger.error('Notification broker error: %s', e, exc_info=True)
+                close_old_connections()
+                connection.close()
+                time.sleep(_setting('NOTIFICATION_STREAM_POLL_SECONDS', 3))
+
+    def _listen(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN {NOTIFICATION_CHANNEL}')
+        logger.info('Notification broker listening on %s', NOTIFICATION_CHANNEL)
+        while True:
+            ready, _, _ = select.select([raw], [], [], 30)
+            if not ready:
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                try:
+                    self.dispatch(json.loads(notify.payload))
+                except (ValueError, KeyError):
+                    logger.warning('Invalid notification payload: %s',
+                                   notify.payload[:200])
+
+    def _poll(self):
+        from .models import Notification
+
+        interval = _setting('NOTIFICATION_STREAM_POLL_SECONDS', 3)
+        last_id = Notification.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        while True:
+            time.sleep(interval)
+            if not self.has_subscribers():
+                continue
+            close_old_connections()
+            rows = Notification.objects.filter(id__gt=last_id).order_by('id').values_list(
+                'id', 'recipient_id', 'message', 'created_at'
+            )
+            for row in rows:
+                last_id = row[0]
+                self.dispatch(_serialize(*row))
+
+
+broker = NotificationBroker()
+
+
+# ─────────────────────────────────────────────────────────────
+# Vista SSE
+# ─────────────────────────────────────────────────────────────
+
+def _format_event(data, event='notification'):
+    return (
+        f"id: {data['id']}\n"
+        f"event: {event}\n"
+        f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    )
+
+
+def _pending_notifications(user_id, after_id):
+    from .models import Notification
+
+    qs = Notification.objects.filter(recipient_id=user_id, is_read=False)
+    if after_id:
+        qs = qs.filter(id__gt=after_id)
+    rows = qs.order_by('id').values_list(
+        'id', 'recipient_id', 'message', 'created_at'
+    )[:_setting('NOTIFICATION_STREAM_QUEUE_SIZE', 50)]
+    return [_serialize(*row) for row in rows]
+
+
+def _last_event_id(request):
+    raw = request.headers.get('Last-Event-ID') or request.GET.get('last_id', '')
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return 0
+
+
+async def _event_stream(user_id, after_id):
+    heartbeat = _setting('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 20)
+    # Suscribirse antes de leer el backlog para no perder eventos intermedios
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f"retry: {_setting('NOTIFICATION_STREAM_RETRY_MS', 5000)}\n\n"
+        last_sent = after_id
+        for data in await sync_to_async(_pending_notifications)(user_id, after_id):
+            last_sent = data['id']
+            yield _format_event(data)
+
+        while True:
+            try:
+                data = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if subscription.overflowed:
+                # Cliente lento: se descartaron eventos, mejor recargar
+                yield _format_event({'id': data['id']}, event='resync')
+                return
+            if data['id'] <= last_sent:
+                continue
+            last_sent = data['id']
+            yield _format_event(data)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    """EventSource con las notificaciones nuevas del usuario autenticado."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    after_id = _last_event_id(request)
+
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI no se puede retener el worker: responder el backlog y
+        # pedir al navegador que vuelva a conectar más tarde.
+        pending = await sync_to_async(_pending_notifications)(user.pk, after_id)
+        body = f"retry: {_setting('NOTIFICATION_STREAM_WSGI_RETRY_MS', 30000)}\n\n"
+        body += ''.join(_format_event(data) for data in pending)
+        response = HttpResponse(body, content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(
+            _event_stream(user.pk, after_id),
+            content_type='text/event-stream',
+        )
+        response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,72 @@
+"""
+Helpers compartidos por las suites de tests de las apps.
+"""
+import itertools
+
+from apps.accounts.models import User, TutorProfile, ClientProfile
+
+_sequence = itertools.count(1)
+
+
+class UserFactory:
+    """Crea usuarios tutor/cliente con su perfil correspondiente."""
+
+    @staticmethod
+    def _create_user(user_type, email=None, name=None, password='testpass123'):
+        n = next(_sequence)
+        email = email or f'{user_type}{n}@test.com'
+        return User.objects.create_user(
+            username=email.split('@')[0],
+            email=email,
+            password=password,
+            name=name or f'{user_type.title()} {n}',
+            user_type=user_type,
+        )
+
+    @classmethod
+    def create_tutor(cls, email=None, name=None, password='testpass123', **profile_fields):
+        user = cls._create_user('tutor', email, name, password)
+        TutorProfile.objects.create(user=user, **profile_fields)
+        return user
+
+    @classmethod
+    def create_client(cls, email=None, name=None, password='testpass123', **profile_fields):
+        user = cls._create_user('client', email, name, password)
+        ClientProfile.objects.create(user=user, **profile_fields)
+        return user
+
+
+class QueryBudgetTestMixin:
+    """
+    Verifica que una vista no supere su @query_budget.
+
+    Cuenta las consultas de la petición completa (sesión, auth, vista y
+    plantilla), igual que QueryBudgetMiddleware en producción. Debe usarse
+    con datos sembrados suficientes para que un N+1 se note.
+    """
+
+    def assertWithinQueryBudget(self, url, **extra):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import resolve
+        from subjectSupport.query_budget import get_view_budget
+
+        match = resolve(url.split('?')[0])
+        budget = get_view_budget(match.func)
+        if budget is None:
+            self.fail(f'{match.view_name} no declara @query_budget')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **extra)
+
+        self.assertEqual(response.status_code, 200)
+        executed = len(ctx.captured_queries)
+        if executed > budget.queries:
+            sql = '\n'.join(
+                f'{i}. {q["sql"]}' for i, q in enumerate(ctx.captured_queries, 1)
+            )
+            self.fail(
+                f'{match.view_name}: {executed} consultas, presupuesto '
+                f'{budget.queries}\n{sql}'
+            )
+        return response
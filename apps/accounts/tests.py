@@ -0,0 +1,148 @@
+import asyncio
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.accounts.models import User, Notification
+from apps.accounts.notification_stream import NotificationBroker, _event_stream
+from apps.accounts.test_utils import UserFactory, QueryBudgetTestMixin
+from subjectSupport import query_budget
+
+
+def create_user(email, user_type='client'):
+    return User.objects.create_user(
+        username=email.split('@')[0], email=email, password='Clave-segura-123',
+        name=email.split('@')[0], user_type=user_type,
+    )
+
+
+class NotificationStreamTest(TestCase):
+
+    def setUp(self):
+        self.student = create_user('estudiante@test.com')
+        self.other = create_user('otro@test.com')
+
+    def test_wsgi_returns_backlog_with_long_retry(self):
+        Notification.objects.create(recipient=self.student, message='Sesión confirmada')
+        Notification.objects.create(recipient=self.other, message='No es mía')
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse('notification_stream'))
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertIn('retry: 30000', body)
+        self.assertIn('Sesión confirmada', body)
+        self.assertNotIn('No es mía', body)
+
+    def test_wsgi_skips_already_seen_ids(self):
+        first = Notification.objects.create(recipient=self.student, message='Primera')
+        Notification.objects.create(recipient=self.student, message='Segunda')
+        self.client.force_login(self.student)
+
+        response = self.client.get(
+            reverse('notification_stream'), HTTP_LAST_EVENT_ID=str(first.pk)
+        )
+
+        body = response.content.decode()
+        self.assertNotIn('Primera', body)
+        self.assertIn('Segunda', body)
+
+
+class NotificationBrokerTest(TransactionTestCase):
+
+    def test_dispatch_reaches_only_recipient_and_flags_overflow(self):
+        broker = NotificationBroker()
+        broker._run = lambda: None
+
+        async def scenario():
+            mine = broker.subscribe(1)
+            theirs = broker.subscribe(2)
+            mine.queue = asyncio.Queue(maxsize=1)
+            broker.dispatch({'id': 10, 'recipient_id': 1, 'message': 'a'})
+            broker.dispatch({'id': 11, 'recipient_id': 1, 'message': 'b'})
+            await asyncio.sleep(0)
+            return mine, theirs
+
+        mine, theirs = asyncio.run(scenario())
+        self.assertEqual(mine.queue.qsize(), 1)
+        self.assertTrue(mine.overflowed)
+        self.assertEqual(theirs.queue.qsize(), 0)
+
+    @mock.patch.object(NotificationBroker, '_run', lambda self: None)
+    def test_event_stream_starts_with_retry_and_backlog(self):
+        user = create_user('asgi@test.com')
+        Notification.objects.create(recipient=user, message='Grabación disponible')
+
+        async def first_chunks():
+            stream = _event_stream(user.pk, 0)
+            chunks = [await stream.__anext__(), await stream.__anext__()]
+            await stream.aclose()
+            return chunks
+
+        chunks = asyncio.run(first_chunks())
+        self.assertTrue(chunks[0].startswith('retry:'))
+        self.assertIn('event: notification', chunks[1])
+        self.assertIn('Grabación disponible', chunks[1])
+
+
+class DashboardQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Los dashboards no deben crecer en consultas con el historial del usuario."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from apps.academicTutoring.models import ClassSession, SessionMaterial, PlatformConfig
+        from apps.simulators.models import Simulator
+
+        PlatformConfig.get_config()
+        cls.tutor = UserFactory.create_tutor(welcome_shown=True)
+        cls.student = UserFactory.create_client()
+        for i in range(10):
+            for status in ('pending', 'confirmed', 'completed', 'cancelled'):
+                session = ClassSession.objects.create(
+                    tutor=cls.tutor, client=cls.student, subject=f'Materia {i}',
+                    scheduled_date=date.today() + timedelta(days=3),
+                    scheduled_time=time(10, 0), status=status,
+                )
+                SessionMaterial.objects.create(
+                    session=session, type='url', url='https://example.com/guia'
+                )
+                if status == 'completed':
+                    Simulator.objects.create(
+                        session=session, tutor=cls.tutor, student=cls.student,
+                        title=f'Simulador {i}', subject=session.subject,
+                        status='approved' if i % 2 else 'rejected',
+                    )
+            Notification.objects.create(recipient=cls.tutor, message=f'Aviso {i}')
+            Notification.objects.create(recipient=cls.student, message=f'Aviso {i}')
+
+    def test_tutor_dashboard_within_budget(self):
+        self.client.force_login(self.tutor)
+        self.assertWithinQueryBudget(reverse('tutor_dashboard'))
+
+    def test_client_dashboard_within_budget(self):
+        self.client.force_login(self.student)
+        response = self.assertWithinQueryBudget(reverse('client_dashboard'))
+        past = list(response.context['past_sessions'])
+        self.assertEqual(len(past), 10)
+        self.assertTrue(all(
+            (s.pub_simulator or s.rejected_simulator) is not None for s in past
+        ))
+
+    @override_settings(QUERY_BUDGET_SERVER_TIMING=True)
+    def test_middleware_emits_server_timing(self):
+        self.client.force_login(self.tutor)
+        response = self.client.get(reverse('tutor_dashboard'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_middleware_logs_exceeded_budget(self):
+        from apps.accounts.views import TutorDashboardView
+
+        self.client.force_login(self.tutor)
+        key = query_budget._view_key(TutorDashboardView)
+        with mock.patch.dict(query_budget._registry, {key: query_budget.QueryBudget(1)}):
+            with self.assertLogs('subjectSupport.query_budget', 'WARNING') as logs:
+                self.client.get(reverse('tutor_dashboard'))
+        self.assertIn('Query budget exceeded', logs.output[0])
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import password_reset_views
+from .notification_stream import notification_stream
 
 urlpatterns = [
     # Registration routes
@@ -20,6 +21,8 @@ urlpatterns = [
     path('profile/client/', views.ClientProfileView.as_view(), name='client_profile'),
     path('profile/tutor/edit/', views.EditTutorProfileView.as_view(), name='edit_tutor_profile'),
     path('profile/client/edit/', views.EditClientProfileView.as_view(), name='edit_client_profile'),
+    # Notificaciones en vivo (SSE)
+    path('notifications/stream/', notification_stream, name='notification_stream'),
     # Tutor management routes
     path('tutor/manage-subjects/', views.ManageTutorSubjectsView.as_view(), name='manage_subjects'),
     
@@ -11,6 +11,8 @@ from django.utils import timezone
 from django.core.cache import cache
 from datetime import timedelta, datetime
 
+from subjectSupport.query_budget import query_budget
+
 from .forms import (
     TutorRegistrationForm, 
     ClientRegistrationForm, 
@@ -322,6 +324,7 @@ class DashboardView(LoginRequiredMixin, View):
             return redirect('client_dashboard')
 
 
+@query_budget(queries=16)
 class TutorDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     """
     Dashboard for tutors - ONLY accessible to tutors.
@@ -425,6 +428,7 @@ class TutorDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         return context
 
 
+@query_budget(queries=18)
 class ClientDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     """
     Dashboard for clients/students - ONLY accessible to clients.
@@ -469,21 +473,29 @@ class ClientDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
             recipient=self.request.user, is_read=False
         )
 
-        # For each past session, annotate simulator status
+        # For each past session, annotate simulator status (una sola consulta
+        # para todos los simuladores del estudiante en esas sesiones)
+        from django.db.models import Count, Prefetch
         from apps.simulators.models import Simulator
+        context['past_sessions'] = context['past_sessions'].annotate(
+            material_count=Count('materials')
+        ).prefetch_related(
+            Prefetch(
+                'simulators',
+                queryset=Simulator.objects.filter(
+                    student=self.request.user,
+                    status__in=['published', 'pending_approval', 'approved', 'rejected']
+                ),
+                to_attr='student_simulators'
+            )
+        )
         for session in context['past_sessions']:
-            pub_sim = Simulator.objects.filter(
-                session=session,
-                student=self.request.user,
-                status__in=['published', 'pending_approval', 'approved']
-            ).first()
-            session.pub_simulator = pub_sim
-            rejected_sim = Simulator.objects.filter(
-                session=session,
-                student=self.request.user,
-                status='rejected'
-            ).first()
-            session.rejected_simulator = rejected_sim
+            session.pub_simulator = next(
+                (s for s in session.student_simulators if s.status != 'rejected'), None
+            )
+            session.rejected_simulator = next(
+                (s for s in session.student_simulators if s.status == 'rejected'), None
+            )
 
         # Check for expiring and expired videos (D15)
         from django.utils import timezone as tz
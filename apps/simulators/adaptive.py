@@ -0,0 +1,149 @@
+"""
+Intentos adaptativos: se sirve una pregunta a la vez, la más informativa
+para la habilidad estimada del estudiante, y el intento termina cuando la
+estimación converge.
+
+- start_state()    → estado inicial del intento: dificultad y tema de cada
+                     pregunta y habilidad por tema sembrada desde
+                     StudentWeakTopicProfile
+- next_question()  → pregunta pendiente más informativa (o None)
+- record_result()  → actualiza la habilidad (Elo) con una respuesta
+- standard_error() → error estándar de la habilidad global
+- should_stop()    → mínimo de preguntas + error estándar bajo, o
+                     max_questions() alcanzado
+
+Modelo de Rasch: P(acierto) = 1 / (1 + e^-(θ - b)). La dificultad b sale
+de QuestionStats si la pregunta ya tiene SIMULATOR_ITEM_MIN_RESPONSES
+respuestas y, si no, de su nivel (baja/media/alta). Se elige primero el
+tema con menos información acumulada y, dentro de él, la pregunta cuya
+dificultad está más cerca de la habilidad del tema (máxima información
+p·(1 - p)). El estado vive en SimulatorAttempt.adaptive_state (JSON).
+"""
+import math
+
+from django.conf import settings
+
+from .models import QuestionStats, StudentWeakTopicProfile
+
+DIFFICULTY_B = {'low': -1.0, 'medium': 0.0, 'high': 1.0}
+K_TOPIC = 0.5
+K_GLOBAL = 0.3
+# Límites para pasar de proporciones a logits sin infinitos
+P_MIN, P_MAX = 0.05, 0.95
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _logit(p):
+    p = min(max(p, P_MIN), P_MAX)
+    return math.log(p / (1 - p))
+
+
+def probability(theta, b):
+    return 1 / (1 + math.exp(b - theta))
+
+
+def item_difficulty(difficulty, stats=None):
+    """b de la pregunta: de sus estadísticas si hay suficientes respuestas."""
+    if stats is not None and stats[0] >= _setting('SIMULATOR_ITEM_MIN_RESPONSES', 20):
+        return round(-_logit(stats[1]), 3)
+    return DIFFICULTY_B.get(difficulty, 0.0)
+
+
+def start_state(payload, student, subject):
+    """
+    Estado inicial de un intento adaptativo sobre las preguntas compiladas
+    del simulador (question_payload.CompiledQuestions).
+    """
+    rows = payload.for_display()
+    stats = dict(
+        (question_id, (responses, float(p_value)))
+        for question_id, responses, p_value in QuestionStats.objects.filter(
+            question_id__in=[row['id'] for row in rows], p_value__isnull=False,
+        ).values_list('question_id', 'responses', 'p_value')
+    )
+    items = {
+        str(row['id']): [row['topic_tag'], item_difficulty(row['difficulty'], stats.get(row['id']))]
+        for row in rows
+    }
+
+    topics = {topic for topic, _ in items.values()}
+    seeds = {
+        topic: _logit(float(pct) / 100)
+        for topic, pct in StudentWeakTopicProfile.objects.filter(
+            student=student, subject=subject, topic_tag__in=list(topics),
+            total_questions_seen__gt=0,
+        ).values_list('topic_tag', 'cumulative_score_pct')
+    }
+    theta = sum(seeds.values()) / len(seeds) if seeds else 0.0
+    return {
+        'theta': round(theta, 4),
+        'info': 0.0,
+        'topics': {topic: [round(seeds.get(topic, theta), 4), 0.0] for topic in sorted(topics)},
+        'items': items,
+        'served': [],
+        'answered': 0,
+    }
+
+
+def pending_question(state):
+    """Pregunta servida y aún sin responder, o None."""
+    if len(state['served']) > state['answered']:
+        return state['served'][-1]
+    return None
+
+
+def next_question(state):
+    """Elige (sin registrarla) la siguiente pregunta, o None si no quedan."""
+    served = set(state['served'])
+    by_topic = {}
+    for question_id, (topic, b) in state['items'].items():
+        if int(question_id) not in served:
+            by_topic.setdefault(topic, []).append((b, int(question_id)))
+    if not by_topic:
+        return None
+
+    topic = min(by_topic, key=lambda t: (state['topics'][t][1], t))
+    theta = state['topics'][topic][0]
+    _, question_id = min(by_topic[topic], key=lambda item: (abs(item[0] - theta), item[1]))
+    return question_id
+
+
+def record_result(state, question_id, is_correct):
+    """Suma una respuesta a la habilidad global y a la del tema (Elo)."""
+    topic, b = state['items'][str(question_id)]
+    outcome = 1.0 if is_correct else 0.0
+
+    p = probability(state['theta'], b)
+    state['theta'] = round(state['theta'] + K_GLOBAL * (outcome - p), 4)
+    state['info'] = round(state['info'] + p * (1 - p), 4)
+
+    topic_theta, topic_info = state['topics'][topic]
+    p_topic = probability(topic_theta, b)
+    state['topics'][topic] = [
+        round(topic_theta + K_TOPIC * (outcome - p_topic), 4),
+        round(topic_info + p_topic * (1 - p_topic), 4),
+    ]
+    state['answered'] += 1
+
+
+def standard_error(state):
+    return 1 / math.sqrt(state['info']) if state['info'] > 0 else None
+
+
+def max_questions(state):
+    return min(len(state.get('items', {})), _setting('SIMULATOR_ADAPTIVE_MAX_QUESTIONS', 20))
+
+
+def should_stop(state):
+    answered = state['answered']
+    if answered >= max_questions(state):
+        return True
+    se = standard_error(state)
+    return (
+        answered >= _setting('SIMULATOR_ADAPTIVE_MIN_QUESTIONS', 8)
+        and se is not None
+        and se <= _setting('SIMULATOR_ADAPTIVE_TARGET_SE', 0.5)
+    )
@@ -3,8 +3,10 @@ from django.utils.html import format_html
 from .models import (
     Simulator, SimulatorQuestion,
     SimulatorAttempt, SimulatorResponse,
-    StudentWeakTopicProfile
+    StudentWeakTopicProfile, SimulatorGenerationJob, LLMResponseCache,
+    BankedQuestion, AIProviderCall, AIProviderDailyUsage, QuestionStats, TutorTopicAggregate,
 )
+from .question_payload import invalidate as invalidate_payload
 
 
 class SimulatorQuestionInline(admin.TabularInline):
@@ -50,6 +52,11 @@ class SimulatorAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.model is SimulatorQuestion and formset.has_changed():
+            invalidate_payload(form.instance.pk)
+
     def question_count_display(self, obj):
         count = obj.questions.filter(is_active=True).count()
         return f'{count} preguntas'
@@ -63,6 +70,21 @@ class SimulatorQuestionAdmin(admin.ModelAdmin):
     search_fields = ['statement', 'topic_tag', 'simulator__title']
     list_editable = ['is_active', 'order']
 
+    # Cada edición invalida las preguntas compiladas del simulador
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_payload(obj.simulator_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_payload(obj.simulator_id)
+
+    def delete_queryset(self, request, queryset):
+        simulator_ids = set(queryset.values_list('simulator_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for simulator_id in simulator_ids:
+            invalidate_payload(simulator_id)
+
 
 class SimulatorResponseInline(admin.TabularInline):
     model = SimulatorResponse
@@ -81,10 +103,17 @@ class SimulatorAttemptAdmin(admin.ModelAdmin):
     search_fields = ['student__name', 'simulator__title']
     readonly_fields = [
         'score', 'correct_count', 'incorrect_count', 'unanswered_count',
-        'performance_by_topic', 'started_at', 'finished_at'
+        'performance_by_topic', 'started_at', 'finished_at', 'packed_display'
     ]
     inlines = [SimulatorResponseInline]
 
+    def packed_display(self, obj):
+        packed = getattr(obj, 'packed_responses', None)
+        if packed is None:
+            return '—'
+        return f'{packed.question_count} respuestas ({packed.packed_at:%d/%m/%Y})'
+    packed_display.short_description = 'Respuestas compactas'
+
     def score_display(self, obj):
         if obj.score is None:
             return '—'
@@ -116,4 +145,82 @@ class StudentWeakTopicProfileAdmin(admin.ModelAdmin):
         labels = {1: ('Baja', '#3B6D11'), 2: ('Media', '#854F0B'), 3: ('Urgente', '#A32D2D')}
         label, color = labels[p]
         return format_html('<span style="color: {}; font-weight: 600;">{}</span>', color, label)
-    priority_display.short_description = 'Prioridad'
\ No newline at end of file
+    priority_display.short_description = 'Prioridad'
+
+@admin.register(SimulatorGenerationJob)
+class SimulatorGenerationJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'kind', 'status', 'progress', 'session', 'student',
+        'tries', 'worker', 'created_at', 'finished_at'
+    ]
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['session__subject', 'student__name', 'requested_by__name']
+    readonly_fields = [
+        'progress', 'progress_message', 'result_message', 'tries', 'worker',
+        'heartbeat_at', 'started_at', 'finished_at', 'created_at', 'simulator'
+    ]
+    raw_id_fields = ['session', 'student', 'requested_by', 'attempt']
+
+
+@admin.register(LLMResponseCache)
+class LLMResponseCacheAdmin(admin.ModelAdmin):
+    list_display = ['key', 'model_name', 'question_count', 'hits', 'last_used_at', 'expires_at']
+    list_filter = ['model_name']
+    search_fields = ['key']
+    readonly_fields = ['key', 'model_name', 'payload', 'question_count', 'hits',
+                       'created_at', 'last_used_at', 'expires_at']
+
+
+@admin.register(BankedQuestion)
+class BankedQuestionAdmin(admin.ModelAdmin):
+    list_display = ['subject_key', 'topic_key', 'difficulty', 'times_served', 'is_active', 'created_at']
+    list_filter = ['is_active', 'difficulty']
+    search_fields = ['subject_key', 'topic_key', 'statement']
+    readonly_fields = ['signature', 'source_simulator', 'times_served', 'created_at']
+
+
+@admin.register(AIProviderCall)
+class AIProviderCallAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'provider', 'model_name', 'streamed', 'outcome',
+                    'prompt_tokens', 'completion_tokens', 'cost_usd', 'latency_ms', 'wait_ms']
+    list_filter = ['provider', 'model_name', 'outcome', 'streamed']
+    date_hierarchy = 'created_at'
+    readonly_fields = [f.name for f in AIProviderCall._meta.fields]
+
+
+@admin.register(AIProviderDailyUsage)
+class AIProviderDailyUsageAdmin(admin.ModelAdmin):
+    list_display = ['day', 'provider', 'model_name', 'calls', 'ok_calls',
+                    'validation_failed_calls', 'timeout_calls', 'error_calls',
+                    'prompt_tokens', 'completion_tokens', 'cost_usd',
+                    'mean_latency_display', 'latency_ms_max']
+    list_filter = ['provider', 'model_name']
+    date_hierarchy = 'day'
+    readonly_fields = [f.name for f in AIProviderDailyUsage._meta.fields]
+
+    def mean_latency_display(self, obj):
+        return f"{obj.mean_latency_ms} ms"
+    mean_latency_display.short_description = 'Latencia media'
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(QuestionStats)
+class QuestionStatsAdmin(admin.ModelAdmin):
+    list_display = ['question', 'responses', 'p_value', 'discrimination',
+                    'median_time_seconds', 'flag', 'updated_at']
+    list_filter = ['flag']
+    search_fields = ['question__statement', 'question__simulator__title']
+    list_select_related = ['question']
+    readonly_fields = [f.name for f in QuestionStats._meta.fields]
+
+
+@admin.register(TutorTopicAggregate)
+class TutorTopicAggregateAdmin(admin.ModelAdmin):
+    list_display = ['tutor', 'subject', 'topic_tag', 'weak_count', 'student_count',
+                    'mean_score_pct', 'trend', 'updated_at']
+    list_filter = ['subject']
+    search_fields = ['tutor__name', 'subject', 'topic_tag']
+    list_select_related = ['tutor']
+    readonly_fields = [f.name for f in TutorTopicAggregate._meta.fields]
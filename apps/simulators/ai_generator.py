@@ -1,28 +1,51 @@
 """
-Generación de simuladores via LLM (DeepSeek).
+Generación de simuladores via LLM (proveedor configurable, ver ai_providers).
 
 Este módulo contiene:
 - build_system_prompt()        → prompt de sistema para el LLM
-- call_deepseek()              → llamada a la API
-- validate_questions()         → validación del JSON de respuesta
+- call_ai_provider()           → llamada con caché de respuestas (llm_cache)
+- validate_questions()         → preguntas válidas del JSON de respuesta
+                                 (parseo tolerante en llm_output)
 - build_reinforcement_prompt() → prompt de refuerzo adaptativo
+- build_batch_reinforcement_prompt() → prompt de refuerzo neutral para
+                                       un lote (solo materia y temas)
+- bank_questions_for()         → preguntas del banco para los temas débiles
 - generate_reinforcement_simulator() → crea simulador de refuerzo
+- generate_reinforcement_batch()     → un refuerzo compartido por varios
+                                       estudiantes (una sola llamada al LLM)
 """
-import json
+import logging
+from collections import Counter
 from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
+from apps.academicTutoring.material_extraction import ensure_extracted, material_text
+
+from . import ai_providers, llm_cache, question_bank
+from .ai_providers import call_llm, model_label, stream_llm
+from .llm_output import (
+    DIFFICULTY_ORDER, QuestionStreamParser, clean_question, salvage, statement_key,
+)
+from .material_selection import select_passages
 from .models import Simulator, SimulatorQuestion, StudentWeakTopicProfile
 
+logger = logging.getLogger(__name__)
+
 
 # ─────────────────────────────────────────────────────────────
 # Constantes de configuración
 # ─────────────────────────────────────────────────────────────
 
 GENERATION_COOLDOWN_HOURS = 24
-MAX_MATERIAL_CHARS = 8000
 MAX_PROMPT_CHARS = 12000
+REINFORCEMENT_MATERIAL_CHARS = 6000
 MAX_QUESTIONS = 10
+# Mínimo de preguntas para publicar un refuerzo armado solo con el banco
+REINFORCEMENT_MIN_QUESTIONS = 5
+# Preguntas que pide SYSTEM_PROMPT (escala la barra de progreso en streaming)
+EXPECTED_QUESTIONS = 50
 
 
 # ─────────────────────────────────────────────────────────────
@@ -76,111 +99,122 @@ def build_system_prompt() -> str:
 
 
 # ─────────────────────────────────────────────────────────────
-# Llamada a la API de DeepSeek
+# Validación del JSON de respuesta
 # ─────────────────────────────────────────────────────────────
 
-def call_deepseek(system_prompt: str, user_prompt: str):
+TOPIC_TAG_MAX_LENGTH = SimulatorQuestion._meta.get_field("topic_tag").max_length
+# Reparto de dificultad que pide SYSTEM_PROMPT
+DIFFICULTY_MIX = {"low": 20, "medium": 20, "high": 10}
+
+
+def validate_questions(raw_data):
     """
-    Llama a la API de DeepSeek y retorna el JSON parseado.
+    Preguntas válidas de raw_data (ver llm_output.salvage): una pregunta
+    inválida o un enunciado repetido se descartan sin rechazar el resto.
 
     Returns:
-        dict | None: JSON parseado de la respuesta, o None si falla.
+        list[dict] | None: preguntas válidas normalizadas, o None si no hay.
     """
-    import os
-    import requests
-
-    api_key = os.getenv("DEEPSEEK_API_KEY", "").strip()
-    if not api_key:
-        # Fallback: intentar con OPENAI_API_KEY
-        api_key = os.getenv("OPENAI_API_KEY", "")
-
-    base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
-    model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        "temperature": 0.7,
-        "max_tokens": 4000,
-        "response_format": {"type": "json_object"},
-    }
-
-    import logging
-    logger = logging.getLogger(__name__)
-
-    try:
-        r = requests.post(
-            f"{base_url}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=120,
-        )
-        r.raise_for_status()
-        data = r.json()
-        content = data["choices"][0]["message"]["content"]
-        return json.loads(content)
-    except requests.exceptions.Timeout:
-        logger.error("DeepSeek timeout after 120s")
-        return None
-    except requests.exceptions.HTTPError as e:
-        logger.error("DeepSeek HTTP error: %s — %s", e, r.text[:500])
-        return None
-    except Exception as e:
-        logger.error("DeepSeek unexpected error: %s", str(e), exc_info=True)
-        return None
-
+    return salvage(raw_data).questions or None
 
-# ─────────────────────────────────────────────────────────────
-# Validación del JSON de respuesta
-# ─────────────────────────────────────────────────────────────
 
-REQUIRED_KEYS = {
-    "topic_tag",
-    "difficulty",
-    "statement",
-    "option_a",
-    "option_b",
-    "option_c",
-    "option_d",
-    "correct_option",
-}
-VALID_DIFFICULTIES = {"low", "medium", "high"}
-VALID_OPTIONS = {"A", "B", "C", "D"}
+def _missing_counts(questions, result, mix=None):
+    """
+    Preguntas a volver a pedir, por dificultad: solo las descartadas de la
+    respuesta más la que quedó abierta si llegó truncada (de la dificultad
+    de la última rescatada: el orden va de low a high). Con mix
+    (diagnóstico) se piden de las dificultades que quedan bajo su cupo y
+    nunca más de las que faltan para completarlo.
+    """
+    missing = Counter(result.dropped)
+    if result.truncated:
+        missing[questions[-1]["difficulty"] if questions else "medium"] += 1
+    if not mix:
+        return dict(missing)
+
+    have = Counter(q["difficulty"] for q in questions)
+    deficits = {d: max(0, n - have[d]) for d, n in mix.items()}
+    total = min(sum(missing.values()), sum(deficits.values()))
+    counts = Counter()
+    while total > 0:
+        for d in DIFFICULTY_ORDER:
+            if total > 0 and deficits.get(d, 0) > counts[d]:
+                counts[d] += 1
+                total -= 1
+    return dict(counts)
+
+
+def _apply_mix(questions, mix):
+    """Ordena por dificultad y recorta cada una a su cupo en mix."""
+    rank = {d: i for i, d in enumerate(DIFFICULTY_ORDER)}
+    ordered = sorted(questions, key=lambda q: rank[q["difficulty"]])
+    if not mix:
+        return ordered
+    kept, have = [], Counter()
+    for q in ordered:
+        if have[q["difficulty"]] < mix.get(q["difficulty"], 0):
+            have[q["difficulty"]] += 1
+            kept.append(q)
+    if len(kept) < len(ordered):
+        logger.info("LLM output: %s questions over the difficulty mix trimmed",
+                    len(ordered) - len(kept))
+    return kept
+
+
+def build_top_up_prompt(user_prompt, missing, questions):
+    """Vuelve a pedir solo las preguntas que faltan, sin repetir las válidas."""
+    count = sum(missing.values())
+    wanted = ", ".join(f"{n} de dificultad {d}" for d, n in missing.items())
+    lines = [user_prompt, "\n\nYA TIENES ESTAS PREGUNTAS (NO las repitas):\n"]
+    lines.extend(f"- {q['statement'][:120]}\n" for q in questions)
+    lines.append(
+        f"\nIgnora la cantidad pedida antes: genera SOLO {count} preguntas nuevas "
+        f"({wanted}). Responde solo con el JSON especificado."
+    )
+    return "".join(lines)
 
 
-def validate_questions(raw_data):
+def _salvage_with_top_up(system_prompt, user_prompt, raw_data, mix=None):
     """
-    Valida que raw_data sea un dict con lista 'questions' válidas.
+    Preguntas válidas de la respuesta. Si se descartaron preguntas o llegó
+    truncada, pide solo esas en hasta SIMULATOR_LLM_TOP_UP_ROUNDS llamadas
+    más, en lugar de regenerar todo, y guarda el conjunto completo en
+    llm_cache bajo el prompt original. Con mix, cada dificultad se recorta
+    a su cupo.
 
     Returns:
-        list[dict] | None: lista de preguntas válidas, o None.
+        list[dict] | None
     """
-    if not isinstance(raw_data, dict):
+    result = salvage(raw_data)
+    questions = result.questions
+    if not questions:
         return None
-    questions = raw_data.get("questions")
-    if not isinstance(questions, list) or len(questions) == 0:
-        return None
-
-    valid = []
-    for q in questions:
-        if not isinstance(q, dict):
-            return None
-        if not REQUIRED_KEYS <= set(q.keys()):
-            return None
-        if q["difficulty"] not in VALID_DIFFICULTIES:
-            return None
-        if q["correct_option"] not in VALID_OPTIONS:
-            return None
-        valid.append(q)
 
-    return valid if valid else None
+    missing = _missing_counts(questions, result, mix)
+    rounds = getattr(settings, 'SIMULATOR_LLM_TOP_UP_ROUNDS', 1)
+    topped_up = False
+    while missing and rounds > 0:
+        rounds -= 1
+        wanted = sum(missing.values())
+        logger.info("LLM top-up: requesting %s missing questions", wanted)
+        extra_data = call_ai_provider(
+            system_prompt, build_top_up_prompt(user_prompt, missing, questions)
+        )
+        extra = salvage(extra_data, seen=[statement_key(q["statement"]) for q in questions])
+        if not extra.questions:
+            break
+        received = extra.questions[:wanted]
+        questions = questions + received
+        topped_up = True
+        # Si llegaron menos, la siguiente vuelta pide lo que sigue faltando
+        left = Counter(missing)
+        left.subtract(q["difficulty"] for q in received)
+        missing = {d: n for d, n in left.items() if n > 0} if len(received) < wanted else {}
+
+    questions = _apply_mix(questions, mix)
+    if topped_up and llm_cache.is_enabled():
+        llm_cache.put(_cache_key(system_prompt, user_prompt), questions, model_label())
+    return questions
 
 
 # ─────────────────────────────────────────────────────────────
@@ -213,6 +247,15 @@ def build_reinforcement_prompt(attempt, weak_profiles) -> str:
             f"fallos consecutivos: {profile.consecutive_failures})\n"
         )
 
+    # Pasajes del material original que tratan los temas débiles
+    source_text = attempt.simulator.source_material_text or ''
+    if source_text:
+        query = " ".join(p.topic_tag for p in weak_profiles)
+        passages = select_passages([source_text], query, REINFORCEMENT_MATERIAL_CHARS)[0]
+        if passages:
+            lines.append("\nMaterial de clase relevante para estos temas:\n")
+            lines.append("\n\n".join(passages) + "\n")
+
     lines.append(
         "\nGenera entre 5 y 10 preguntas de opción múltiple "
         "enfocadas en reforzar los temas débiles del estudiante. "
@@ -223,6 +266,39 @@ def build_reinforcement_prompt(attempt, weak_profiles) -> str:
     return "".join(lines)
 
 
+def build_batch_reinforcement_prompt(subject, topics) -> str:
+    """
+    Prompt de refuerzo compartido por un lote de estudiantes
+    (generate_reinforcement_batch): solo la materia y los temas débiles
+    en común, sin puntajes ni material de ningún estudiante.
+    """
+    lines = [
+        f"Materia: {subject}\n",
+        "Un grupo de estudiantes necesita reforzar los siguientes temas.\n",
+        "\nTEMAS DÉBILES — DEBES generar al menos 2 preguntas sobre cada uno:\n",
+    ]
+    lines.extend(f"- {topic}\n" for topic in topics)
+    lines.append(
+        "\nGenera entre 5 y 10 preguntas de opción múltiple "
+        "enfocadas en reforzar estos temas. "
+        "Aumenta la dificultad progresivamente. "
+        "Responde solo con el JSON especificado."
+    )
+    return "".join(lines)
+
+
+def _shared_topics(profile_lists):
+    """Temas débiles comunes a todos (todos los temas si no hay comunes)."""
+    by_key = {}
+    for profiles in profile_lists:
+        for profile in profiles:
+            by_key.setdefault(question_bank.normalize_key(profile.topic_tag), profile.topic_tag)
+    shared = set(by_key)
+    for profiles in profile_lists:
+        shared &= {question_bank.normalize_key(p.topic_tag) for p in profiles}
+    return sorted(by_key[key] for key in (shared or by_key))
+
+
 # ─────────────────────────────────────────────────────────────
 # Generador de simulador principal (diagnóstico)
 # ─────────────────────────────────────────────────────────────
@@ -241,75 +317,373 @@ def check_generation_cooldown(session, student, sim_type='diagnostic'):
     return not recent
 
 
-def truncate_material(text, max_chars=MAX_MATERIAL_CHARS):
-    if not text or len(text) <= max_chars:
-        return text or ''
-    return text[:max_chars] + '[Material truncado por longitud]'
-
-
 def build_user_prompt(session, materials, weak_topics, tutor_context=None):
     """
     Construye el prompt de usuario para generar un simulador diagnóstico
     a partir de los materiales de la sesión.
+
+    Las instrucciones se arman primero y el espacio restante hasta
+    MAX_PROMPT_CHARS se llena con los pasajes de material más relevantes
+    para la materia, la instrucción del tutor y los temas débiles
+    (material_selection.select_passages). El cierre nunca se recorta.
     """
-    lines = [
-        f"Materia: {session.subject}\n",
+    header = (
+        f"Materia: {session.subject}\n"
         "Genera entre 5 y 10 preguntas de opción múltiple basadas en los "
-        "siguientes materiales de clase:\n\n",
-    ]
-
-    for idx, mat in enumerate(materials, start=1):
-        content = ""
-        if mat.type == 'text' and mat.text_content:
-            content = truncate_material(mat.text_content)
-        elif mat.type == 'file' and mat.file:
-            content = f"[Archivo adjunto: {mat.file.name}]"
-        elif mat.type == 'url' and mat.url:
-            content = f"[Enlace: {mat.url}]"
-        lines.append(f"--- Material {idx} ({mat.type}) ---\n{content}\n\n")
+        "siguientes materiales de clase:\n\n"
+    )
 
+    footer = []
     if weak_topics:
-        lines.append(
+        footer.append(
             "\nEl estudiante tiene dificultades en estos temas — "
             "incluye al menos 2 preguntas sobre cada uno:\n"
         )
         for topic in weak_topics:
-            lines.append(f"- {topic}\n")
+            footer.append(f"- {topic}\n")
 
     if tutor_context and tutor_context.strip():
-        lines.append(
+        footer.append(
             f"\n\nINSTRUCCIÓN ADICIONAL DEL TUTOR (prioridad alta): "
             f"{tutor_context.strip()}\n"
             f"Sin descuidar el dominio general del material.\n"
         )
 
-    lines.append(
+    footer.append(
         "\nResponde SOLO con el JSON especificado en el system prompt."
     )
-    return "".join(lines)[:MAX_PROMPT_CHARS]
+    footer = "".join(footer)
+
+    # Encabezado de cada material; el texto de los archivos va después
+    blocks = []
+    for idx, mat in enumerate(materials, start=1):
+        label = f"--- Material {idx} ({mat.type}) ---\n"
+        if mat.type == 'file' and mat.file:
+            name = mat.filename or mat.file.name
+            blocks.append((label, name, material_text(mat)))
+        elif mat.type == 'url' and mat.url:
+            blocks.append((label + f"[Enlace: {mat.url}]", None, ''))
+        else:
+            blocks.append((label, None, ''))
+
+    # 40: margen para "Archivo: …" / "[Archivo adjunto: …]" y saltos de línea
+    fixed = len(header) + len(footer) + sum(
+        len(label) + len(name or '') + 40 for label, name, _ in blocks
+    )
+    query = " ".join([session.subject, tutor_context or '', *weak_topics])
+    selected = select_passages(
+        [text for _, _, text in blocks], query, max(0, MAX_PROMPT_CHARS - fixed)
+    )
+
+    lines = [header]
+    for (label, name, _), passages in zip(blocks, selected):
+        if name is None:
+            content = label
+        elif passages:
+            content = label + f"Archivo: {name}\n" + "\n\n".join(passages)
+        else:
+            content = label + f"[Archivo adjunto: {name}]"
+        lines.append(f"{content}\n\n")
+    lines.append(footer)
+    return "".join(lines)
+
+
+def _build_question(simulator, order, q):
+    """SimulatorQuestion sin guardar a partir de una pregunta validada."""
+    return SimulatorQuestion(
+        simulator=simulator,
+        order=order,
+        topic_tag=q["topic_tag"].strip()[:TOPIC_TAG_MAX_LENGTH],
+        difficulty=q["difficulty"],
+        statement=q["statement"],
+        option_a=q["option_a"],
+        option_b=q["option_b"],
+        option_c=q["option_c"],
+        option_d=q["option_d"],
+        correct_option=q["correct_option"],
+        explanation=q.get("explanation") or "",
+        bank_question_id=q.get("bank_question_id"),
+        is_active=True,
+    )
+
+
+def _build_questions(simulator, questions, start=1):
+    """SimulatorQuestion sin guardar, en el orden recibido del LLM."""
+    return [
+        _build_question(simulator, i, q)
+        for i, q in enumerate(questions, start=start)
+    ]
+
+
+def _publish_with_questions(simulator, questions):
+    """
+    Guarda todas las preguntas y deja el simulador pendiente de aprobación
+    en una sola transacción: o queda completo, o no queda ninguna pregunta.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        SimulatorQuestion.objects.bulk_create(_build_questions(simulator, questions))
+        _mark_published(simulator, len(questions), now)
+
+
+def bank_questions_for(subject, topics, student):
+    """
+    Preguntas del banco para los temas pedidos que el estudiante no ha
+    visto. Un tema queda cubierto con SIMULATOR_BANK_PER_TOPIC preguntas;
+    los demás son huecos que debe llenar el LLM.
+
+    Returns:
+        tuple: (preguntas del banco como dicts, temas sin cubrir)
+    """
+    if not question_bank.is_enabled() or not topics:
+        return [], list(topics)
+    per_topic = getattr(settings, 'SIMULATOR_BANK_PER_TOPIC', 2)
+    picked = question_bank.pick_for_topics(subject, topics, student, per_topic)
+    banked, gaps = [], []
+    for topic in topics:
+        if len(picked[topic]) >= per_topic:
+            banked.extend(question_bank.as_question(e) for e in picked[topic])
+        else:
+            gaps.append(topic)
+    return banked, gaps
+
+
+def _drop_duplicates(questions, banked):
+    """Quita las preguntas del LLM casi idénticas a otra ya incluida."""
+    dedup = question_bank.DuplicateFilter()
+    for q in banked:
+        dedup.add(question_bank.question_signature(q))
+    unique = [q for q in questions if not dedup.is_duplicate(q)]
+    if len(unique) < len(questions):
+        logger.info("Question bank: %s near-duplicate questions dropped",
+                    len(questions) - len(unique))
+    return unique
+
+
+def _mark_published(simulator, question_count, now):
+    Simulator.objects.filter(pk=simulator.pk).update(
+        generation_status=Simulator.GenerationStatus.DONE,
+        status=Simulator.Status.PENDING_APPROVAL,
+        generated_question_count=question_count,
+        published_at=now,
+        updated_at=now,
+    )
+    simulator.generation_status = Simulator.GenerationStatus.DONE
+    simulator.status = Simulator.Status.PENDING_APPROVAL
+    simulator.generated_question_count = question_count
+    simulator.published_at = now
+
+
+def _mark_failed(simulator, error):
+    simulator.generation_status = Simulator.GenerationStatus.FAILED
+    simulator.generation_error = error
+    simulator.save(update_fields=["generation_status", "generation_error", "updated_at"])
+
+
+def _report_progress(on_progress, percent, message, simulator=None):
+    """Avisa del avance al trabajo en segundo plano, si hay uno escuchando."""
+    if on_progress is not None:
+        on_progress(percent, message, simulator)
+
+
+def _cache_key(system_prompt, user_prompt):
+    return llm_cache.make_key(
+        system_prompt, user_prompt, model_label(), ai_providers.TEMPERATURE
+    )
+
+
+def streaming_enabled():
+    return getattr(settings, 'SIMULATOR_LLM_STREAMING', False)
+
+
+def _stream_and_persist(simulator, system_prompt, user_prompt, on_progress=None,
+                        banked=()):
+    """
+    Genera en streaming: cada pregunta se valida y se guarda apenas se
+    cierra su objeto JSON, y Simulator.generated_question_count avanza con
+    ella. El simulador sigue en 'generating' (invisible para el estudiante)
+    hasta el final. Las preguntas del banco (banked) se guardan primero y
+    las del LLM casi idénticas a una ya guardada se descartan. En un
+    diagnóstico, las del LLM que pasan el cupo de su dificultad
+    (DIFFICULTY_MIX) se descartan al llegar.
+
+    Un stream completo se publica con las preguntas válidas que trajo
+    (como una respuesta completa). Si se corta, se publican las recibidas
+    siempre que sean al menos SIMULATOR_STREAM_MIN_QUESTIONS (un refuerzo,
+    que pide MAX_QUESTIONS: REINFORCEMENT_MIN_QUESTIONS); si no, se borran.
+
+    Returns:
+        tuple: (saved_questions | None, error_message | None)
+    """
+    if simulator.simulator_type == Simulator.SimulatorType.REINFORCEMENT:
+        min_interrupted = REINFORCEMENT_MIN_QUESTIONS
+    else:
+        min_interrupted = getattr(settings, 'SIMULATOR_STREAM_MIN_QUESTIONS', 20)
+    mix = DIFFICULTY_MIX if simulator.simulator_type == Simulator.SimulatorType.DIAGNOSTIC else None
+    parser = QuestionStreamParser()
+    saved = list(banked)
+    received = []
+    skipped = 0
+    per_difficulty, over_mix = Counter(), 0
+    interrupted = None
+    dedup = question_bank.DuplicateFilter()
+    for q in banked:
+        dedup.add(question_bank.question_signature(q))
+    SimulatorQuestion.objects.bulk_create(_build_questions(simulator, banked))
 
+    try:
+        for chunk in stream_llm(system_prompt, user_prompt):
+            for q in parser.feed(chunk):
+                q = clean_question(q)
+                if q is None:
+                    skipped += 1
+                    continue
+                received.append(q)
+                if mix and per_difficulty[q["difficulty"]] >= mix.get(q["difficulty"], 0):
+                    over_mix += 1
+                    continue
+                if dedup.is_duplicate(q):
+                    continue
+                per_difficulty[q["difficulty"]] += 1
+                _build_question(simulator, len(saved) + 1, q).save()
+                saved.append(q)
+                Simulator.objects.filter(pk=simulator.pk).update(
+                    generated_question_count=len(saved), updated_at=timezone.now()
+                )
+                percent = 30 + min(49, len(saved) * 50 // EXPECTED_QUESTIONS)
+                _report_progress(on_progress, percent,
+                                 f'{len(saved)} preguntas generadas', simulator)
+            # Tras el cierre del arreglo se sigue leyendo hasta el fin del
+            # stream: el último evento trae el uso de tokens (ver AIProviderCall)
+    except Exception as e:
+        interrupted = str(e)[:200]
+        logger.warning("LLM stream interrupted after %s questions: %s",
+                       len(saved), interrupted)
+
+    if skipped:
+        logger.warning("LLM stream: %s invalid questions skipped", skipped)
+    if over_mix:
+        logger.info("LLM stream: %s questions over the difficulty mix trimmed", over_mix)
+
+    if len(saved) < (min_interrupted if interrupted else 1):
+        if interrupted is None:
+            ai_providers.mark_validation_failed(f'{len(saved)} preguntas válidas en el stream')
+        SimulatorQuestion.objects.filter(simulator=simulator).delete()
+        Simulator.objects.filter(pk=simulator.pk).update(generated_question_count=0)
+        return None, (
+            f"Stream incompleto: {len(saved)} preguntas válidas"
+            + (f" ({interrupted})" if interrupted else "")
+        )
 
-def call_ai_provider(system_prompt, user_prompt):
+    _mark_published(simulator, len(saved), timezone.now())
+    if interrupted is None and parser.finished and skipped == 0 and llm_cache.is_enabled():
+        llm_cache.put(_cache_key(system_prompt, user_prompt), received, model_label())
+    return saved, None
+
+
+def _generate_questions(simulator, system_prompt, user_prompt,
+                        force_fresh=False, on_progress=None, banked=()):
     """
-    Wrapper que llama a DeepSeek (call_deepseek).
-    Puede extenderse para soportar múltiples proveedores.
+    Obtiene y guarda las preguntas del simulador: desde la caché, en
+    streaming (SIMULATOR_LLM_STREAMING) o con una llamada completa. Las
+    preguntas del banco (banked) van primero; user_prompt=None publica
+    solo esas, sin llamar al LLM.
+
+    Returns:
+        tuple: (questions | None, error_kind | None, error_detail)
+        error_kind: 'api' (sin respuesta) o 'validation'
     """
-    return call_deepseek(system_prompt, user_prompt)
+    banked = list(banked)
+    if user_prompt is None:
+        _report_progress(on_progress, 80, 'Guardando preguntas del banco', simulator)
+        _publish_with_questions(simulator, banked)
+        question_bank.mark_served(q['bank_question_id'] for q in banked)
+        return banked, None, None
+
+    if streaming_enabled():
+        cached = None
+        if llm_cache.is_enabled() and not force_fresh:
+            cached = llm_cache.get(_cache_key(system_prompt, user_prompt))
+        if cached is None:
+            questions, error = _stream_and_persist(
+                simulator, system_prompt, user_prompt, on_progress, banked
+            )
+            if error:
+                return None, 'validation', error
+            question_bank.mark_served(q['bank_question_id'] for q in banked)
+            return questions, None, None
+        raw_data = cached
+    else:
+        raw_data = call_ai_provider(system_prompt, user_prompt, force_fresh=force_fresh)
+        if raw_data is None:
+            return None, 'api', 'API call failed or timed out'
+
+    mix = DIFFICULTY_MIX if simulator.simulator_type == Simulator.SimulatorType.DIAGNOSTIC else None
+    questions = _salvage_with_top_up(system_prompt, user_prompt, raw_data, mix)
+    if questions is None:
+        ai_providers.mark_validation_failed('Preguntas inválidas')
+        return None, 'validation', f'Validation failed: {str(raw_data)[:200]}'
+
+    questions = banked + _drop_duplicates(questions, banked)
+    _report_progress(on_progress, 80, 'Guardando preguntas', simulator)
+    _publish_with_questions(simulator, questions)
+    question_bank.mark_served(q['bank_question_id'] for q in banked)
+    return questions, None, None
 
 
-def generate_simulator(session, student):
+def call_ai_provider(system_prompt, user_prompt, force_fresh=False):
+    """
+    Llama al proveedor configurado (SIMULATOR_AI_PROVIDER, ver
+    ai_providers.call_llm).
+
+    Una solicitud idéntica a una ya respondida (mismo prompt, modelo y
+    temperatura) se sirve desde llm_cache sin llamar a la API. Solo se
+    cachean respuestas completas (sin preguntas descartadas ni truncadas).
+    force_fresh=True ignora la entrada cacheada y la reemplaza con la
+    respuesta nueva.
+    """
+    use_cache = llm_cache.is_enabled()
+    key = _cache_key(system_prompt, user_prompt) if use_cache else None
+    if use_cache and not force_fresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    raw_data = call_llm(system_prompt, user_prompt)
+    if use_cache and raw_data is not None:
+        result = salvage(raw_data)
+        # Una respuesta rescatada a medias no se reutiliza
+        if result.questions and not result.dropped and not result.truncated:
+            llm_cache.put(key, result.questions, model_label())
+    return raw_data
+
+
+def forget_cached_response(user_prompt):
+    """Invalida la respuesta cacheada de un prompt (p. ej. simulacro rechazado)."""
+    if not user_prompt:
+        return 0
+    return llm_cache.forget(_cache_key(build_system_prompt(), user_prompt))
+
+
+def generate_simulator(session, student, on_progress=None, force_fresh=False):
     """
     Main entry point: student triggers AI generation of a diagnostic
     simulator from the tutor's session materials.
     Tutor does NOT interact with AI at any point.
+
+    on_progress(percent, message, simulator) se invoca en cada etapa
+    cuando la generación corre como trabajo en segundo plano.
+    force_fresh=True no usa la caché de respuestas del LLM.
+
     Returns: (success: bool, message: str)
     """
     from apps.academicTutoring.models import SessionMaterial
-    from apps.simulators.models import Simulator, SimulatorQuestion
 
     # Step 1 — Check materials exist
-    materials = SessionMaterial.objects.filter(session=session)
-    if not materials.exists():
+    materials = list(
+        SessionMaterial.objects.filter(session=session).select_related('extraction')
+    )
+    if not materials:
         return False, (
             "La sesión no tiene materiales. "
             "El tutor debe subir material primero."
@@ -345,7 +719,29 @@ def generate_simulator(session, student):
             f"Apruébalo o recházalo desde el historial antes de generar uno nuevo."
         )
 
-    # Step 5 — Create Simulator in GENERATING state
+    # Step 5 — Build weak topics context and prompts
+    weak_profiles = StudentWeakTopicProfile.objects.filter(
+        student=student,
+        subject=session.subject,
+        cumulative_score_pct__lt=60
+    ).order_by('cumulative_score_pct')[:5]
+    weak_topics = [p.topic_tag for p in weak_profiles]
+    # Los temas débiles cubiertos por el banco ya no se piden al LLM
+    banked, gap_topics = bank_questions_for(session.subject, weak_topics, student)
+
+    # Normalmente el worker ya extrajo el texto al subir el archivo
+    for mat in materials:
+        ensure_extracted(mat)
+
+    system_prompt = build_system_prompt()
+    user_prompt = build_user_prompt(
+        session, materials, gap_topics,
+        tutor_context=getattr(session, 'tutor_ai_context', None)
+    )
+    url_material = next((m for m in materials if m.type == 'url' and m.url), None)
+    material_texts = [material_text(m) for m in materials]
+
+    # Step 6 — Create Simulator in GENERATING state (una sola escritura)
     simulator = Simulator.objects.create(
         session=session,
         tutor=session.tutor,
@@ -355,76 +751,29 @@ def generate_simulator(session, student):
         generation_status='generating',
         title=f"Simulacro — {session.subject}",
         subject=session.subject,
-        source_material_url=(
-            materials.filter(type='url').first().url
-            if materials.filter(type='url').exists() else None
-        ),
+        source_material_url=url_material.url if url_material else None,
+        source_material_text='\n\n'.join(t for t in material_texts if t) or None,
+        weak_topics_context=weak_topics,
+        generation_prompt=user_prompt,
         max_attempts=3,
     )
+    _report_progress(on_progress, 10, 'Preparando material', simulator)
 
-    # Step 6 — Build weak topics context
-    weak_profiles = StudentWeakTopicProfile.objects.filter(
-        student=student,
-        subject=session.subject,
-        cumulative_score_pct__lt=60
-    ).order_by('cumulative_score_pct')[:5]
-    weak_topics = [p.topic_tag for p in weak_profiles]
-    simulator.weak_topics_context = weak_topics
-    simulator.save(update_fields=['weak_topics_context'])
-
-    # Step 7 — Build prompts
-    system_prompt = build_system_prompt()
-    user_prompt = build_user_prompt(
-        session, materials, weak_topics,
-        tutor_context=getattr(session, 'tutor_ai_context', None)
+    # Step 7 — Call AI provider, validate and persist + publish
+    _report_progress(on_progress, 30, 'Generando preguntas con IA', simulator)
+    questions, error_kind, error = _generate_questions(
+        simulator, system_prompt, user_prompt, force_fresh, on_progress, banked
     )
-    simulator.generation_prompt = user_prompt
-    simulator.save(update_fields=['generation_prompt'])
-
-    # Step 8 — Call AI provider
-    raw_data = call_ai_provider(system_prompt, user_prompt)
-    if raw_data is None:
-        simulator.generation_status = 'failed'
-        simulator.generation_error = 'API call failed or timed out'
-        simulator.save(update_fields=['generation_status', 'generation_error'])
+    if error_kind == 'api':
+        _mark_failed(simulator, error)
         return False, (
             "Error al conectar con el servicio de IA. "
             "Intenta de nuevo en unos minutos."
         )
-
-    # Step 9 — Validate questions
-    questions = validate_questions(raw_data)
     if questions is None:
-        simulator.generation_status = 'failed'
-        simulator.generation_error = f'Validation failed: {str(raw_data)[:200]}'
-        simulator.save(update_fields=['generation_status', 'generation_error'])
+        _mark_failed(simulator, error)
         return False, "La IA no generó preguntas válidas. Intenta de nuevo."
 
-    # Step 10 — Create SimulatorQuestion objects
-    for i, q in enumerate(questions, start=1):
-        SimulatorQuestion.objects.create(
-            simulator=simulator,
-            order=i,
-            topic_tag=q['topic_tag'],
-            difficulty=q['difficulty'],
-            statement=q['statement'],
-            option_a=q['option_a'],
-            option_b=q['option_b'],
-            option_c=q['option_c'],
-            option_d=q['option_d'],
-            correct_option=q['correct_option'],
-            explanation=q.get('explanation', ''),
-            is_active=True,
-        )
-
-    # Step 11 — Publish simulator
-    simulator.generation_status = 'done'
-    simulator.status = 'pending_approval'
-    simulator.published_at = timezone.now()
-    simulator.save(update_fields=[
-        'generation_status', 'status', 'published_at'
-    ])
-
     return True, f"Simulacro generado con {len(questions)} preguntas. Pendiente de revisión del tutor."
 
 
@@ -432,41 +781,39 @@ def generate_simulator(session, student):
 # Generador de simulador de refuerzo
 # ─────────────────────────────────────────────────────────────
 
-def generate_reinforcement_simulator(attempt, student):
-    """
-    Genera un simulador de refuerzo enfocado en los temas débiles
-    del estudiante.
-
-    Returns:
-        (success: bool, message: str)
-    """
-    # Step 1 — Get weak topics for this subject
-    weak_profiles = StudentWeakTopicProfile.objects.filter(
+def _reinforcement_weak_profiles(subject, student):
+    """Temas débiles de la materia, del más débil al menos débil (hasta 8)."""
+    return list(StudentWeakTopicProfile.objects.filter(
         student=student,
-        subject=attempt.simulator.subject,
+        subject=subject,
         cumulative_score_pct__lt=60,
-    ).order_by("cumulative_score_pct")[:8]
+    ).order_by("cumulative_score_pct")[:8])
 
-    if not weak_profiles.exists():
-        return False, (
-            "No se detectaron temas débiles. "
-            "Tu desempeño es bueno en todos los temas evaluados."
-        )
 
-    # Step 2 — Check no duplicate reinforcement simulator for this attempt
+def _reinforcement_blocked(attempt, student):
+    """Mensaje si no corresponde otro refuerzo para este intento, o None."""
+    session = attempt.simulator.session
+    if not check_generation_cooldown(session, student, Simulator.SimulatorType.REINFORCEMENT):
+        return (
+            "Ya se generó un simulacro de refuerzo para esta sesión. "
+            f"Espera {GENERATION_COOLDOWN_HOURS} horas antes de pedir otro."
+        )
     existing = Simulator.objects.filter(
-        session=attempt.simulator.session,
+        session=session,
         student=student,
         simulator_type=Simulator.SimulatorType.REINFORCEMENT,
-    ).filter(
-        created_at__gt=attempt.started_at
-    ).first()
-    if existing and existing.status == Simulator.Status.PUBLISHED:
-        return False, "Ya existe un simulacro de refuerzo generado."
+        created_at__gt=attempt.started_at,
+        status=Simulator.Status.PUBLISHED,
+    ).exists()
+    if existing:
+        return "Ya existe un simulacro de refuerzo generado."
+    return None
+
 
-    # Step 3 — Create Simulator in GENERATING state
+def _create_reinforcement_simulator(attempt, student, weak_profiles, user_prompt):
+    """Simulador de refuerzo en estado GENERATING (una sola escritura)."""
     session = attempt.simulator.session
-    simulator = Simulator.objects.create(
+    return Simulator.objects.create(
         session=session,
         tutor=session.tutor,
         student=student,
@@ -476,55 +823,138 @@ def generate_reinforcement_simulator(attempt, student):
         title=f"Refuerzo — {attempt.simulator.subject}",
         subject=attempt.simulator.subject,
         weak_topics_context=[p.topic_tag for p in weak_profiles],
+        generation_prompt=user_prompt,
         max_attempts=3,
     )
 
-    # Step 4 — Build prompts
+
+def _reinforcement_done_message(question_count):
+    return (
+        f"Simulacro de refuerzo generado con {question_count} "
+        f"preguntas. Pendiente de revisión del tutor."
+    )
+
+
+NO_WEAK_TOPICS_MESSAGE = (
+    "No se detectaron temas débiles. "
+    "Tu desempeño es bueno en todos los temas evaluados."
+)
+
+
+def generate_reinforcement_simulator(attempt, student, on_progress=None, force_fresh=False):
+    """
+    Genera un simulador de refuerzo enfocado en los temas débiles
+    del estudiante. on_progress y force_fresh: igual que en generate_simulator().
+
+    Returns:
+        (success: bool, message: str)
+    """
+    # Step 1 — Get weak topics for this subject
+    weak_profiles = _reinforcement_weak_profiles(attempt.simulator.subject, student)
+    if not weak_profiles:
+        return False, NO_WEAK_TOPICS_MESSAGE
+
+    # Step 2 — Cooldown and no duplicate reinforcement simulator for this attempt
+    blocked = _reinforcement_blocked(attempt, student)
+    if blocked:
+        return False, blocked
+
+    # Step 3 — Banked questions first; the LLM only fills the gaps
+    banked, gap_topics = bank_questions_for(
+        attempt.simulator.subject, [p.topic_tag for p in weak_profiles], student
+    )
     system_prompt = build_system_prompt()
-    user_prompt = build_reinforcement_prompt(attempt, weak_profiles)
-    simulator.generation_prompt = user_prompt
-    simulator.save(update_fields=["generation_prompt"])
-
-    # Step 5 — Call DeepSeek
-    raw_data = call_deepseek(system_prompt, user_prompt)
-    if raw_data is None:
-        simulator.generation_status = Simulator.GenerationStatus.FAILED
-        simulator.generation_error = "API call failed"
-        simulator.save(update_fields=["generation_status", "generation_error"])
+    if gap_topics:
+        user_prompt = build_reinforcement_prompt(
+            attempt, [p for p in weak_profiles if p.topic_tag in gap_topics]
+        )
+    elif len(banked) < REINFORCEMENT_MIN_QUESTIONS:
+        user_prompt = build_reinforcement_prompt(attempt, weak_profiles)
+    else:
+        user_prompt = None  # el banco cubre todos los temas débiles
+
+    # Step 4 — Create Simulator in GENERATING state (una sola escritura)
+    simulator = _create_reinforcement_simulator(attempt, student, weak_profiles, user_prompt)
+    _report_progress(on_progress, 10, 'Analizando temas débiles', simulator)
+
+    # Step 5 — Call AI provider, validate and persist + publish
+    if user_prompt:
+        _report_progress(on_progress, 30, 'Generando preguntas con IA', simulator)
+    questions, error_kind, error = _generate_questions(
+        simulator, system_prompt, user_prompt, force_fresh, on_progress, banked
+    )
+    if error_kind == 'api':
+        _mark_failed(simulator, error)
         return False, "Error al conectar con la IA. Intenta de nuevo."
-
-    # Step 6 — Validate and create questions
-    questions = validate_questions(raw_data)
     if questions is None:
-        simulator.generation_status = Simulator.GenerationStatus.FAILED
-        simulator.generation_error = "Validation failed"
-        simulator.save(update_fields=["generation_status", "generation_error"])
+        _mark_failed(simulator, error)
         return False, "La IA no generó preguntas válidas. Intenta de nuevo."
 
-    for i, q in enumerate(questions, start=1):
-        SimulatorQuestion.objects.create(
-            simulator=simulator,
-            order=i,
-            topic_tag=q["topic_tag"],
-            difficulty=q["difficulty"],
-            statement=q["statement"],
-            option_a=q["option_a"],
-            option_b=q["option_b"],
-            option_c=q["option_c"],
-            option_d=q["option_d"],
-            correct_option=q["correct_option"],
-            explanation=q.get("explanation", ""),
-            is_active=True,
-        )
+    return True, _reinforcement_done_message(len(questions))
 
-    # Step 7 — Publish
-    simulator.generation_status = Simulator.GenerationStatus.DONE
-    simulator.status = Simulator.Status.PENDING_APPROVAL
-    simulator.published_at = timezone.now()
-    simulator.save(update_fields=[
-        "generation_status", "status", "published_at"
-    ])
-    return True, (
-        f"Simulacro de refuerzo generado con {len(questions)} "
-        f"preguntas. Pendiente de revisión del tutor."
+
+def generate_reinforcement_batch(requests, on_progress=None):
+    """
+    Refuerzo para varios estudiantes del mismo tutor con la misma materia
+    y los mismos temas débiles (ver services.reinforcement_batch_key): una
+    sola llamada al LLM y las preguntas se copian a un simulador por
+    estudiante. Las preguntas del banco no se usan aquí.
+
+    El prompt es neutral (build_batch_reinforcement_prompt): nombra los
+    temas débiles comunes, sin puntajes ni material de un estudiante. Cada
+    simulador guarda los temas débiles de su propio estudiante
+    (weak_topics_context).
+
+    Args:
+        requests: [(attempt, student), ...]
+        on_progress: avance del primero (el trabajo que tomó el worker)
+
+    Returns:
+        list[(success, message, simulator | None)]: en el orden de requests
+    """
+    results = [None] * len(requests)
+    pending = []  # (índice, attempt, student, temas débiles)
+    for i, (attempt, student) in enumerate(requests):
+        weak_profiles = _reinforcement_weak_profiles(attempt.simulator.subject, student)
+        blocked = None if weak_profiles else NO_WEAK_TOPICS_MESSAGE
+        blocked = blocked or _reinforcement_blocked(attempt, student)
+        if blocked:
+            results[i] = (False, blocked, None)
+        else:
+            pending.append((i, attempt, student, weak_profiles))
+    if not pending:
+        return results
+
+    user_prompt = build_batch_reinforcement_prompt(
+        pending[0][1].simulator.subject,
+        _shared_topics([weak_profiles for *_, weak_profiles in pending]),
     )
+    simulators = [
+        _create_reinforcement_simulator(attempt, student, weak_profiles, user_prompt)
+        for _, attempt, student, weak_profiles in pending
+    ]
+    _report_progress(on_progress, 30, f'Generando preguntas para {len(pending)} estudiantes',
+                     simulators[0])
+
+    system_prompt = build_system_prompt()
+    raw_data = call_ai_provider(system_prompt, user_prompt)
+    questions = (_salvage_with_top_up(system_prompt, user_prompt, raw_data)
+                 if raw_data is not None else None)
+    if raw_data is not None and questions is None:
+        ai_providers.mark_validation_failed('Preguntas inválidas')
+    if questions is None:
+        error = ('API call failed or timed out' if raw_data is None
+                 else f'Validation failed: {str(raw_data)[:200]}')
+        message = ("Error al conectar con la IA. Intenta de nuevo." if raw_data is None
+                   else "La IA no generó preguntas válidas. Intenta de nuevo.")
+        for (i, *_), simulator in zip(pending, simulators):
+            _mark_failed(simulator, error)
+            results[i] = (False, message, simulator)
+        return results
+
+    _report_progress(on_progress, 80, 'Guardando preguntas', simulators[0])
+    for (i, *_), simulator in zip(pending, simulators):
+        _publish_with_questions(simulator, questions)
+        results[i] = (True, _reinforcement_done_message(len(questions)), simulator)
+    logger.info("Reinforcement batch: %s simulators from one LLM call", len(simulators))
+    return results
@@ -0,0 +1,419 @@
+"""
+Proveedores de LLM para la generación de simuladores.
+
+- get_provider()   → proveedor configurado en SIMULATOR_AI_PROVIDER
+- call_llm()       → respuesta completa, parseada como JSON (o None); los
+                     fallos habituales del JSON se reparan (llm_output.loads)
+- stream_llm()     → respuesta en streaming, fragmento a fragmento
+- model_label()    → "proveedor:modelo" (parte de la clave de llm_cache)
+- mark_validation_failed() → la última llamada del hilo no dio preguntas válidas
+- heartbeat()      → callback de latido mientras se espera turno o respuesta
+
+Proveedores registrados en PROVIDERS:
+- 'deepseek' → API de DeepSeek (DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_MODEL)
+- 'openai'   → cualquier endpoint compatible con OpenAI
+               (OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL)
+- 'stub'     → local y determinista: fabrica preguntas válidas a partir del
+               prompt, con latencia SIMULATOR_AI_STUB_LATENCY_MS. Sirve para
+               pruebas de carga del pipeline completo sin red ni costo.
+
+Cada llamada ocupa un turno de un semáforo del proceso
+(SIMULATOR_AI_MAX_CONCURRENT_CALLS): si el proveedor se pone lento, los
+hilos del worker esperan su turno en lugar de acumular conexiones. Cada
+llamada deja una fila AIProviderCall con tokens, costo estimado, latencia,
+tiempo de espera y resultado (ok / validation_failed / timeout / error), y
+se suma a su AIProviderDailyUsage (ai_usage). Si la respuesta llega pero
+sus preguntas no validan, ai_generator llama a mark_validation_failed().
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+
+from . import ai_usage, llm_output
+from .models import AIProviderCall
+
+logger = logging.getLogger(__name__)
+
+TEMPERATURE = 0.7
+MAX_TOKENS = 4000
+# Estimación de tokens cuando el proveedor no reporta el uso
+CHARS_PER_TOKEN = 4
+
+_slots = None
+_slots_lock = threading.Lock()
+# Última llamada registrada por este hilo (para mark_validation_failed)
+_local = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ProviderBusy(TimeoutError):
+    """No se obtuvo turno del semáforo de llamadas a tiempo."""
+
+
+# ─────────────────────────────────────────────────────────────
+# Proveedores
+# ─────────────────────────────────────────────────────────────
+
+class OpenAICompatibleProvider:
+    """Chat completions de una API compatible con OpenAI."""
+
+    name = 'openai'
+    billable = True
+
+    def __init__(self, base_url, api_key, model):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.model = model
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+            os.getenv('OPENAI_API_KEY', ''),
+            os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+        )
+
+    def _request(self, system_prompt, user_prompt, stream=False):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": TEMPERATURE,
+            "max_tokens": MAX_TOKENS,
+            "response_format": {"type": "json_object"},
+        }
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return f"{self.base_url}/chat/completions", headers, payload
+
+    def complete(self, system_prompt, user_prompt, usage):
+        """Texto de la respuesta; llena usage con los tokens reportados."""
+        import requests
+
+        url, headers, payload = self._request(system_prompt, user_prompt)
+        r = requests.post(url, headers=headers, json=payload, timeout=120)
+        if r.status_code >= 400:
+            logger.error("%s HTTP %s — %s", self.name, r.status_code, r.text[:500])
+        r.raise_for_status()
+        data = r.json()
+        usage.update(data.get("usage") or {})
+        return data["choices"][0]["message"]["content"]
+
+    def stream(self, system_prompt, user_prompt, usage):
+        """
+        Produce el texto de la respuesta fragmento a fragmento (eventos SSE
+        "data: {...}"). Los errores de red o HTTP se propagan.
+        """
+        import requests
+
+        url, headers, payload = self._request(system_prompt, user_prompt, stream=True)
+        # timeout de lectura = silencio máximo entre fragmentos
+        with requests.post(url, headers=headers, json=payload,
+                           stream=True, timeout=(10, 60)) as r:
+            r.raise_for_status()
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                usage.update(event.get("usage") or {})
+                choices = event.get("choices") or [{}]
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+
+class DeepSeekProvider(OpenAICompatibleProvider):
+    name = 'deepseek'
+
+    @classmethod
+    def from_env(cls):
+        api_key = os.getenv("DEEPSEEK_API_KEY", "").strip()
+        if not api_key:
+            # Fallback: intentar con OPENAI_API_KEY
+            api_key = os.getenv("OPENAI_API_KEY", "")
+        return cls(
+            os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1"),
+            api_key,
+            os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
+        )
+
+
+class StubProvider:
+    """
+    Proveedor local y determinista: el mismo prompt produce siempre las
+    mismas preguntas, válidas según el esquema del SYSTEM_PROMPT.
+    """
+
+    name = 'stub'
+    billable = False
+    model = 'stub-v1'
+    DIFFICULTIES = ('low', 'medium', 'high')
+
+    @classmethod
+    def from_env(cls):
+        return cls()
+
+    def _questions(self, system_prompt, user_prompt):
+        rng = random.Random(
+            hashlib.sha256(f"{system_prompt}\n{user_prompt}".encode('utf-8')).digest()
+        )
+        count = _setting('SIMULATOR_AI_STUB_QUESTIONS', 50)
+        questions = []
+        for i in range(count):
+            a, b = rng.randint(2, 99), rng.randint(2, 99)
+            answer = a + b
+            options = rng.sample(
+                [answer, answer + 1, answer - 1, answer + 10, answer - 10], 4
+            )
+            if answer not in options:
+                options[rng.randrange(4)] = answer
+            correct = 'ABCD'[options.index(answer)]
+            questions.append({
+                "topic_tag": f"Tema simulado {rng.randint(1, 5)}",
+                # 40 % low, 40 % medium, 20 % high, como pide SYSTEM_PROMPT
+                "difficulty": self.DIFFICULTIES[min(2, i * 5 // (2 * count))],
+                "statement": f"Pregunta {i + 1} de prueba: ¿cuánto es {a} más {b}?",
+                "option_a": str(options[0]),
+                "option_b": str(options[1]),
+                "option_c": str(options[2]),
+                "option_d": str(options[3]),
+                "correct_option": correct,
+                "explanation": f"{a} + {b} = {answer}.",
+            })
+        return json.dumps({"questions": questions}, ensure_ascii=False)
+
+    @staticmethod
+    def _estimate_usage(usage, prompt, completion):
+        usage["prompt_tokens"] = len(prompt) // CHARS_PER_TOKEN
+        usage["completion_tokens"] = len(completion) // CHARS_PER_TOKEN
+
+    def complete(self, system_prompt, user_prompt, usage):
+        text = self._questions(system_prompt, user_prompt)
+        time.sleep(_setting('SIMULATOR_AI_STUB_LATENCY_MS', 0) / 1000)
+        self._estimate_usage(usage, system_prompt + user_prompt, text)
+        return text
+
+    def stream(self, system_prompt, user_prompt, usage):
+        text = self._questions(system_prompt, user_prompt)
+        chunks = [text[i:i + 200] for i in range(0, len(text), 200)]
+        delay = _setting('SIMULATOR_AI_STUB_LATENCY_MS', 0) / 1000 / len(chunks)
+        self._estimate_usage(usage, system_prompt + user_prompt, text)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+
+PROVIDERS = {
+    'deepseek': DeepSeekProvider,
+    'openai': OpenAICompatibleProvider,
+    'stub': StubProvider,
+}
+
+
+def get_provider(name=None):
+    name = name or _setting('SIMULATOR_AI_PROVIDER', 'deepseek')
+    try:
+        return PROVIDERS[name].from_env()
+    except KeyError:
+        raise ValueError(f"Proveedor de IA desconocido: {name!r}") from None
+
+
+def model_label(provider=None):
+    provider = provider or get_provider()
+    return f"{provider.name}:{provider.model}"
+
+
+# ─────────────────────────────────────────────────────────────
+# Límite de concurrencia y registro de llamadas
+# ─────────────────────────────────────────────────────────────
+
+def _get_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(
+                max(1, _setting('SIMULATOR_AI_MAX_CONCURRENT_CALLS', 4))
+            )
+        return _slots
+
+
+# Cada cuánto avisa el latido mientras se espera turno
+SLOT_BEAT_SECONDS = 30
+
+
+@contextmanager
+def heartbeat(callback):
+    """
+    Mientras dura el bloque, la espera de turno y cada llamada al proveedor
+    llaman a callback() (el latido del trabajo de generación, para que
+    requeue_stuck_jobs no lo tome por caído durante esperas largas).
+    """
+    previous = getattr(_local, 'heartbeat', None)
+    _local.heartbeat = callback
+    try:
+        yield
+    finally:
+        _local.heartbeat = previous
+
+
+def _beat():
+    callback = getattr(_local, 'heartbeat', None)
+    if callback is not None:
+        callback()
+
+
+@contextmanager
+def provider_slot():
+    """Turno del semáforo del proceso; ProviderBusy si no llega a tiempo."""
+    slots = _get_slots()
+    deadline = time.monotonic() + _setting('SIMULATOR_AI_SLOT_TIMEOUT_SECONDS', 300)
+    while not slots.acquire(timeout=max(0, min(SLOT_BEAT_SECONDS, deadline - time.monotonic()))):
+        if time.monotonic() >= deadline:
+            raise ProviderBusy("Sin turno para llamar al proveedor de IA")
+        _beat()
+    _beat()
+    try:
+        yield
+    finally:
+        slots.release()
+        _beat()
+
+
+def estimate_cost(provider, prompt_tokens, completion_tokens):
+    if not provider.billable:
+        return Decimal('0')
+    per_million = Decimal(1_000_000)
+    input_cost = Decimal(str(_setting('SIMULATOR_AI_INPUT_COST_PER_MTOK', 0.27)))
+    output_cost = Decimal(str(_setting('SIMULATOR_AI_OUTPUT_COST_PER_MTOK', 1.10)))
+    cost = (prompt_tokens * input_cost + completion_tokens * output_cost) / per_million
+    return cost.quantize(Decimal('0.000001'))
+
+
+def failure_outcome(exc):
+    """Resultado de una llamada que lanzó exc."""
+    import requests
+
+    if isinstance(exc, (TimeoutError, requests.Timeout)):
+        return AIProviderCall.Outcome.TIMEOUT
+    if isinstance(exc, ValueError):
+        return AIProviderCall.Outcome.VALIDATION_FAILED  # JSON inválido
+    return AIProviderCall.Outcome.ERROR
+
+
+def record_call(provider, streamed, usage, started, waited, error=None, outcome=None):
+    prompt_tokens = int(usage.get('prompt_tokens') or 0)
+    completion_tokens = int(usage.get('completion_tokens') or 0)
+    if outcome is None:
+        outcome = AIProviderCall.Outcome.OK if error is None else AIProviderCall.Outcome.ERROR
+    call = AIProviderCall.objects.create(
+        provider=provider.name,
+        model_name=provider.model[:100],
+        streamed=streamed,
+        success=outcome == AIProviderCall.Outcome.OK,
+        outcome=outcome,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost_usd=estimate_cost(provider, prompt_tokens, completion_tokens),
+        latency_ms=int((time.monotonic() - started) * 1000),
+        wait_ms=int(waited * 1000),
+        error=(error or '')[:255],
+    )
+    ai_usage.add_call(call)
+    _local.last_call = call
+    return call
+
+
+def mark_validation_failed(detail=''):
+    """
+    La última llamada de este hilo respondió, pero su contenido no pasó la
+    validación de preguntas: pasa de 'ok' a 'validation_failed'.
+    """
+    call = getattr(_local, 'last_call', None)
+    _local.last_call = None
+    if call is not None and call.outcome == AIProviderCall.Outcome.OK:
+        ai_usage.change_outcome(call, AIProviderCall.Outcome.VALIDATION_FAILED, detail)
+
+
+def call_llm(system_prompt, user_prompt):
+    """
+    Llama al proveedor configurado y retorna el JSON parseado.
+
+    Returns:
+        dict | None: JSON parseado de la respuesta, o None si falla.
+    """
+    provider = get_provider()
+    usage, error, outcome = {}, None, None
+    _local.last_call = None
+    queued = time.monotonic()
+    try:
+        with provider_slot():
+            started = time.monotonic()
+            try:
+                content = provider.complete(system_prompt, user_prompt, usage)
+                return llm_output.loads(content)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                outcome = failure_outcome(e)
+                logger.error("%s call failed: %s", provider.name, error)
+                return None
+            finally:
+                record_call(provider, False, usage, started, started - queued, error, outcome)
+    except ProviderBusy as e:
+        logger.error("%s: %s", provider.name, e)
+        return None
+
+
+def stream_llm(system_prompt, user_prompt):
+    """
+    Llama al proveedor configurado en streaming y produce el texto de la
+    respuesta fragmento a fragmento. Los errores se propagan: quien consume
+    decide qué hacer con lo que ya llegó.
+    """
+    provider = get_provider()
+    usage, error, outcome = {}, None, None
+    _local.last_call = None
+    received = 0
+    queued = time.monotonic()
+    with provider_slot():
+        started = time.monotonic()
+        try:
+            for chunk in provider.stream(system_prompt, user_prompt, usage):
+                received += len(chunk)
+                yield chunk
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            outcome = failure_outcome(e)
+            raise
+        finally:
+            if not usage.get('prompt_tokens'):
+                # El uso llega en el último evento: si el stream se cortó
+                # antes, se estima para no registrar la llamada en cero
+                usage.update(
+                    prompt_tokens=len(system_prompt + user_prompt) // CHARS_PER_TOKEN,
+                    completion_tokens=received // CHARS_PER_TOKEN,
+                )
+            record_call(provider, True, usage, started, started - queued, error, outcome)
@@ -0,0 +1,105 @@
+"""
+Uso diario de los proveedores de LLM (AIProviderDailyUsage).
+
+- add_call()            → suma una llamada recién registrada a su día
+- change_outcome()      → pasa una llamada ya sumada a otro resultado (p. ej.
+                          ok → validation_failed cuando sus preguntas no
+                          pasan la validación)
+- rebuild_daily_usage() → recalcula todo desde AIProviderCall (carga inicial
+                          o reparación)
+
+Cada llamada se suma con un UPDATE de F() sobre la fila (día, proveedor,
+modelo); ninguna vista ni el admin recorren AIProviderCall para mostrar
+costo, tokens o latencia por día.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import AIProviderCall, AIProviderDailyUsage
+
+
+def _row_key(call):
+    return {
+        'day': timezone.localdate(call.created_at),
+        'provider': call.provider,
+        'model_name': call.model_name,
+    }
+
+
+def add_call(call):
+    """Suma la llamada a la fila de su día (la crea si no existe)."""
+    key = _row_key(call)
+    AIProviderDailyUsage.objects.bulk_create(
+        [AIProviderDailyUsage(**key)], ignore_conflicts=True
+    )
+    outcome_field = AIProviderDailyUsage.OUTCOME_FIELDS[call.outcome]
+    AIProviderDailyUsage.objects.filter(**key).update(
+        calls=F('calls') + 1,
+        prompt_tokens=F('prompt_tokens') + call.prompt_tokens,
+        completion_tokens=F('completion_tokens') + call.completion_tokens,
+        cost_usd=F('cost_usd') + call.cost_usd,
+        latency_ms_total=F('latency_ms_total') + call.latency_ms,
+        latency_ms_max=Greatest(F('latency_ms_max'), Value(call.latency_ms)),
+        wait_ms_total=F('wait_ms_total') + call.wait_ms,
+        updated_at=timezone.now(),
+        **{outcome_field: F(outcome_field) + 1},
+    )
+
+
+def change_outcome(call, outcome, error=''):
+    """
+    Cambia el resultado de una llamada y mueve su cuenta en el día.
+    Condicional sobre el resultado anterior: nunca se cuenta dos veces.
+    """
+    fields = AIProviderDailyUsage.OUTCOME_FIELDS
+    old_field, new_field = fields[call.outcome], fields[outcome]
+    if old_field == new_field:
+        return False
+    with transaction.atomic():
+        updated = AIProviderCall.objects.filter(pk=call.pk, outcome=call.outcome).update(
+            outcome=outcome,
+            success=outcome == AIProviderCall.Outcome.OK,
+            error=call.error or error[:255],
+        )
+        if updated:
+            AIProviderDailyUsage.objects.filter(**_row_key(call)).update(
+                updated_at=timezone.now(),
+                **{old_field: F(old_field) - 1, new_field: F(new_field) + 1},
+            )
+    if updated:
+        call.outcome = outcome
+        call.success = outcome == AIProviderCall.Outcome.OK
+    return bool(updated)
+
+
+def rebuild_daily_usage():
+    """
+    Recalcula todas las filas diarias desde el registro de llamadas.
+
+    Returns:
+        int: filas creadas
+    """
+    outcome_counts = {
+        field: Count('pk', filter=Q(outcome=outcome))
+        for outcome, field in AIProviderDailyUsage.OUTCOME_FIELDS.items()
+    }
+    totals = AIProviderCall.objects.annotate(
+        day=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    ).values('day', 'provider', 'model_name').annotate(
+        calls=Count('pk'),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        cost_usd=Sum('cost_usd'),
+        latency_ms_total=Sum('latency_ms'),
+        latency_ms_max=Max('latency_ms'),
+        wait_ms_total=Sum('wait_ms'),
+        **outcome_counts,
+    ).order_by()
+
+    rows = [AIProviderDailyUsage(**row) for row in totals]
+    with transaction.atomic():
+        AIProviderDailyUsage.objects.all().delete()
+        AIProviderDailyUsage.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,171 @@
+"""
+Análisis de ítems de las preguntas de simuladores (QuestionStats).
+
+- refresh_question_stats() → procesa los intentos completados pendientes,
+                             por lotes, y actualiza las estadísticas
+- apply_response()         → suma una respuesta a las sumas de QuestionStats
+- recompute()              → p, discriminación, mediana de tiempo y bandera
+
+Es incremental: cada intento se procesa una sola vez (marca
+SimulatorAttempt.item_stats_at) y QuestionStats guarda sumas suficientes,
+así que nunca se vuelve a recorrer la tabla de respuestas (las lee con
+response_store, estén en filas o compactas). Lo ejecuta
+`manage.py compute_item_stats` (Railway Cron); ninguna vista lo llama.
+
+Con al menos SIMULATOR_ITEM_MIN_RESPONSES respuestas se marca la pregunta:
+clave dudosa, discriminación negativa, demasiado difícil o fácil. Las
+preguntas con clave dudosa o discriminación negativa se retiran del banco.
+"""
+import logging
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BankedQuestion, QuestionStats, SimulatorAttempt, SimulatorQuestion
+from .response_store import response_rows
+
+logger = logging.getLogger(__name__)
+
+Flag = QuestionStats.Flag
+TOO_EASY_P = 0.95
+TOO_HARD_P = 0.15
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def apply_response(stats, selected, is_correct, rest_score, seconds):
+    """Suma una respuesta a las estadísticas (sin guardar)."""
+    stats.responses += 1
+    stats.correct += is_correct
+    if selected:
+        field = f'count_{selected.lower()}'
+        setattr(stats, field, getattr(stats, field) + 1)
+    else:
+        stats.unanswered += 1
+    stats.sum_rest += rest_score
+    stats.sum_rest_sq += rest_score * rest_score
+    stats.sum_rest_correct += rest_score * is_correct
+    if seconds:
+        if len(stats.time_histogram) < QuestionStats.TIME_BINS:
+            stats.time_histogram += [0] * (QuestionStats.TIME_BINS - len(stats.time_histogram))
+        stats.time_histogram[min(seconds // QuestionStats.TIME_BIN_SECONDS,
+                                 QuestionStats.TIME_BINS - 1)] += 1
+
+
+def _point_biserial(stats):
+    """Correlación entre acertar la pregunta y el puntaje del resto."""
+    n, k = stats.responses, stats.correct
+    var_rest = n * stats.sum_rest_sq - stats.sum_rest ** 2
+    var_item = n * k - k * k
+    if var_rest <= 0 or var_item <= 0:
+        return None
+    return (n * stats.sum_rest_correct - stats.sum_rest * k) / math.sqrt(var_rest * var_item)
+
+
+def _median_time(histogram):
+    total = sum(histogram)
+    if not total:
+        return None
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if seen * 2 >= total:
+            return i * QuestionStats.TIME_BIN_SECONDS + QuestionStats.TIME_BIN_SECONDS // 2
+    return None
+
+
+def recompute(stats, correct_option):
+    """Recalcula los indicadores derivados de las sumas."""
+    if not stats.responses:
+        return
+    stats.p_value = round(stats.correct / stats.responses, 4)
+    r = _point_biserial(stats)
+    stats.discrimination = round(r, 4) if r is not None else None
+    stats.median_time_seconds = _median_time(stats.time_histogram)
+
+    stats.flag = Flag.NONE
+    if stats.responses < _setting('SIMULATOR_ITEM_MIN_RESPONSES', 20):
+        return
+    rates = stats.distractor_rates()
+    top_distractor = max(rate for option, rate in rates.items() if option != correct_option)
+    if top_distractor > rates.get(correct_option, 0):
+        stats.flag = Flag.KEY_SUSPECT
+    elif stats.discrimination is not None and stats.discrimination < 0:
+        stats.flag = Flag.NEGATIVE_DISCRIMINATION
+    elif stats.p_value <= TOO_HARD_P:
+        stats.flag = Flag.TOO_HARD
+    elif stats.p_value >= TOO_EASY_P:
+        stats.flag = Flag.TOO_EASY
+
+
+def _process_batch(batch_size):
+    """Procesa un lote de intentos pendientes. Devuelve (intentos, preguntas)."""
+    with transaction.atomic():
+        attempts = dict(
+            SimulatorAttempt.objects.select_for_update(skip_locked=True).filter(
+                status=SimulatorAttempt.AttemptStatus.COMPLETED,
+                item_stats_at__isnull=True,
+            ).order_by('pk').values_list('pk', 'correct_count')[:batch_size]
+        )
+        if not attempts:
+            return 0, 0
+
+        rows = response_rows(attempts)
+        correct_options = dict(SimulatorQuestion.objects.filter(
+            pk__in={row[1] for row in rows}
+        ).values_list('pk', 'correct_option'))
+        by_question = {}
+        for attempt_id, question_id, selected, is_correct, seconds in rows:
+            if question_id not in correct_options:
+                continue
+            by_question.setdefault(question_id, (correct_options[question_id], []))[1].append(
+                (selected, int(is_correct), attempts[attempt_id] - int(is_correct), seconds)
+            )
+
+        QuestionStats.objects.bulk_create(
+            [QuestionStats(question_id=qid) for qid in by_question],
+            ignore_conflicts=True,
+        )
+        stats = list(QuestionStats.objects.select_for_update().filter(
+            question_id__in=list(by_question)
+        ).order_by('question_id'))
+        for item in stats:
+            correct_option, responses = by_question[item.question_id]
+            for response in responses:
+                apply_response(item, *response)
+            recompute(item, correct_option)
+        QuestionStats.objects.bulk_update(stats, QuestionStats.ACCUMULATED_FIELDS)
+
+        SimulatorAttempt.objects.filter(pk__in=list(attempts)).update(
+            item_stats_at=timezone.now()
+        )
+        retired = BankedQuestion.objects.filter(
+            is_active=True,
+            served__stats__in=[s for s in stats if s.flag in QuestionStats.BROKEN_FLAGS],
+        ).update(is_active=False)
+        if retired:
+            logger.info('Item analysis: %s banked questions retired', retired)
+    return len(attempts), len(stats)
+
+
+def refresh_question_stats(batch_size=200, max_batches=None):
+    """
+    Procesa todos los intentos completados pendientes en lotes de
+    batch_size intentos (cada lote en su transacción).
+
+    Returns:
+        tuple: (intentos procesados, estadísticas actualizadas)
+    """
+    processed = updated = batches = 0
+    while max_batches is None or batches < max_batches:
+        attempts, questions = _process_batch(batch_size)
+        if not attempts:
+            break
+        processed += attempts
+        updated += questions
+        batches += 1
+    return processed, updated
@@ -0,0 +1,137 @@
+"""
+Caché de respuestas del LLM para la generación de simuladores.
+
+- make_key()   → hash sha256 de (prompt de sistema, prompt de usuario
+                 normalizado, modelo, temperatura)
+- get()        → preguntas validadas cacheadas (o None)
+- put()        → guarda una respuesta validada y aplica el tope de tamaño
+- forget()     → invalida una clave (p. ej. el tutor rechazó el simulacro)
+- stats()      → métricas: entradas, aciertos y tasa de aciertos
+
+Vive en la base de datos (LLMResponseCache) para que el worker y la web
+compartan las mismas entradas. Configuración en settings:
+SIMULATOR_LLM_CACHE_ENABLED, SIMULATOR_LLM_CACHE_TTL_HOURS y
+SIMULATOR_LLM_CACHE_MAX_ENTRIES.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Contadores del proceso (el worker hace todas las generaciones)
+_counters = {'hits': 0, 'misses': 0}
+_counters_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_enabled():
+    return _setting('SIMULATOR_LLM_CACHE_ENABLED', True)
+
+
+def normalize_prompt(prompt):
+    """Colapsa espacios y saltos de línea: cambios de formato no invalidan."""
+    return ' '.join((prompt or '').split())
+
+
+def make_key(system_prompt, user_prompt, model, temperature):
+    raw = json.dumps([
+        hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+        normalize_prompt(user_prompt),
+        model,
+        round(float(temperature), 3),
+    ], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def get(key):
+    """
+    Devuelve el payload cacheado ({"questions": [...]}) o None si no hay
+    entrada vigente. Cada acierto actualiza el contador y el último uso.
+    """
+    now = timezone.now()
+    entry = LLMResponseCache.objects.filter(
+        key=key, expires_at__gt=now
+    ).only('pk', 'payload').first()
+    if entry is None:
+        _count('misses')
+        return None
+
+    LLMResponseCache.objects.filter(pk=entry.pk).update(
+        hits=F('hits') + 1, last_used_at=now
+    )
+    _count('hits')
+    logger.info('LLM cache hit %s', key[:12])
+    return entry.payload
+
+
+def put(key, questions, model):
+    """Guarda preguntas ya validadas y recorta la caché a su tamaño máximo."""
+    now = timezone.now()
+    ttl = timedelta(hours=_setting('SIMULATOR_LLM_CACHE_TTL_HOURS', 168))
+    LLMResponseCache.objects.update_or_create(
+        key=key,
+        defaults={
+            'model_name': model[:100],
+            'payload': {'questions': questions},
+            'question_count': len(questions),
+            'last_used_at': now,
+            'expires_at': now + ttl,
+        },
+    )
+    evict()
+
+
+def forget(key):
+    return LLMResponseCache.objects.filter(key=key).delete()[0]
+
+
+def evict():
+    """
+    Borra las entradas vencidas y, si se supera
+    SIMULATOR_LLM_CACHE_MAX_ENTRIES, las de uso más antiguo.
+
+    Returns:
+        int: entradas eliminadas
+    """
+    removed = LLMResponseCache.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+    max_entries = _setting('SIMULATOR_LLM_CACHE_MAX_ENTRIES', 500)
+    overflow = LLMResponseCache.objects.order_by('-last_used_at').values_list(
+        'pk', flat=True
+    )[max_entries:]
+    overflow = list(overflow)
+    if overflow:
+        removed += LLMResponseCache.objects.filter(pk__in=overflow).delete()[0]
+    return removed
+
+
+def stats():
+    """Métricas de la caché: persistentes (tabla) y del proceso actual."""
+    with _counters_lock:
+        hits, misses = _counters['hits'], _counters['misses']
+    lookups = hits + misses
+    totals = LLMResponseCache.objects.aggregate(hits=Sum('hits'))
+    return {
+        'entries': LLMResponseCache.objects.count(),
+        'total_hits': totals['hits'] or 0,
+        'process_hits': hits,
+        'process_misses': misses,
+        'process_hit_rate': round(hits / lookups, 3) if lookups else None,
+    }
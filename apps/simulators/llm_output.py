@@ -0,0 +1,239 @@
+"""
+Lectura tolerante de la respuesta del LLM.
+
+- loads()                → JSON de la respuesta: quita cercas de markdown y
+                           texto alrededor, comas colgantes y, si llegó
+                           truncada, rescata las preguntas que alcanzaron a
+                           cerrarse (marca "truncated")
+- QuestionStreamParser   → extrae preguntas completas del JSON parcial
+- clean_question()       → una pregunta contra el esquema, normalizada, o None
+- salvage()              → preguntas válidas de una respuesta, sin enunciados
+                           repetidos, y cuántas se descartaron por dificultad
+
+Una pregunta inválida ya no invalida la respuesta completa: se descarta y
+ai_generator pide solo las que faltan (SIMULATOR_LLM_TOP_UP_ROUNDS).
+"""
+import json
+import logging
+import re
+from collections import Counter, namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionStreamParser:
+    """
+    Parser incremental del arreglo "questions" de la respuesta del LLM.
+
+    feed() recibe texto parcial y devuelve los objetos pregunta que se
+    completaron con ese fragmento. Una respuesta truncada conserva todas
+    las preguntas que alcanzaron a cerrarse.
+    """
+
+    _ARRAY_START = re.compile(r'"questions"\s*:\s*\[')
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+        self.finished = False
+
+    def feed(self, text):
+        if self.finished:
+            return []
+        self._buffer += text
+        if not self._in_array:
+            match = self._ARRAY_START.search(self._buffer)
+            if match is None:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        found = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        found.append(json.loads(buf[self._start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._start = None
+            elif ch == "]" and self._depth == 0:
+                self.finished = True
+                i += 1
+                break
+            i += 1
+
+        # Descartar lo ya procesado que no forma parte de un objeto abierto
+        keep_from = self._start if self._start is not None else i
+        self._buffer = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._start is not None:
+            self._start = 0
+        return found
+
+
+# ─────────────────────────────────────────────────────────────
+# Reparación del JSON
+# ─────────────────────────────────────────────────────────────
+
+_FENCE_OPEN = re.compile(r'^\s*```[\w-]*[ \t]*\n?')
+_FENCE_CLOSE = re.compile(r'\n?```\s*$')
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+
+def strip_fences(text):
+    """Quita las cercas ```json ... ``` que el modelo agrega a veces."""
+    return _FENCE_CLOSE.sub('', _FENCE_OPEN.sub('', text.strip()))
+
+
+def loads(text):
+    """
+    JSON de la respuesta del LLM, reparando los fallos habituales.
+
+    Returns:
+        dict | list: JSON parseado. Si la respuesta venía truncada, un dict
+        con las preguntas rescatadas y "truncated": True.
+
+    Raises:
+        ValueError: si no hay JSON ni preguntas recuperables.
+    """
+    text = strip_fences(text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    # Texto antes o después del objeto, comas colgantes
+    start, end = text.find('{'), text.rfind('}')
+    if 0 <= start < end:
+        candidate = text[start:end + 1]
+        for attempt in (candidate, _TRAILING_COMMA.sub(r'\1', candidate)):
+            try:
+                data = json.loads(attempt)
+            except ValueError:
+                continue
+            logger.warning("LLM output repaired (text around the JSON object)")
+            return data
+
+    # Truncada: se rescatan las preguntas que se cerraron
+    questions = QuestionStreamParser().feed(text)
+    if not questions:
+        raise ValueError("Respuesta del LLM sin JSON recuperable")
+    logger.warning("LLM output truncated: %s questions salvaged", len(questions))
+    return {"questions": questions, "truncated": True}
+
+
+# ─────────────────────────────────────────────────────────────
+# Esquema de una pregunta
+# ─────────────────────────────────────────────────────────────
+
+REQUIRED_KEYS = frozenset({
+    "topic_tag",
+    "difficulty",
+    "statement",
+    "option_a",
+    "option_b",
+    "option_c",
+    "option_d",
+    "correct_option",
+})
+TEXT_KEYS = ("topic_tag", "statement", "option_a", "option_b", "option_c", "option_d")
+DIFFICULTY_ORDER = ("low", "medium", "high")
+DIFFICULTY_ALIASES = {
+    "low": "low", "easy": "low", "baja": "low", "bajo": "low", "facil": "low", "fácil": "low",
+    "medium": "medium", "media": "medium", "medio": "medium", "intermedia": "medium",
+    "high": "high", "hard": "high", "alta": "high", "alto": "high",
+    "dificil": "high", "difícil": "high",
+}
+# "B", "b", "B)", "(B)", "option_b", "Opción B"
+_CORRECT_OPTION = re.compile(r'(?:option[_ ]?|opci[oó]n\s*)?\(?([A-D])\)?\.?', re.IGNORECASE)
+
+
+def statement_key(statement):
+    """Enunciado sin mayúsculas ni espacios repetidos (para detectar copias)."""
+    return " ".join(statement.lower().split())
+
+
+def clean_question(q):
+    """
+    Pregunta normalizada (textos sin espacios sobrantes, dificultad y
+    opción correcta canónicas), o None si no cumple el esquema.
+    """
+    if not isinstance(q, dict) or not REQUIRED_KEYS <= q.keys():
+        return None
+    if not all(isinstance(q[k], str) and q[k].strip() for k in TEXT_KEYS):
+        return None
+    difficulty = q["difficulty"]
+    difficulty = DIFFICULTY_ALIASES.get(difficulty.strip().lower()) if isinstance(difficulty, str) else None
+    option = q["correct_option"]
+    option = _CORRECT_OPTION.fullmatch(option.strip()) if isinstance(option, str) else None
+    explanation = q.get("explanation")
+    if difficulty is None or option is None or not (explanation is None or isinstance(explanation, str)):
+        return None
+
+    cleaned = {k: q[k].strip() for k in TEXT_KEYS}
+    cleaned.update(
+        difficulty=difficulty,
+        correct_option=option.group(1).upper(),
+        explanation=(explanation or "").strip(),
+    )
+    return cleaned
+
+
+Salvage = namedtuple("Salvage", "questions dropped truncated")
+
+
+def salvage(raw_data, seen=()):
+    """
+    Preguntas válidas de la respuesta, una por una.
+
+    Args:
+        raw_data: JSON de la respuesta (ver loads())
+        seen: claves de enunciado ya incluidas (statement_key)
+
+    Returns:
+        Salvage: questions (válidas, sin enunciados repetidos), dropped
+        (Counter de descartadas por dificultad; 'medium' si no se sabe) y
+        truncated (la respuesta venía cortada)
+    """
+    if not isinstance(raw_data, dict) or not isinstance(raw_data.get("questions"), list):
+        return Salvage([], Counter(), False)
+
+    seen = set(seen)
+    questions, dropped = [], Counter()
+    for q in raw_data["questions"]:
+        cleaned = clean_question(q)
+        key = statement_key(cleaned["statement"]) if cleaned else None
+        if cleaned is None or key in seen:
+            guess = q.get("difficulty") if isinstance(q, dict) else None
+            guess = DIFFICULTY_ALIASES.get(guess.strip().lower()) if isinstance(guess, str) else None
+            dropped[guess or "medium"] += 1
+            continue
+        seen.add(key)
+        questions.append(cleaned)
+
+    if dropped:
+        logger.info("LLM output: %s questions dropped (%s kept)", sum(dropped.values()), len(questions))
+    return Salvage(questions, dropped, bool(raw_data.get("truncated")))
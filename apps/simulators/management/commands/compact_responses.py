@@ -0,0 +1,30 @@
+"""
+Django management command: compacta las respuestas de intentos completados.
+
+Uso:
+    python manage.py compact_responses
+    python manage.py compact_responses --batch-size 500
+
+Pensado para ejecutarse periódicamente (Railway Cron, p. ej. una vez al
+día). Pasa a PackedResponses los intentos completados hace más de
+SIMULATOR_COMPACT_RESPONSES_AFTER_HOURS y borra sus filas de
+SimulatorResponse; ver apps/simulators/response_store.py.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.simulators.response_store import compact_responses
+
+
+class Command(BaseCommand):
+    help = 'Compacta las respuestas de los intentos completados (una fila por intento)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Intentos por transacción')
+
+    def handle(self, *args, **options):
+        attempts, rows = compact_responses(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f'{attempts} intentos compactados, {rows} respuestas borradas.'
+        ))
@@ -0,0 +1,29 @@
+"""
+Django management command: análisis de ítems de las preguntas.
+
+Uso:
+    python manage.py compute_item_stats
+    python manage.py compute_item_stats --batch-size 500
+
+Pensado para ejecutarse periódicamente (Railway Cron, p. ej. cada hora).
+Suma a QuestionStats solo los intentos completados desde la última
+ejecución; ver apps/simulators/item_analysis.py.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.simulators.item_analysis import refresh_question_stats
+
+
+class Command(BaseCommand):
+    help = 'Actualiza las estadísticas de ítem (QuestionStats) con los intentos nuevos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Intentos por transacción')
+
+    def handle(self, *args, **options):
+        attempts, questions = refresh_question_stats(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f'{attempts} intentos procesados, {questions} preguntas actualizadas.'
+        ))
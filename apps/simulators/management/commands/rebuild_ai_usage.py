@@ -0,0 +1,22 @@
+"""
+Django management command: recalcula el uso diario de los proveedores de IA.
+
+Uso:
+    python manage.py rebuild_ai_usage
+
+Los totales diarios se mantienen solos con cada llamada registrada; este
+comando los reconstruye desde AIProviderCall (carga inicial tras el
+despliegue o reparación). Ver apps/simulators/ai_usage.py.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.simulators.ai_usage import rebuild_daily_usage
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el uso diario de proveedores de IA (AIProviderDailyUsage)'
+
+    def handle(self, *args, **options):
+        created = rebuild_daily_usage()
+        self.stdout.write(self.style.SUCCESS(f'{created} días reconstruidos.'))
@@ -0,0 +1,22 @@
+"""
+Django management command: recalcula los temas débiles por tutor.
+
+Uso:
+    python manage.py rebuild_tutor_topics
+
+Los agregados se mantienen solos al cerrar cada intento; este comando los
+reconstruye desde cero (carga inicial tras el despliegue o datos cargados
+por fuera de submit_attempt). Ver apps/simulators/tutor_topics.py.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.simulators.tutor_topics import rebuild_tutor_topic_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los agregados de temas débiles por tutor (TutorTopicAggregate)'
+
+    def handle(self, *args, **options):
+        created = rebuild_tutor_topic_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'{created} agregados reconstruidos.'))
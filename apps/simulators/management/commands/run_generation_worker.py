@@ -0,0 +1,114 @@
+"""
+Django management command: worker de la cola de generación de simuladores.
+
+Uso:
+    python manage.py run_generation_worker
+    python manage.py run_generation_worker --concurrency 4
+    python manage.py run_generation_worker --once      # vacía la cola y termina
+
+Toma trabajos SimulatorGenerationJob en orden de llegada y los ejecuta en
+un pool de hilos (las llamadas al LLM son I/O, no CPU). Antes atiende las
+extracciones de texto de materiales recién subidos, que la generación
+necesita. Cada cierto tiempo re-encola los trabajos de workers caídos.
+En Railway corre como servicio aparte con SERVER_MODE=worker (ver start.sh).
+"""
+
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.academicTutoring.material_extraction import (
+    claim_next_extraction, run_extraction,
+)
+from apps.simulators import llm_cache
+from apps.simulators.services import (
+    claim_next_job, run_generation_job, requeue_stuck_jobs,
+)
+
+
+def _run_job(job):
+    close_old_connections()
+    try:
+        run_generation_job(job)
+    finally:
+        close_old_connections()
+
+
+def _run_extraction(extraction):
+    close_old_connections()
+    try:
+        run_extraction(extraction)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de generación de simuladores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=getattr(settings, 'SIMULATOR_WORKER_CONCURRENCY', 2),
+            help='Generaciones simultáneas en este proceso'
+        )
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--once', action='store_true',
+                            help='Procesar lo que haya en cola y salir')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        recovery_every = getattr(settings, 'SIMULATOR_JOB_STALE_SECONDS', 600) / 4
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f'Worker {worker_id} iniciado (concurrencia {concurrency}).')
+        running = set()
+        last_recovery = 0.0
+        processed = 0
+
+        with ThreadPoolExecutor(max_workers=concurrency,
+                                thread_name_prefix='simgen') as pool:
+            while not self.stopping:
+                if time.monotonic() - last_recovery >= recovery_every:
+                    requeue_stuck_jobs()
+                    last_recovery = time.monotonic()
+
+                running = {f for f in running if not f.done()}
+                while len(running) < concurrency:
+                    extraction = claim_next_extraction()
+                    if extraction is None:
+                        break
+                    running.add(pool.submit(_run_extraction, extraction))
+
+                while len(running) < concurrency:
+                    job = claim_next_job(worker_id)
+                    if job is None:
+                        break
+                    running.add(pool.submit(_run_job, job))
+                    processed += 1
+
+                if options['once'] and not running:
+                    break
+                close_old_connections()
+                time.sleep(poll_interval)
+
+            # Al detenerse se esperan las generaciones en curso
+        cache = llm_cache.stats()
+        self.stdout.write(
+            f"Caché LLM: {cache['process_hits']} aciertos / "
+            f"{cache['process_misses']} fallos, {cache['entries']} entradas."
+        )
+        self.stdout.write(self.style.SUCCESS(f'Worker detenido: {processed} trabajos procesados.'))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
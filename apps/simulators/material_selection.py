@@ -0,0 +1,149 @@
+"""
+Selección de fragmentos de material por relevancia para el prompt del LLM.
+
+- split_passages()   → divide el texto extraído en pasajes de tamaño similar
+- bm25_scores()      → puntaje BM25 de cada pasaje contra una consulta
+- select_passages()  → empaqueta los pasajes más relevantes en un presupuesto
+                       de caracteres, conservando el orden original
+
+La consulta se arma con la materia, la instrucción del tutor y los temas
+débiles. En lugar de cortar cada material a ciegas, el LLM recibe los
+pasajes que más hablan de lo que se va a evaluar.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+PASSAGE_CHARS = 800
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+    ante antes aqui asi aun bajo cada como con contra cual cuales cuando
+    de del desde donde dos el ella ellas ellos en entre era eran es esa esas
+    ese eso esos esta estan estas este esto estos fue fueron hay la las le
+    les lo los mas mismo muy nos o otra otras otro otros para pero por porque
+    que se sea segun ser si sin sobre son su sus tambien tiene tienen todo
+    todos tras un una uno unos unas y ya the and for with that this from
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def tokenize(text):
+    """Minúsculas, sin tildes, sin palabras vacías ni tokens de 1-2 letras."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return [w for w in _WORD.findall(text) if len(w) > 2 and w not in STOPWORDS]
+
+
+def _split_long(paragraph, size):
+    """Parte un párrafo largo por oraciones (o a la fuerza si no hay)."""
+    pieces, current = [], ''
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > size:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:size])
+            sentence = sentence[size:]
+        if current and len(current) + len(sentence) + 1 > size:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_passages(text, size=PASSAGE_CHARS):
+    """
+    Divide el texto en pasajes de hasta `size` caracteres, uniendo
+    párrafos cortos consecutivos y partiendo los largos por oraciones.
+    """
+    passages, current = [], ''
+    for paragraph in re.split(r'\n\s*\n', text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in (_split_long(paragraph, size) if len(paragraph) > size else [paragraph]):
+            if current and len(current) + len(piece) + 2 > size:
+                passages.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(passages_tokens, query_tokens, k1=BM25_K1, b=BM25_B):
+    """Puntaje BM25 de cada pasaje (lista de tokens) contra la consulta."""
+    n = len(passages_tokens)
+    if not n or not query_tokens:
+        return [0.0] * n
+
+    query = set(query_tokens)
+    freqs = [Counter(tokens) for tokens in passages_tokens]
+    lengths = [len(tokens) for tokens in passages_tokens]
+    avg_len = (sum(lengths) / n) or 1.0
+    doc_freq = Counter(term for tf in freqs for term in query if term in tf)
+    idf = {
+        term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for term, df in doc_freq.items()
+    }
+
+    scores = []
+    for tf, length in zip(freqs, lengths):
+        norm = k1 * (1 - b + b * length / avg_len)
+        scores.append(sum(
+            weight * tf[term] * (k1 + 1) / (tf[term] + norm)
+            for term, weight in idf.items() if term in tf
+        ))
+    return scores
+
+
+def select_passages(documents, query, budget):
+    """
+    Elige los pasajes más relevantes de varios documentos sin pasar de
+    `budget` caracteres.
+
+    Args:
+        documents: lista de textos (uno por material)
+        query: texto de la consulta (materia, instrucción, temas débiles)
+        budget: máximo de caracteres entre todos los pasajes
+
+    Returns:
+        list[list[str]]: pasajes elegidos por documento, en orden original.
+        Sin coincidencias con la consulta se prefieren los primeros pasajes.
+    """
+    candidates = []  # (doc_idx, pos, passage)
+    for doc_idx, text in enumerate(documents):
+        for pos, passage in enumerate(split_passages(text)):
+            candidates.append((doc_idx, pos, passage))
+
+    scores = bm25_scores(
+        [tokenize(passage) for _, _, passage in candidates], tokenize(query)
+    )
+    # Desempate: pasajes más cercanos al inicio de su documento
+    ranked = sorted(
+        range(len(candidates)),
+        key=lambda i: (-scores[i], candidates[i][1], candidates[i][0]),
+    )
+
+    chosen, used = set(), 0
+    for i in ranked:
+        cost = len(candidates[i][2]) + 2
+        if used + cost > budget:
+            continue
+        chosen.add(i)
+        used += cost
+
+    selected = [[] for _ in documents]
+    for i in sorted(chosen):
+        doc_idx, _, passage = candidates[i]
+        selected[doc_idx].append(passage)
+    return selected
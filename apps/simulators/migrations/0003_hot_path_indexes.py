@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0002_simulator_approval_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='simulator',
+            index=models.Index(fields=['session', 'student', 'status'], name='sim_session_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulator',
+            index=models.Index(fields=['student', 'status', '-created_at'], name='sim_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulator',
+            index=models.Index(
+                fields=['session'],
+                condition=models.Q(generation_status='generating'),
+                name='sim_generating_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='studentweaktopicprofile',
+            index=models.Index(
+                fields=['student', 'subject', 'cumulative_score_pct'],
+                name='weak_topic_score_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academicTutoring', '0022_hot_path_indexes'),
+        ('simulators', '0003_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulatorGenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('diagnostic', 'Diagnóstico'), ('reinforcement', 'Refuerzo')], default='diagnostic', max_length=20, verbose_name='Tipo de simulador')),
+                ('status', models.CharField(choices=[('queued', 'En cola'), ('running', 'En proceso'), ('done', 'Terminado'), ('failed', 'Fallido')], default='queued', max_length=10, verbose_name='Estado')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('progress_message', models.CharField(blank=True, default='', max_length=200)),
+                ('result_message', models.TextField(blank=True, default='', verbose_name='Resultado')),
+                ('tries', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos de ejecución')),
+                ('worker', models.CharField(blank=True, default='', max_length=100, verbose_name='Worker')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último latido')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reinforcement_jobs', to='simulators.simulatorattempt', verbose_name='Intento de origen')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requested_generation_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to='academicTutoring.classsession', verbose_name='Sesión de clase')),
+                ('simulator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_jobs', to='simulators.simulator', verbose_name='Simulador generado')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='simulator_generation_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Estudiante')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de generación',
+                'verbose_name_plural': 'Trabajos de generación',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['created_at'], name='genjob_queued_idx'), models.Index(condition=models.Q(('status', 'running')), fields=['heartbeat_at'], name='genjob_running_idx')],
+            },
+        ),
+    ]
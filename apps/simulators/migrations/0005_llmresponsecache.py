@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0004_simulatorgenerationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Clave (sha256)')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('payload', models.JSONField(verbose_name='Preguntas validadas')),
+                ('question_count', models.PositiveSmallIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Aciertos')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Último uso')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Respuesta cacheada del LLM',
+                'verbose_name_plural': 'Respuestas cacheadas del LLM',
+                'ordering': ['-last_used_at'],
+                'indexes': [models.Index(fields=['expires_at'], name='llmcache_expires_idx'), models.Index(fields=['last_used_at'], name='llmcache_last_used_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0005_llmresponsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulator',
+            name='generated_question_count',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Preguntas generadas'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0006_simulator_generated_question_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankedQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject_key', models.CharField(max_length=200, verbose_name='Materia (normalizada)')),
+                ('topic_key', models.CharField(max_length=100, verbose_name='Tema (normalizado)')),
+                ('topic_tag', models.CharField(max_length=100, verbose_name='Tema')),
+                ('difficulty', models.CharField(choices=[('low', 'Baja'), ('medium', 'Media'), ('high', 'Alta')], default='medium', max_length=10, verbose_name='Dificultad')),
+                ('statement', models.TextField(verbose_name='Enunciado')),
+                ('option_a', models.TextField(verbose_name='Opción A')),
+                ('option_b', models.TextField(verbose_name='Opción B')),
+                ('option_c', models.TextField(verbose_name='Opción C')),
+                ('option_d', models.TextField(verbose_name='Opción D')),
+                ('correct_option', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')], max_length=1, verbose_name='Opción correcta')),
+                ('explanation', models.TextField(blank=True, default='', verbose_name='Explicación')),
+                ('signature', models.JSONField(default=list, verbose_name='Firma MinHash')),
+                ('times_served', models.PositiveIntegerField(default=0, verbose_name='Veces usada')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activa')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source_simulator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='banked_questions', to='simulators.simulator', verbose_name='Simulador de origen')),
+            ],
+            options={
+                'verbose_name': 'Pregunta del banco',
+                'verbose_name_plural': 'Banco de preguntas',
+                'ordering': ['subject_key', 'topic_key'],
+            },
+        ),
+        migrations.AddField(
+            model_name='simulatorquestion',
+            name='bank_question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='served', to='simulators.bankedquestion', verbose_name='Pregunta del banco'),
+        ),
+        migrations.AddIndex(
+            model_name='bankedquestion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['subject_key', 'topic_key'], name='bank_subject_topic_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0007_bankedquestion_simulatorquestion_bank_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIProviderCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=30, verbose_name='Proveedor')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('streamed', models.BooleanField(default=False, verbose_name='Streaming')),
+                ('success', models.BooleanField(default=False, verbose_name='Exitosa')),
+                ('prompt_tokens', models.PositiveIntegerField(default=0, verbose_name='Tokens de entrada')),
+                ('completion_tokens', models.PositiveIntegerField(default=0, verbose_name='Tokens de salida')),
+                ('cost_usd', models.DecimalField(decimal_places=6, default=0, max_digits=10, verbose_name='Costo estimado (USD)')),
+                ('latency_ms', models.PositiveIntegerField(default=0, verbose_name='Latencia (ms)')),
+                ('wait_ms', models.PositiveIntegerField(default=0, verbose_name='Espera de turno (ms)')),
+                ('error', models.CharField(blank=True, default='', max_length=255, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Llamada a proveedor de IA',
+                'verbose_name_plural': 'Llamadas a proveedores de IA',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='aicall_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0008_aiprovidercall'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulator',
+            name='questions_version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Versión de las preguntas'),
+        ),
+    ]
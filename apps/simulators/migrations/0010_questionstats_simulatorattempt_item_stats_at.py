@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0009_simulator_questions_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('responses', models.PositiveIntegerField(default=0, verbose_name='Respuestas')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name='Correctas')),
+                ('unanswered', models.PositiveIntegerField(default=0, verbose_name='Sin responder')),
+                ('count_a', models.PositiveIntegerField(default=0)),
+                ('count_b', models.PositiveIntegerField(default=0)),
+                ('count_c', models.PositiveIntegerField(default=0)),
+                ('count_d', models.PositiveIntegerField(default=0)),
+                ('sum_rest', models.FloatField(default=0)),
+                ('sum_rest_sq', models.FloatField(default=0)),
+                ('sum_rest_correct', models.FloatField(default=0)),
+                ('time_histogram', models.JSONField(default=list, verbose_name='Histograma de tiempos')),
+                ('p_value', models.FloatField(blank=True, null=True, verbose_name='Dificultad (p)')),
+                ('discrimination', models.FloatField(blank=True, null=True, verbose_name='Discriminación (punto-biserial)')),
+                ('median_time_seconds', models.PositiveIntegerField(blank=True, null=True, verbose_name='Mediana de tiempo (s)')),
+                ('flag', models.CharField(blank=True, choices=[('', 'Sin observaciones'), ('key_suspect', 'Clave dudosa (un distractor supera a la correcta)'), ('negative_discrimination', 'Discriminación negativa'), ('too_hard', 'Demasiado difícil'), ('too_easy', 'Demasiado fácil')], default='', max_length=30, verbose_name='Observación')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadística de pregunta',
+                'verbose_name_plural': 'Estadísticas de preguntas',
+            },
+        ),
+        migrations.AddField(
+            model_name='simulatorattempt',
+            name='item_stats_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Procesado en estadísticas'),
+        ),
+        migrations.AddIndex(
+            model_name='simulatorattempt',
+            index=models.Index(condition=models.Q(('item_stats_at__isnull', True), ('status', 'completed')), fields=['id'], name='attempt_item_stats_idx'),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='question',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='simulators.simulatorquestion', verbose_name='Pregunta'),
+        ),
+        migrations.AddIndex(
+            model_name='questionstats',
+            index=models.Index(condition=models.Q(('flag', ''), _negated=True), fields=['flag'], name='qstats_flagged_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0010_questionstats_simulatorattempt_item_stats_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorTopicAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200, verbose_name='Materia')),
+                ('topic_tag', models.CharField(max_length=100, verbose_name='Tema específico')),
+                ('student_count', models.PositiveIntegerField(default=0, verbose_name='Estudiantes')),
+                ('weak_count', models.PositiveIntegerField(default=0, verbose_name='Estudiantes con el tema débil')),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Suma de puntajes acumulados')),
+                ('mean_score_pct', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Puntaje promedio (%)')),
+                ('trend', models.DecimalField(decimal_places=2, default=0, help_text='Promedio móvil del cambio de puntaje por intento (positivo = mejora)', max_digits=6, verbose_name='Tendencia (puntos)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('tutor', models.ForeignKey(limit_choices_to={'user_type': 'tutor'}, on_delete=django.db.models.deletion.CASCADE, related_name='topic_aggregates', to=settings.AUTH_USER_MODEL, verbose_name='Tutor')),
+            ],
+            options={
+                'verbose_name': 'Tema débil por tutor',
+                'verbose_name_plural': 'Temas débiles por tutor',
+                'ordering': ['-weak_count', 'mean_score_pct'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TutorTopicStudent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_pct', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Puntaje acumulado (%)')),
+                ('aggregate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='simulators.tutortopicaggregate', verbose_name='Agregado')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Estudiante')),
+            ],
+            options={
+                'verbose_name': 'Estudiante de tema por tutor',
+                'verbose_name_plural': 'Estudiantes de temas por tutor',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tutortopicaggregate',
+            index=models.Index(fields=['tutor', '-weak_count', 'mean_score_pct'], name='tutor_topic_weak_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tutortopicaggregate',
+            unique_together={('tutor', 'subject', 'topic_tag')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tutortopicstudent',
+            unique_together={('aggregate', 'student')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0011_tutortopicaggregate_tutortopicstudent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackedResponses',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='packed_responses', serialize=False, to='simulators.simulatorattempt', verbose_name='Intento')),
+                ('question_count', models.PositiveSmallIntegerField(default=0, verbose_name='Preguntas')),
+                ('question_ids', models.BinaryField(verbose_name='IDs de pregunta')),
+                ('options', models.BinaryField(verbose_name='Opciones seleccionadas')),
+                ('correct_bits', models.BinaryField(verbose_name='Aciertos')),
+                ('seconds', models.BinaryField(verbose_name='Tiempos (segundos)')),
+                ('packed_at', models.DateTimeField(auto_now_add=True, verbose_name='Compactado el')),
+            ],
+            options={
+                'verbose_name': 'Respuestas compactas',
+                'verbose_name_plural': 'Respuestas compactas',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0012_packedresponses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulatorattempt',
+            name='adaptive_state',
+            field=models.JSONField(blank=True, default=dict, help_text='Habilidad estimada, dificultades y preguntas servidas', verbose_name='Estado adaptativo'),
+        ),
+        migrations.AddField(
+            model_name='simulatorattempt',
+            name='is_adaptive',
+            field=models.BooleanField(default=False, verbose_name='Adaptativo'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0013_simulatorattempt_adaptive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulatorgenerationjob',
+            name='batch_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Clave de lote'),
+        ),
+    ]
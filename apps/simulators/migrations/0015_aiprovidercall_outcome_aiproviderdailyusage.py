@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+def backfill_outcome(apps, schema_editor):
+    # Las llamadas fallidas previas solo guardaban el texto del error
+    AIProviderCall = apps.get_model('simulators', 'AIProviderCall')
+    failed = AIProviderCall.objects.filter(success=False)
+    failed.filter(error__icontains='timeout').update(outcome='timeout')
+    failed.exclude(error__icontains='timeout').update(outcome='error')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0014_simulatorgenerationjob_batch_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiprovidercall',
+            name='outcome',
+            field=models.CharField(choices=[('ok', 'Correcta'), ('validation_failed', 'Respuesta inválida'), ('timeout', 'Tiempo agotado'), ('error', 'Error del proveedor')], default='ok', max_length=20, verbose_name='Resultado'),
+        ),
+        migrations.CreateModel(
+            name='AIProviderDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('provider', models.CharField(max_length=30, verbose_name='Proveedor')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Llamadas')),
+                ('ok_calls', models.PositiveIntegerField(default=0, verbose_name='Correctas')),
+                ('validation_failed_calls', models.PositiveIntegerField(default=0, verbose_name='Respuesta inválida')),
+                ('timeout_calls', models.PositiveIntegerField(default=0, verbose_name='Tiempo agotado')),
+                ('error_calls', models.PositiveIntegerField(default=0, verbose_name='Error del proveedor')),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens de entrada')),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens de salida')),
+                ('cost_usd', models.DecimalField(decimal_places=6, default=0, max_digits=12, verbose_name='Costo estimado (USD)')),
+                ('latency_ms_total', models.PositiveBigIntegerField(default=0, verbose_name='Latencia total (ms)')),
+                ('latency_ms_max', models.PositiveIntegerField(default=0, verbose_name='Latencia máxima (ms)')),
+                ('wait_ms_total', models.PositiveBigIntegerField(default=0, verbose_name='Espera total (ms)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Uso diario de proveedor de IA',
+                'verbose_name_plural': 'Uso diario de proveedores de IA',
+                'ordering': ['-day', 'provider', 'model_name'],
+                'unique_together': {('day', 'provider', 'model_name')},
+            },
+        ),
+        migrations.RunPython(backfill_outcome, migrations.RunPython.noop),
+    ]
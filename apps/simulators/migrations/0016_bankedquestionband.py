@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:55
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_bands(apps, schema_editor):
+    # Mismas bandas que question_bank.band_keys (16 bandas de 4 posiciones)
+    BankedQuestion = apps.get_model('simulators', 'BankedQuestion')
+    BankedQuestionBand = apps.get_model('simulators', 'BankedQuestionBand')
+    bands = []
+    entries = BankedQuestion.objects.values_list('pk', 'subject_key', 'signature')
+    for pk, subject_key, signature in entries.iterator(chunk_size=1000):
+        if len(signature or ()) != 64:
+            continue
+        for band in range(16):
+            rows = ','.join(str(value) for value in signature[band * 4:(band + 1) * 4])
+            key = hashlib.blake2b(
+                f'{subject_key}|{band}|{rows}'.encode('utf-8'), digest_size=16
+            ).hexdigest()
+            bands.append(BankedQuestionBand(entry_id=pk, band_key=key))
+        if len(bands) >= 1000:
+            BankedQuestionBand.objects.bulk_create(bands)
+            bands = []
+    BankedQuestionBand.objects.bulk_create(bands)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulators', '0015_aiprovidercall_outcome_aiproviderdailyusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankedQuestionBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band_key', models.CharField(db_index=True, max_length=32, verbose_name='Banda')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='simulators.bankedquestion', verbose_name='Pregunta del banco')),
+            ],
+            options={
+                'verbose_name': 'Banda LSH del banco',
+                'verbose_name_plural': 'Bandas LSH del banco',
+                'unique_together': {('entry', 'band_key')},
+            },
+        ),
+        migrations.RunPython(backfill_bands, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+import struct
+
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 
@@ -8,26 +11,89 @@ def update_weak_topic_profile(attempt):
     """
     Actualiza (o crea) StudentWeakTopicProfile para cada tema del intento.
     Debe llamarse DESPUÉS de attempt.calculate_score().
+
+    Número fijo de sentencias sin importar cuántos temas tenga el intento:
+    1. INSERT ... ON CONFLICT DO NOTHING de los perfiles que falten
+    2. SELECT ... FOR UPDATE de todos los perfiles del intento
+    3. un solo UPDATE (bulk_update) con los acumulados recalculados
+    4. los agregados del tutor (también en número fijo de sentencias)
+
+    El bloqueo de filas serializa dos envíos simultáneos del mismo
+    estudiante: el segundo lee los acumulados que dejó el primero.
     """
-    subject = attempt.simulator.subject
-    student = attempt.student
+    from .tutor_topics import update_tutor_topic_aggregates
 
-    for topic, stats in attempt.performance_by_topic.items():
-        correct = stats.get('correct', 0)
-        total = stats.get('total', 0)
-
-        profile, _ = StudentWeakTopicProfile.objects.get_or_create(
-            student=student,
-            subject=subject,
-            topic_tag=topic,
-            defaults={
-                'total_questions_seen': 0,
-                'total_correct': 0,
-                'cumulative_score_pct': 0,
-                'consecutive_failures': 0,
-            }
+    stats_by_topic = attempt.performance_by_topic
+    if not stats_by_topic:
+        return []
+
+    student = attempt.student
+    subject = attempt.simulator.subject
+    now = timezone.now()
+
+    with transaction.atomic():
+        StudentWeakTopicProfile.objects.bulk_create(
+            [
+                StudentWeakTopicProfile(student=student, subject=subject, topic_tag=topic)
+                for topic in stats_by_topic
+            ],
+            ignore_conflicts=True,
         )
-        profile.update_from_attempt(correct=correct, questions_in_topic=total)
+        profiles = list(
+            StudentWeakTopicProfile.objects.select_for_update().filter(
+                student=student, subject=subject, topic_tag__in=list(stats_by_topic)
+            ).order_by('topic_tag')
+        )
+        for profile in profiles:
+            stats = stats_by_topic[profile.topic_tag]
+            profile.apply_attempt(
+                correct=stats.get('correct', 0),
+                questions_in_topic=stats.get('total', 0),
+            )
+            profile.last_seen = now
+        StudentWeakTopicProfile.objects.bulk_update(
+            profiles, StudentWeakTopicProfile.ACCUMULATED_FIELDS
+        )
+        update_tutor_topic_aggregates(attempt, profiles)
+    return profiles
+
+
+class SimulatorManager(models.Manager):
+    """
+    Consultas de Simulator para las vistas de listado.
+    """
+
+    def get_student_simulators(self, student, statuses):
+        """
+        Simuladores del estudiante anotados con su progreso, en una sola
+        consulta (sin consultas por simulador):
+
+        - attempt_count: intentos del estudiante (Count)
+        - last_attempt_score: puntaje del último intento (Subquery)
+        - can_attempt: publicado/aprobado y con intentos disponibles
+
+        Returns:
+            QuerySet: ordenado del más reciente al más antiguo
+        """
+        last_attempt = SimulatorAttempt.objects.filter(
+            simulator=models.OuterRef('pk'), student=student
+        ).order_by('-started_at').values('score')[:1]
+        return self.get_queryset().filter(
+            student=student, status__in=statuses
+        ).select_related('session', 'tutor').annotate(
+            attempt_count=models.Count('attempts', filter=models.Q(attempts__student=student)),
+            last_attempt_score=models.Subquery(last_attempt),
+        ).annotate(
+            can_attempt=models.Case(
+                models.When(
+                    status__in=[Simulator.Status.PUBLISHED, Simulator.Status.APPROVED],
+                    attempt_count__lt=models.F('max_attempts'),
+                    then=models.Value(True),
+                ),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        ).order_by('-created_at', '-pk')
 
 
 class Simulator(models.Model):
@@ -143,6 +209,17 @@ class Simulator(models.Model):
         null=True,
         verbose_name='Error de generación si falló'
     )
+    # Preguntas ya guardadas durante una generación en streaming
+    generated_question_count = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Preguntas generadas'
+    )
+    # Sube con cada edición de preguntas; versiona el payload compilado
+    # (ver question_payload.py)
+    questions_version = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Versión de las preguntas'
+    )
 
     # Tiempo límite por pregunta en segundos (0 = sin límite)
     time_limit_per_question = models.PositiveIntegerField(
@@ -177,10 +254,23 @@ class Simulator(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SimulatorManager()
+
     class Meta:
         verbose_name = 'Simulador'
         verbose_name_plural = 'Simuladores'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['session', 'student', 'status'], name='sim_session_student_status_idx'),
+            # Lista de simulacros del estudiante
+            models.Index(fields=['student', 'status', '-created_at'], name='sim_student_status_idx'),
+            # Simuladores atascados en generación (historial del tutor, recuperación)
+            models.Index(
+                fields=['session'],
+                condition=models.Q(generation_status='generating'),
+                name='sim_generating_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_simulator_type_display()}) — {self.student.name}"
@@ -292,6 +382,16 @@ class SimulatorQuestion(models.Model):
         verbose_name='Activa'
     )
 
+    # Pregunta del banco de la que proviene (o a la que se agregó al aprobarse)
+    bank_question = models.ForeignKey(
+        'BankedQuestion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='served',
+        verbose_name='Pregunta del banco'
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -336,6 +436,12 @@ class SimulatorAttempt(models.Model):
         COMPLETED = 'completed', 'Completado'
         ABANDONED = 'abandoned', 'Abandonado'
 
+    # Campos que escribe calculate_score()
+    SCORE_FIELDS = [
+        'score', 'correct_count', 'incorrect_count',
+        'unanswered_count', 'performance_by_topic'
+    ]
+
     simulator = models.ForeignKey(
         Simulator,
         on_delete=models.CASCADE,
@@ -394,12 +500,33 @@ class SimulatorAttempt(models.Model):
 
     started_at = models.DateTimeField(auto_now_add=True, verbose_name='Inicio')
     finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+    # Cuándo sus respuestas entraron a QuestionStats (null = pendiente)
+    item_stats_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Procesado en estadísticas'
+    )
+
+    # Modo adaptativo: una pregunta a la vez hasta que la habilidad
+    # estimada converge (ver adaptive.py, que define el estado)
+    is_adaptive = models.BooleanField(default=False, verbose_name='Adaptativo')
+    adaptive_state = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Estado adaptativo',
+        help_text='Habilidad estimada, dificultades y preguntas servidas'
+    )
 
     class Meta:
         verbose_name = 'Intento de simulador'
         verbose_name_plural = 'Intentos de simulador'
         ordering = ['-started_at']
         unique_together = [['simulator', 'student', 'attempt_number']]
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(status='completed', item_stats_at__isnull=True),
+                name='attempt_item_stats_idx',
+            ),
+        ]
 
     def __str__(self):
         score_display = self.score if self.score is not None else 'en progreso'
@@ -409,49 +536,45 @@ class SimulatorAttempt(models.Model):
             f"en '{self.simulator.title}' — {score_display}{suffix}"
         )
 
-    def calculate_score(self):
+    def calculate_score(self, commit=True):
         """
-        Calcula y guarda el puntaje final + desempeño por tema.
-        Llamar este método al finalizar el intento.
+        Calcula el puntaje final + desempeño por tema con una sola consulta
+        agregada por tema. Con commit=False solo asigna los campos (quien
+        llama los guarda junto con el resto del intento).
         """
-        responses = self.responses.select_related('question').all()
-        total = responses.count()
+        topic_rows = self.responses.values('question__topic_tag').annotate(
+            total=models.Count('id'),
+            correct=models.Count('id', filter=models.Q(is_correct=True)),
+            unanswered=models.Count('id', filter=(
+                models.Q(selected_option__isnull=True) | models.Q(selected_option='')
+            )),
+        ).order_by()
+        topic_rows = list(topic_rows)
+        total = sum(row['total'] for row in topic_rows)
 
         if total == 0:
             return
 
-        correct = sum(1 for r in responses if r.is_correct)
-        incorrect = sum(1 for r in responses if not r.is_correct and r.selected_option)
-        unanswered = sum(1 for r in responses if not r.selected_option)
+        correct = sum(row['correct'] for row in topic_rows)
+        unanswered = sum(row['unanswered'] for row in topic_rows)
 
         self.correct_count = correct
-        self.incorrect_count = incorrect
+        self.incorrect_count = total - correct - unanswered
         self.unanswered_count = unanswered
         self.score = round((correct / total) * 100, 2)
 
         # Desempeño por tema
-        topic_stats = {}
-        for r in responses:
-            topic = r.question.topic_tag
-            if topic not in topic_stats:
-                topic_stats[topic] = {'correct': 0, 'total': 0}
-            topic_stats[topic]['total'] += 1
-            if r.is_correct:
-                topic_stats[topic]['correct'] += 1
-
         self.performance_by_topic = {
-            topic: {
-                'correct': stats['correct'],
-                'total': stats['total'],
-                'pct': round((stats['correct'] / stats['total']) * 100, 1)
+            row['question__topic_tag']: {
+                'correct': row['correct'],
+                'total': row['total'],
+                'pct': round((row['correct'] / row['total']) * 100, 1)
             }
-            for topic, stats in topic_stats.items()
+            for row in topic_rows
         }
 
-        self.save(update_fields=[
-            'score', 'correct_count', 'incorrect_count',
-            'unanswered_count', 'performance_by_topic'
-        ])
+        if commit:
+            self.save(update_fields=self.SCORE_FIELDS)
 
     @property
     def weak_topics(self):
@@ -470,7 +593,6 @@ class SimulatorAttempt(models.Model):
         Finaliza el intento: calcula score y actualiza perfiles de temas débiles.
         Llama a este método cuando el estudiante termina el simulador.
         """
-        from django.utils import timezone
         self.calculate_score()
         self.status = self.AttemptStatus.COMPLETED
         self.finished_at = timezone.now()
@@ -540,12 +662,94 @@ class SimulatorResponse(models.Model):
 
     def save(self, *args, **kwargs):
         """Auto-calcula is_correct al guardar."""
-        if self.selected_option:
-            self.is_correct = (self.selected_option == self.question.correct_option)
-        else:
-            self.is_correct = False
+        self.is_correct = self.grade(self.question, self.selected_option)
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def grade(question, selected_option):
+        """True si la opción elegida es la correcta de la pregunta."""
+        return bool(selected_option) and selected_option == question.correct_option
+
+
+class PackedResponses(models.Model):
+    """
+    Respuestas de un intento completado en forma compacta: una fila por
+    intento en lugar de una por pregunta.
+
+    La arma response_store.compact_responses(), que después borra las
+    filas de SimulatorResponse del intento. Quien lea respuestas de
+    intentos completados debe usar response_store (lee ambas formas).
+
+    Columnas de ancho fijo; la posición i es la misma pregunta en todas:
+    - question_ids: enteros de 64 bits little-endian
+    - options: un byte por pregunta (0 = sin responder, 1-4 = A-D)
+    - correct_bits: un bit por pregunta (bit i % 8 del byte i // 8)
+    - seconds: enteros sin signo de 16 bits little-endian
+    """
+
+    OPTIONS = ('', 'A', 'B', 'C', 'D')
+    MAX_SECONDS = 0xFFFF
+
+    attempt = models.OneToOneField(
+        SimulatorAttempt,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='packed_responses',
+        verbose_name='Intento'
+    )
+    question_count = models.PositiveSmallIntegerField(default=0, verbose_name='Preguntas')
+    question_ids = models.BinaryField(verbose_name='IDs de pregunta')
+    options = models.BinaryField(verbose_name='Opciones seleccionadas')
+    correct_bits = models.BinaryField(verbose_name='Aciertos')
+    seconds = models.BinaryField(verbose_name='Tiempos (segundos)')
+    packed_at = models.DateTimeField(auto_now_add=True, verbose_name='Compactado el')
+
+    class Meta:
+        verbose_name = 'Respuestas compactas'
+        verbose_name_plural = 'Respuestas compactas'
+
+    def __str__(self):
+        return f"Respuestas compactas del intento {self.attempt_id} ({self.question_count})"
+
+    @classmethod
+    def from_rows(cls, attempt_id, rows):
+        """
+        rows: [(question_id, selected_option, is_correct, time_spent_seconds)]
+        """
+        rows = sorted(rows)
+        n = len(rows)
+        correct = bytearray((n + 7) // 8)
+        for i, (_, _, is_correct, _) in enumerate(rows):
+            if is_correct:
+                correct[i // 8] |= 1 << (i % 8)
+        return cls(
+            attempt_id=attempt_id,
+            question_count=n,
+            question_ids=struct.pack(f'<{n}q', *(row[0] for row in rows)),
+            options=bytes(cls.OPTIONS.index(row[1] or '') for row in rows),
+            correct_bits=bytes(correct),
+            seconds=struct.pack(
+                f'<{n}H', *(min(row[3] or 0, cls.MAX_SECONDS) for row in rows)
+            ),
+        )
+
+    def rows(self):
+        """[(question_id, selected_option | None, is_correct, time_spent_seconds)]"""
+        n = self.question_count
+        ids = struct.unpack(f'<{n}q', bytes(self.question_ids))
+        options = bytes(self.options)
+        correct = bytes(self.correct_bits)
+        seconds = struct.unpack(f'<{n}H', bytes(self.seconds))
+        return [
+            (
+                ids[i],
+                self.OPTIONS[options[i]] or None,
+                bool(correct[i // 8] >> (i % 8) & 1),
+                seconds[i],
+            )
+            for i in range(n)
+        ]
+
 
 class StudentWeakTopicProfile(models.Model):
     """
@@ -558,6 +762,12 @@ class StudentWeakTopicProfile(models.Model):
     El tutor también puede ver este perfil para orientar la clase.
     """
 
+    # Campos que recalcula apply_attempt() (+ last_seen)
+    ACCUMULATED_FIELDS = [
+        'total_questions_seen', 'total_correct', 'cumulative_score_pct',
+        'consecutive_failures', 'last_seen',
+    ]
+
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -610,6 +820,12 @@ class StudentWeakTopicProfile(models.Model):
         verbose_name_plural = 'Perfiles de temas débiles'
         unique_together = [['student', 'subject', 'topic_tag']]
         ordering = ['cumulative_score_pct']
+        indexes = [
+            models.Index(
+                fields=['student', 'subject', 'cumulative_score_pct'],
+                name='weak_topic_score_idx'
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -617,14 +833,19 @@ class StudentWeakTopicProfile(models.Model):
             f"{self.topic_tag}: {self.cumulative_score_pct}%"
         )
 
-    def update_from_attempt(self, correct: bool, questions_in_topic: int):
+    def update_from_attempt(self, correct: int, questions_in_topic: int):
         """
-        Actualiza el perfil acumulado después de un intento.
+        Actualiza y guarda el perfil acumulado después de un intento.
 
         Args:
             correct: número de respuestas correctas en este tema
             questions_in_topic: total de preguntas de este tema en el intento
         """
+        self.apply_attempt(correct, questions_in_topic)
+        self.save()
+
+    def apply_attempt(self, correct: int, questions_in_topic: int):
+        """Recalcula los acumulados en memoria (sin guardar)."""
         self.total_questions_seen += questions_in_topic
         self.total_correct += correct
 
@@ -638,8 +859,6 @@ class StudentWeakTopicProfile(models.Model):
         else:
             self.consecutive_failures = 0
 
-        self.save()
-
     @property
     def is_weak(self):
         """True si el puntaje acumulado está por debajo del 60%."""
@@ -655,4 +874,521 @@ class StudentWeakTopicProfile(models.Model):
             return 3  # urgente
         if self.cumulative_score_pct < 60 or self.consecutive_failures >= 2:
             return 2  # media
-        return 1  # baja
\ No newline at end of file
+        return 1  # baja
+
+
+class TutorTopicAggregate(models.Model):
+    """
+    Resumen materializado de un tema para los estudiantes de un tutor.
+
+    Agrega los StudentWeakTopicProfile de los estudiantes que rindieron
+    simuladores del tutor en ese tema: cuántos lo tienen débil, su puntaje
+    acumulado promedio y la tendencia. Se actualiza al cerrar cada intento
+    (tutor_topics.update_tutor_topic_aggregates), así que el historial del
+    tutor lo lee con una sola consulta en lugar de recorrer los perfiles.
+    """
+
+    ACCUMULATED_FIELDS = [
+        'student_count', 'weak_count', 'score_sum', 'mean_score_pct',
+        'trend', 'updated_at',
+    ]
+
+    tutor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='topic_aggregates',
+        limit_choices_to={'user_type': 'tutor'},
+        verbose_name='Tutor'
+    )
+    subject = models.CharField(max_length=200, verbose_name='Materia')
+    topic_tag = models.CharField(max_length=100, verbose_name='Tema específico')
+
+    student_count = models.PositiveIntegerField(default=0, verbose_name='Estudiantes')
+    weak_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Estudiantes con el tema débil'
+    )
+    score_sum = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Suma de puntajes acumulados'
+    )
+    mean_score_pct = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        verbose_name='Puntaje promedio (%)'
+    )
+    trend = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        default=0,
+        verbose_name='Tendencia (puntos)',
+        help_text='Promedio móvil del cambio de puntaje por intento (positivo = mejora)'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
+
+    class Meta:
+        verbose_name = 'Tema débil por tutor'
+        verbose_name_plural = 'Temas débiles por tutor'
+        unique_together = [['tutor', 'subject', 'topic_tag']]
+        ordering = ['-weak_count', 'mean_score_pct']
+        indexes = [
+            models.Index(
+                fields=['tutor', '-weak_count', 'mean_score_pct'],
+                name='tutor_topic_weak_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.tutor_id} — {self.subject} — {self.topic_tag}: "
+            f"{self.weak_count}/{self.student_count} débiles"
+        )
+
+
+class TutorTopicStudent(models.Model):
+    """
+    Último puntaje con el que un estudiante entra en un TutorTopicAggregate.
+
+    Permite actualizar el agregado por diferencia (se resta el puntaje
+    anterior del estudiante y se suma el nuevo) sin releer sus perfiles.
+    """
+
+    aggregate = models.ForeignKey(
+        TutorTopicAggregate,
+        on_delete=models.CASCADE,
+        related_name='members',
+        verbose_name='Agregado'
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Estudiante'
+    )
+    score_pct = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        verbose_name='Puntaje acumulado (%)'
+    )
+
+    class Meta:
+        verbose_name = 'Estudiante de tema por tutor'
+        verbose_name_plural = 'Estudiantes de temas por tutor'
+        unique_together = [['aggregate', 'student']]
+
+
+class SimulatorGenerationJob(models.Model):
+    """
+    Solicitud de generación de un simulador, procesada fuera del request.
+
+    La vista solo encola; el comando `run_generation_worker` toma los
+    trabajos en orden, llama al generador IA y deja aquí el progreso y el
+    resultado para que el navegador lo consulte por polling.
+    """
+
+    class Kind(models.TextChoices):
+        DIAGNOSTIC = 'diagnostic', 'Diagnóstico'
+        REINFORCEMENT = 'reinforcement', 'Refuerzo'
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'En cola'
+        RUNNING = 'running', 'En proceso'
+        DONE = 'done', 'Terminado'
+        FAILED = 'failed', 'Fallido'
+
+    ACTIVE_STATUSES = (Status.QUEUED, Status.RUNNING)
+
+    kind = models.CharField(
+        max_length=20,
+        choices=Kind.choices,
+        default=Kind.DIAGNOSTIC,
+        verbose_name='Tipo de simulador'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Estado'
+    )
+    session = models.ForeignKey(
+        'academicTutoring.ClassSession',
+        on_delete=models.CASCADE,
+        related_name='generation_jobs',
+        verbose_name='Sesión de clase'
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='simulator_generation_jobs',
+        verbose_name='Estudiante'
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='requested_generation_jobs',
+        verbose_name='Solicitado por'
+    )
+    # Intento que origina un refuerzo (solo para kind=reinforcement)
+    attempt = models.ForeignKey(
+        SimulatorAttempt,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reinforcement_jobs',
+        verbose_name='Intento de origen'
+    )
+    simulator = models.ForeignKey(
+        Simulator,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_jobs',
+        verbose_name='Simulador generado'
+    )
+    # Refuerzos con la misma clave (tutor, materia, temas débiles) se
+    # generan juntos con una sola llamada al LLM (services.run_generation_job)
+    batch_key = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        verbose_name='Clave de lote'
+    )
+
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')
+    progress_message = models.CharField(max_length=200, blank=True, default='')
+    result_message = models.TextField(blank=True, default='', verbose_name='Resultado')
+    tries = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos de ejecución')
+
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name='Worker')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Último latido')
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Trabajo de generación'
+        verbose_name_plural = 'Trabajos de generación'
+        ordering = ['created_at']
+        indexes = [
+            # Cola: el worker toma el más antiguo en estado queued
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='queued'),
+                name='genjob_queued_idx'
+            ),
+            models.Index(
+                fields=['heartbeat_at'],
+                condition=models.Q(status='running'),
+                name='genjob_running_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.get_kind_display()} — {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class LLMResponseCache(models.Model):
+    """
+    Respuesta validada del LLM, direccionada por contenido.
+
+    La clave es un hash de (prompt de sistema, prompt de usuario normalizado,
+    modelo, temperatura): dos solicitudes idénticas reutilizan las mismas
+    preguntas sin volver a llamar a la API. Ver apps/simulators/llm_cache.py.
+    """
+
+    key = models.CharField(max_length=64, unique=True, verbose_name='Clave (sha256)')
+    model_name = models.CharField(max_length=100, verbose_name='Modelo')
+    payload = models.JSONField(verbose_name='Preguntas validadas')
+    question_count = models.PositiveSmallIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0, verbose_name='Aciertos')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, verbose_name='Último uso')
+    expires_at = models.DateTimeField(verbose_name='Expira')
+
+    class Meta:
+        verbose_name = 'Respuesta cacheada del LLM'
+        verbose_name_plural = 'Respuestas cacheadas del LLM'
+        ordering = ['-last_used_at']
+        indexes = [
+            models.Index(fields=['expires_at'], name='llmcache_expires_idx'),
+            models.Index(fields=['last_used_at'], name='llmcache_last_used_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key[:12]}… ({self.model_name}, {self.question_count} preguntas)"
+
+
+class BankedQuestion(models.Model):
+    """
+    Pregunta reutilizable entre simuladores, indexada por materia y tema.
+
+    Entran al banco las preguntas de simuladores aprobados por el tutor;
+    una pregunta casi idéntica (firma MinHash) a otra ya guardada de la
+    misma materia no se duplica. Ver apps/simulators/question_bank.py.
+    """
+
+    subject_key = models.CharField(max_length=200, verbose_name='Materia (normalizada)')
+    topic_key = models.CharField(max_length=100, verbose_name='Tema (normalizado)')
+    topic_tag = models.CharField(max_length=100, verbose_name='Tema')
+    difficulty = models.CharField(
+        max_length=10,
+        choices=SimulatorQuestion.DifficultyLevel.choices,
+        default=SimulatorQuestion.DifficultyLevel.MEDIUM,
+        verbose_name='Dificultad'
+    )
+    statement = models.TextField(verbose_name='Enunciado')
+    option_a = models.TextField(verbose_name='Opción A')
+    option_b = models.TextField(verbose_name='Opción B')
+    option_c = models.TextField(verbose_name='Opción C')
+    option_d = models.TextField(verbose_name='Opción D')
+    correct_option = models.CharField(
+        max_length=1,
+        choices=SimulatorQuestion.CORRECT_CHOICES,
+        verbose_name='Opción correcta'
+    )
+    explanation = models.TextField(blank=True, default='', verbose_name='Explicación')
+
+    # Firma MinHash del enunciado + respuesta correcta (detección de casi-duplicados)
+    signature = models.JSONField(default=list, verbose_name='Firma MinHash')
+
+    source_simulator = models.ForeignKey(
+        Simulator,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='banked_questions',
+        verbose_name='Simulador de origen'
+    )
+    times_served = models.PositiveIntegerField(default=0, verbose_name='Veces usada')
+    is_active = models.BooleanField(default=True, verbose_name='Activa')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Pregunta del banco'
+        verbose_name_plural = 'Banco de preguntas'
+        ordering = ['subject_key', 'topic_key']
+        indexes = [
+            models.Index(
+                fields=['subject_key', 'topic_key'],
+                condition=models.Q(is_active=True),
+                name='bank_subject_topic_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"[{self.subject_key} / {self.topic_tag}] {self.statement[:60]}"
+
+
+class BankedQuestionBand(models.Model):
+    """
+    Banda LSH de la firma de una pregunta del banco (question_bank.band_keys).
+
+    Al agregar preguntas al banco solo se cargan las entradas que comparten
+    alguna banda con ellas, no las firmas de toda la materia.
+    """
+
+    entry = models.ForeignKey(
+        BankedQuestion,
+        on_delete=models.CASCADE,
+        related_name='bands',
+        verbose_name='Pregunta del banco'
+    )
+    # Hash de materia + número de banda + posiciones de la firma
+    band_key = models.CharField(max_length=32, db_index=True, verbose_name='Banda')
+
+    class Meta:
+        verbose_name = 'Banda LSH del banco'
+        verbose_name_plural = 'Bandas LSH del banco'
+        unique_together = [('entry', 'band_key')]
+
+    def __str__(self):
+        return f"{self.entry_id}: {self.band_key}"
+
+
+class AIProviderCall(models.Model):
+    """
+    Registro de cada llamada a un proveedor de LLM: tokens, costo estimado,
+    latencia, espera por el límite de concurrencia del proceso y resultado.
+    Cada fila se suma a su AIProviderDailyUsage al registrarse.
+    Ver apps/simulators/ai_providers.py.
+    """
+
+    class Outcome(models.TextChoices):
+        OK = 'ok', 'Correcta'
+        VALIDATION_FAILED = 'validation_failed', 'Respuesta inválida'
+        TIMEOUT = 'timeout', 'Tiempo agotado'
+        ERROR = 'error', 'Error del proveedor'
+
+    provider = models.CharField(max_length=30, verbose_name='Proveedor')
+    model_name = models.CharField(max_length=100, verbose_name='Modelo')
+    streamed = models.BooleanField(default=False, verbose_name='Streaming')
+    success = models.BooleanField(default=False, verbose_name='Exitosa')
+    outcome = models.CharField(
+        max_length=20,
+        choices=Outcome.choices,
+        default=Outcome.OK,
+        verbose_name='Resultado'
+    )
+    prompt_tokens = models.PositiveIntegerField(default=0, verbose_name='Tokens de entrada')
+    completion_tokens = models.PositiveIntegerField(default=0, verbose_name='Tokens de salida')
+    cost_usd = models.DecimalField(
+        max_digits=10, decimal_places=6, default=0, verbose_name='Costo estimado (USD)'
+    )
+    latency_ms = models.PositiveIntegerField(default=0, verbose_name='Latencia (ms)')
+    wait_ms = models.PositiveIntegerField(default=0, verbose_name='Espera de turno (ms)')
+    error = models.CharField(max_length=255, blank=True, default='', verbose_name='Error')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Llamada a proveedor de IA'
+        verbose_name_plural = 'Llamadas a proveedores de IA'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='aicall_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider}/{self.model_name} {self.outcome} ({self.latency_ms} ms)"
+
+
+class AIProviderDailyUsage(models.Model):
+    """
+    Totales diarios de AIProviderCall por proveedor y modelo, mantenidos de
+    forma incremental (ai_usage.add_call): el admin muestra costo, tokens y
+    latencia por día sin recorrer el registro de llamadas.
+    """
+
+    # Contador de cada AIProviderCall.Outcome
+    OUTCOME_FIELDS = {
+        'ok': 'ok_calls',
+        'validation_failed': 'validation_failed_calls',
+        'timeout': 'timeout_calls',
+        'error': 'error_calls',
+    }
+
+    day = models.DateField(verbose_name='Día')
+    provider = models.CharField(max_length=30, verbose_name='Proveedor')
+    model_name = models.CharField(max_length=100, verbose_name='Modelo')
+
+    calls = models.PositiveIntegerField(default=0, verbose_name='Llamadas')
+    ok_calls = models.PositiveIntegerField(default=0, verbose_name='Correctas')
+    validation_failed_calls = models.PositiveIntegerField(default=0, verbose_name='Respuesta inválida')
+    timeout_calls = models.PositiveIntegerField(default=0, verbose_name='Tiempo agotado')
+    error_calls = models.PositiveIntegerField(default=0, verbose_name='Error del proveedor')
+    prompt_tokens = models.PositiveBigIntegerField(default=0, verbose_name='Tokens de entrada')
+    completion_tokens = models.PositiveBigIntegerField(default=0, verbose_name='Tokens de salida')
+    cost_usd = models.DecimalField(
+        max_digits=12, decimal_places=6, default=0, verbose_name='Costo estimado (USD)'
+    )
+    latency_ms_total = models.PositiveBigIntegerField(default=0, verbose_name='Latencia total (ms)')
+    latency_ms_max = models.PositiveIntegerField(default=0, verbose_name='Latencia máxima (ms)')
+    wait_ms_total = models.PositiveBigIntegerField(default=0, verbose_name='Espera total (ms)')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Uso diario de proveedor de IA'
+        verbose_name_plural = 'Uso diario de proveedores de IA'
+        ordering = ['-day', 'provider', 'model_name']
+        unique_together = [['day', 'provider', 'model_name']]
+
+    def __str__(self):
+        return f"{self.day} {self.provider}/{self.model_name}: {self.calls} llamadas"
+
+    @property
+    def mean_latency_ms(self):
+        return round(self.latency_ms_total / self.calls) if self.calls else 0
+
+
+class QuestionStats(models.Model):
+    """
+    Estadísticas clásicas de ítem de una pregunta, acumuladas de forma
+    incremental por apps/simulators/item_analysis.py (nunca en un request).
+
+    Se guardan sumas suficientes (no las respuestas): con ellas se
+    recalculan el índice de dificultad (p), la discriminación
+    punto-biserial contra el puntaje del resto del intento, la tasa de
+    cada distractor y la mediana de tiempo (histograma por tramos).
+    """
+
+    class Flag(models.TextChoices):
+        NONE = '', 'Sin observaciones'
+        KEY_SUSPECT = 'key_suspect', 'Clave dudosa (un distractor supera a la correcta)'
+        NEGATIVE_DISCRIMINATION = 'negative_discrimination', 'Discriminación negativa'
+        TOO_HARD = 'too_hard', 'Demasiado difícil'
+        TOO_EASY = 'too_easy', 'Demasiado fácil'
+
+    # Banderas que sacan a la pregunta del banco compartido
+    BROKEN_FLAGS = (Flag.KEY_SUSPECT, Flag.NEGATIVE_DISCRIMINATION)
+    TIME_BIN_SECONDS = 5
+    TIME_BINS = 121  # 0-600 s en tramos de 5 s + un tramo de desborde
+
+    ACCUMULATED_FIELDS = [
+        'responses', 'correct', 'unanswered',
+        'count_a', 'count_b', 'count_c', 'count_d',
+        'sum_rest', 'sum_rest_sq', 'sum_rest_correct', 'time_histogram',
+        'p_value', 'discrimination', 'median_time_seconds', 'flag', 'updated_at',
+    ]
+
+    question = models.OneToOneField(
+        SimulatorQuestion,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Pregunta'
+    )
+    responses = models.PositiveIntegerField(default=0, verbose_name='Respuestas')
+    correct = models.PositiveIntegerField(default=0, verbose_name='Correctas')
+    unanswered = models.PositiveIntegerField(default=0, verbose_name='Sin responder')
+    count_a = models.PositiveIntegerField(default=0)
+    count_b = models.PositiveIntegerField(default=0)
+    count_c = models.PositiveIntegerField(default=0)
+    count_d = models.PositiveIntegerField(default=0)
+    # Puntaje del resto del intento (aciertos sin contar esta pregunta)
+    sum_rest = models.FloatField(default=0)
+    sum_rest_sq = models.FloatField(default=0)
+    sum_rest_correct = models.FloatField(default=0)
+    time_histogram = models.JSONField(default=list, verbose_name='Histograma de tiempos')
+
+    p_value = models.FloatField(null=True, blank=True, verbose_name='Dificultad (p)')
+    discrimination = models.FloatField(
+        null=True, blank=True, verbose_name='Discriminación (punto-biserial)'
+    )
+    median_time_seconds = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name='Mediana de tiempo (s)'
+    )
+    flag = models.CharField(
+        max_length=30, choices=Flag.choices, default=Flag.NONE, blank=True,
+        verbose_name='Observación'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Estadística de pregunta'
+        verbose_name_plural = 'Estadísticas de preguntas'
+        indexes = [
+            models.Index(
+                fields=['flag'], condition=~models.Q(flag=''), name='qstats_flagged_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Stats P{self.question_id}: p={self.p_value}, r={self.discrimination}"
+
+    def distractor_rates(self):
+        """Fracción de respuestas que eligió cada opción."""
+        if not self.responses:
+            return {}
+        return {
+            option: getattr(self, f'count_{option.lower()}') / self.responses
+            for option in 'ABCD'
+        }
+
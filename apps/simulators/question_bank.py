@@ -0,0 +1,287 @@
+"""
+Banco de preguntas compartido entre simuladores.
+
+- bank_simulator_questions() → agrega al banco las preguntas de un simulador
+                               aprobado, sin duplicar casi-iguales
+- pick_for_topics()          → preguntas del banco para los temas pedidos
+                               que el estudiante aún no ha visto
+- DuplicateFilter            → descarta preguntas casi idénticas (MinHash)
+- minhash()/similarity()     → firma y similitud de Jaccard estimada
+- band_keys()                → claves de las bandas LSH de una firma
+
+La similitud se calcula sobre shingles de 3 palabras del enunciado más la
+opción correcta, normalizados (minúsculas, sin tildes). Dos preguntas con
+similitud >= SIMULATOR_BANK_DUPLICATE_THRESHOLD se consideran la misma.
+DuplicateFilter indexa las firmas por bandas (LSH): solo compara contra
+las que comparten alguna banda, así que no recorre todo el banco de la
+materia por cada pregunta. Las bandas de las entradas del banco se
+guardan en BankedQuestionBand: al agregar preguntas solo se cargan las
+firmas de las entradas que comparten alguna banda con ellas.
+"""
+import hashlib
+import random
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Subquery, Window
+from django.db.models.functions import RowNumber
+
+from .models import BankedQuestion, BankedQuestionBand, SimulatorQuestion
+
+NUM_PERM = 64
+SHINGLE_WORDS = 3
+# LSH: 16 bandas de 4 posiciones. Dos firmas con Jaccard 0.8 comparten
+# alguna banda con probabilidad > 0.999; con 0.5, ~0.64 (luego se descartan)
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(61)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)
+]
+_WORD = re.compile(r"\w+")
+
+QUESTION_FIELDS = (
+    'topic_tag', 'difficulty', 'statement', 'option_a', 'option_b',
+    'option_c', 'option_d', 'correct_option', 'explanation',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_enabled():
+    return _setting('SIMULATOR_BANK_ENABLED', True)
+
+
+def normalize_key(text, max_length=100):
+    """Clave de búsqueda: minúsculas, sin tildes, espacios simples."""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.split())[:max_length]
+
+
+# ─────────────────────────────────────────────────────────────
+# MinHash
+# ─────────────────────────────────────────────────────────────
+
+def shingles(text):
+    words = _WORD.findall(normalize_key(text, max_length=None))
+    if len(words) <= SHINGLE_WORDS:
+        return {' '.join(words)} if words else set()
+    return {
+        ' '.join(words[i:i + SHINGLE_WORDS])
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def _hash(shingle):
+    return int.from_bytes(
+        hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'
+    )
+
+
+def minhash(text):
+    hashes = [_hash(s) for s in shingles(text)]
+    if not hashes:
+        return []
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a, sig_b):
+    """Jaccard estimado: fracción de posiciones iguales en las firmas."""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def _get(q, field):
+    return q.get(field) if isinstance(q, dict) else getattr(q, field)
+
+
+def question_signature(q):
+    """Firma de una pregunta (dict del LLM o instancia de modelo)."""
+    correct = _get(q, 'correct_option') or ''
+    answer = _get(q, f'option_{correct.lower()}') if correct else ''
+    return minhash(f"{_get(q, 'statement')} {answer or ''}")
+
+
+def _bands(signature):
+    return [
+        (band, tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]))
+        for band in range(LSH_BANDS)
+    ]
+
+
+def band_keys(subject_key, signature):
+    """Claves de las bandas de una firma en una materia (BankedQuestionBand)."""
+    if len(signature) != NUM_PERM:
+        return []
+    return [
+        hashlib.blake2b(
+            f"{subject_key}|{band}|{','.join(map(str, rows))}".encode('utf-8'),
+            digest_size=16,
+        ).hexdigest()
+        for band, rows in _bands(signature)
+    ]
+
+
+class DuplicateFilter:
+    """
+    Acumula firmas y detecta preguntas casi idénticas a las ya vistas.
+
+        dedup = DuplicateFilter(existing)   # [(id, firma), ...]
+        if dedup.find(firma) is None: dedup.add(firma)
+
+    Las firmas se indexan por banda; find() solo compara las candidatas
+    que comparten alguna banda con la firma buscada.
+    """
+
+    def __init__(self, entries=(), threshold=None):
+        self.threshold = threshold if threshold is not None else _setting(
+            'SIMULATOR_BANK_DUPLICATE_THRESHOLD', 0.8
+        )
+        self._entries = []
+        self._buckets = {}
+        for key, sig in entries:
+            self.add(sig, key=key)
+
+    def _match(self, signature):
+        if len(signature) != NUM_PERM:
+            return None
+        candidates = set()
+        for band in _bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        for index in sorted(candidates):
+            entry = self._entries[index]
+            if similarity(signature, entry[1]) >= self.threshold:
+                return entry
+        return None
+
+    def find(self, signature):
+        """Clave de la entrada casi idéntica, o None."""
+        entry = self._match(signature)
+        return entry[0] if entry else None
+
+    def add(self, signature, key=None):
+        if not signature:
+            return
+        index = len(self._entries)
+        self._entries.append((key, signature))
+        for band in _bands(signature):
+            self._buckets.setdefault(band, []).append(index)
+
+    def is_duplicate(self, q):
+        """True si q repite una pregunta ya vista; si no, la registra."""
+        signature = question_signature(q)
+        if signature and self._match(signature) is not None:
+            return True
+        self.add(signature)
+        return False
+
+
+# ─────────────────────────────────────────────────────────────
+# Alta y consulta
+# ─────────────────────────────────────────────────────────────
+
+def bank_simulator_questions(simulator):
+    """
+    Agrega al banco las preguntas activas de un simulador aprobado. Las
+    casi idénticas a una ya guardada se enlazan a ella en lugar de crear
+    otra entrada. Solo se comparan las entradas que comparten alguna banda
+    LSH con las preguntas nuevas (BankedQuestionBand).
+
+    Returns:
+        int: preguntas nuevas en el banco
+    """
+    if not is_enabled():
+        return 0
+    subject_key = normalize_key(simulator.subject, max_length=200)
+    questions = list(simulator.questions.filter(
+        is_active=True, bank_question__isnull=True
+    ).order_by('order'))
+    signatures = [question_signature(question) for question in questions]
+    keys = {key for signature in signatures for key in band_keys(subject_key, signature)}
+    dedup = DuplicateFilter(
+        BankedQuestion.objects.filter(
+            subject_key=subject_key, is_active=True,
+            pk__in=Subquery(
+                BankedQuestionBand.objects.filter(band_key__in=keys).values('entry_id')
+            ),
+        ).values_list('pk', 'signature')
+    )
+
+    links = []  # (pregunta, pk existente o entrada nueva)
+    new_entries = []
+    for question, signature in zip(questions, signatures):
+        match = dedup.find(signature)
+        if match is None:
+            match = BankedQuestion(
+                subject_key=subject_key,
+                topic_key=normalize_key(question.topic_tag),
+                signature=signature,
+                source_simulator=simulator,
+                **{f: getattr(question, f) or '' for f in QUESTION_FIELDS},
+            )
+            dedup.add(signature, key=match)
+            new_entries.append(match)
+        links.append((question, match))
+
+    with transaction.atomic():
+        BankedQuestion.objects.bulk_create(new_entries)
+        BankedQuestionBand.objects.bulk_create(
+            BankedQuestionBand(entry=entry, band_key=key)
+            for entry in new_entries
+            for key in band_keys(subject_key, entry.signature)
+        )
+        for question, match in links:
+            question.bank_question_id = match.pk if isinstance(match, BankedQuestion) else match
+        SimulatorQuestion.objects.bulk_update(questions, ['bank_question'])
+    return len(new_entries)
+
+
+def pick_for_topics(subject, topics, student, per_topic):
+    """
+    Preguntas del banco para cada tema que el estudiante no ha recibido
+    antes, priorizando las menos usadas. El límite por tema se aplica en
+    la consulta (ROW_NUMBER por tema), no recorriendo el banco.
+
+    Returns:
+        dict: {topic: [BankedQuestion, ...]} con hasta per_topic por tema
+    """
+    keys = {normalize_key(topic): topic for topic in topics}
+    picked = {topic: [] for topic in topics}
+    if not keys or per_topic <= 0:
+        return picked
+
+    candidates = BankedQuestion.objects.filter(
+        subject_key=normalize_key(subject, max_length=200),
+        topic_key__in=list(keys),
+        is_active=True,
+    ).exclude(
+        served__simulator__student=student
+    ).annotate(
+        topic_rank=Window(
+            RowNumber(), partition_by=F('topic_key'), order_by=[F('times_served'), F('pk')]
+        )
+    ).filter(topic_rank__lte=per_topic).order_by('times_served', 'pk')
+
+    for entry in candidates:
+        picked[keys[entry.topic_key]].append(entry)
+    return picked
+
+
+def mark_served(entry_ids):
+    BankedQuestion.objects.filter(pk__in=list(entry_ids)).update(
+        times_served=F('times_served') + 1
+    )
+
+
+def as_question(entry):
+    """Pregunta del banco con el formato que produce el LLM."""
+    data = {f: getattr(entry, f) for f in QUESTION_FIELDS}
+    data['bank_question_id'] = entry.pk
+    return data
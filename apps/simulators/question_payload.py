@@ -0,0 +1,115 @@
+"""
+Preguntas compiladas de un simulador: inmutables por versión y cacheadas.
+
+- get_payload()    → CompiledQuestions del simulador (caché o compilación)
+- compile_payload() → lee SimulatorQuestion una sola vez y arma el payload
+- invalidate()     → nueva versión tras una edición (admin)
+- parse_answers()  → respuestas del formulario final según el payload
+
+El payload es compacto: una lista por pregunta (en orden) y la clave de
+respuestas como cadena ('BDAC…'). La clave de caché incluye
+Simulator.questions_version, así que una edición no borra nada: crea una
+versión nueva y la anterior expira sola. Solo se cachean simuladores cuya
+generación terminó. Lo usan la vista del intento, el autoguardado y el
+envío final, sin volver a consultar SimulatorQuestion.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Simulator, SimulatorQuestion
+
+PAYLOAD_FORMAT = 1
+ROW_FIELDS = (
+    'id', 'topic_tag', 'difficulty', 'statement',
+    'option_a', 'option_b', 'option_c', 'option_d',
+)
+DIFFICULTY_LABELS = dict(SimulatorQuestion.DifficultyLevel.choices)
+
+# Lo mínimo que necesitan SimulatorResponse.grade() y submit_attempt()
+AnswerKey = namedtuple('AnswerKey', ['id', 'correct_option'])
+
+
+class CompiledQuestions:
+    """Preguntas activas de un simulador en su forma compilada."""
+
+    def __init__(self, data):
+        self.version = data['version']
+        self.rows = data['rows']
+        self.key = data['key']
+        self._correct = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def ids(self):
+        return [row[0] for row in self.rows]
+
+    def correct_option(self, question_id):
+        """Opción correcta de la pregunta, o None si no es del simulador."""
+        if self._correct is None:
+            self._correct = dict(zip(self.ids, self.key))
+        return self._correct.get(question_id)
+
+    def answer_key(self):
+        return [AnswerKey(qid, option) for qid, option in zip(self.ids, self.key)]
+
+    def for_display(self):
+        """Una dict por pregunta para el template (sin la respuesta)."""
+        questions = []
+        for row in self.rows:
+            question = dict(zip(ROW_FIELDS, row))
+            question['difficulty_label'] = DIFFICULTY_LABELS.get(
+                question['difficulty'], question['difficulty']
+            )
+            questions.append(question)
+        return questions
+
+
+def cache_key(simulator):
+    return f'simulator-questions:{PAYLOAD_FORMAT}:{simulator.pk}:{simulator.questions_version}'
+
+
+def compile_payload(simulator):
+    questions = simulator.questions.filter(is_active=True).order_by('order').values_list(
+        *ROW_FIELDS, 'correct_option'
+    )
+    rows, key = [], []
+    for *row, correct in questions:
+        rows.append(row)
+        key.append(correct)
+    return {'version': simulator.questions_version, 'rows': rows, 'key': ''.join(key)}
+
+
+def get_payload(simulator):
+    """
+    Preguntas compiladas del simulador. Necesita pk, questions_version y
+    generation_status del simulador; no lee SimulatorQuestion si el payload
+    de esa versión ya está en caché.
+    """
+    key = cache_key(simulator)
+    data = cache.get(key)
+    if data is None:
+        data = compile_payload(simulator)
+        if simulator.generation_status == Simulator.GenerationStatus.DONE:
+            cache.set(key, data, getattr(settings, 'SIMULATOR_PAYLOAD_CACHE_SECONDS', 86400))
+    return CompiledQuestions(data)
+
+
+def invalidate(simulator_id):
+    """Las preguntas del simulador cambiaron: los siguientes usos recompilan."""
+    Simulator.objects.filter(pk=simulator_id).update(
+        questions_version=F('questions_version') + 1
+    )
+
+
+def parse_answers(payload, data):
+    """{question_id: 'A'-'D' | None} desde el POST final (question_<id>)."""
+    answers = {}
+    for question_id in payload.ids:
+        value = (data.get(f'question_{question_id}') or '').upper()
+        answers[question_id] = value if value in ('A', 'B', 'C', 'D') else None
+    return answers
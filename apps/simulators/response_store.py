@@ -0,0 +1,121 @@
+"""
+Respuestas de intentos completados: filas o forma compacta.
+
+- compact_responses()  → empaqueta en PackedResponses las respuestas de los
+                         intentos completados hace más de
+                         SIMULATOR_COMPACT_RESPONSES_AFTER_HOURS y borra sus
+                         filas de SimulatorResponse
+- attempt_responses()  → respuestas de un intento (para la vista de resultados)
+- response_rows()      → tuplas por respuesta de varios intentos (análisis)
+
+Un intento en curso siempre usa filas (autoguardado y envío final hacen
+upsert sobre SimulatorResponse). Una vez completado puede estar en
+cualquiera de las dos formas; estas funciones las leen igual. Lo ejecuta
+`manage.py compact_responses` (Railway Cron).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PackedResponses, SimulatorAttempt, SimulatorQuestion, SimulatorResponse
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def response_rows(attempt_ids):
+    """
+    Respuestas de varios intentos, de filas o compactas.
+
+    Returns:
+        list[tuple]: (attempt_id, question_id, selected_option, is_correct,
+        time_spent_seconds)
+    """
+    attempt_ids = list(attempt_ids)
+    rows = list(SimulatorResponse.objects.filter(attempt_id__in=attempt_ids).values_list(
+        'attempt_id', 'question_id', 'selected_option', 'is_correct', 'time_spent_seconds',
+    ).order_by())
+    for packed in PackedResponses.objects.filter(attempt_id__in=attempt_ids):
+        rows.extend((packed.attempt_id, *row) for row in packed.rows())
+    return rows
+
+
+def attempt_responses(attempt):
+    """
+    Respuestas de un intento con su pregunta, en el orden del simulador.
+    De la forma compacta se arman SimulatorResponse sin guardar.
+    """
+    responses = list(attempt.responses.select_related('question').order_by('question__order'))
+    if responses:
+        return responses
+
+    packed = PackedResponses.objects.filter(attempt=attempt).first()
+    if packed is None:
+        return []
+    rows = packed.rows()
+    questions = SimulatorQuestion.objects.in_bulk([row[0] for row in rows])
+    responses = [
+        SimulatorResponse(
+            attempt=attempt, question=questions[question_id], selected_option=selected,
+            is_correct=is_correct, time_spent_seconds=seconds,
+        )
+        for question_id, selected, is_correct, seconds in rows
+        if question_id in questions
+    ]
+    responses.sort(key=lambda response: response.question.order)
+    return responses
+
+
+def _compact_batch(batch_size, cutoff):
+    """Compacta un lote de intentos. Devuelve (intentos, filas borradas)."""
+    with transaction.atomic():
+        attempt_ids = list(
+            SimulatorAttempt.objects.select_for_update(skip_locked=True).filter(
+                status=SimulatorAttempt.AttemptStatus.COMPLETED,
+                finished_at__lt=cutoff,
+                packed_responses__isnull=True,
+            ).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not attempt_ids:
+            return 0, 0
+
+        by_attempt = {attempt_id: [] for attempt_id in attempt_ids}
+        for attempt_id, *row in SimulatorResponse.objects.filter(
+            attempt_id__in=attempt_ids
+        ).values_list(
+            'attempt_id', 'question_id', 'selected_option', 'is_correct', 'time_spent_seconds',
+        ).order_by():
+            by_attempt[attempt_id].append(row)
+
+        PackedResponses.objects.bulk_create([
+            PackedResponses.from_rows(attempt_id, rows)
+            for attempt_id, rows in by_attempt.items()
+        ])
+        deleted, _ = SimulatorResponse.objects.filter(attempt_id__in=attempt_ids).delete()
+    return len(attempt_ids), deleted
+
+
+def compact_responses(batch_size=200, max_batches=None):
+    """
+    Compacta los intentos completados hace más de
+    SIMULATOR_COMPACT_RESPONSES_AFTER_HOURS, en lotes de batch_size
+    intentos (cada lote en su transacción).
+
+    Returns:
+        tuple: (intentos compactados, filas de SimulatorResponse borradas)
+    """
+    cutoff = timezone.now() - timedelta(
+        hours=_setting('SIMULATOR_COMPACT_RESPONSES_AFTER_HOURS', 72)
+    )
+    compacted = deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        attempts, rows = _compact_batch(batch_size, cutoff)
+        if not attempts:
+            break
+        compacted += attempts
+        deleted += rows
+        batches += 1
+    return compacted, deleted
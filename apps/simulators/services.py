@@ -0,0 +1,600 @@
+"""
+Servicios de la app simulators.
+
+Cola de generación de simuladores (SimulatorGenerationJob):
+- enqueue_generation()   → crea el trabajo; la vista responde de inmediato
+- claim_next_job()       → el worker toma el siguiente trabajo en cola
+- run_generation_job()   → ejecuta el generador IA y registra el resultado;
+                           un refuerzo arrastra a los de su mismo lote
+- reinforcement_batch_key() → clave (tutor, materia, temas débiles) del lote
+- requeue_stuck_jobs()   → recuperación tras caída de un worker
+- job_status_payload()   → estado serializable para el endpoint de polling
+
+Intentos:
+- record_answer()        → autoguardado de una respuesta y su tiempo (upsert)
+- submit_attempt()       → completa las respuestas guardadas, califica el
+                           intento y actualiza los perfiles de temas débiles
+- answer_adaptive()      → intento adaptativo: responde la pregunta actual,
+                           elige la siguiente y cierra al converger
+
+El worker es el comando `manage.py run_generation_worker`. La cola vive en
+la base de datos: no hay broker externo. La toma de trabajos es un UPDATE
+condicional (status='queued' → 'running'), seguro con varios workers.
+
+Los refuerzos esperan en cola SIMULATOR_REINFORCEMENT_BATCH_WINDOW_SECONDS
+antes de poder tomarse, para que se junten los pedidos de estudiantes con
+los mismos temas débiles (p. ej. tras un simulacro en semana de exámenes).
+Quien toma uno se lleva hasta SIMULATOR_REINFORCEMENT_BATCH_MAX trabajos
+con su misma batch_key y los resuelve con una sola llamada al LLM.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.accounts.models import Notification
+
+from .models import (
+    Simulator, SimulatorAttempt, SimulatorGenerationJob, SimulatorResponse,
+    StudentWeakTopicProfile, update_weak_topic_profile,
+)
+from . import adaptive, ai_providers
+from .question_bank import normalize_key
+from .question_payload import AnswerKey, get_payload
+
+logger = logging.getLogger(__name__)
+
+Job = SimulatorGenerationJob
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ─────────────────────────────────────────────────────────────
+# Encolado
+# ─────────────────────────────────────────────────────────────
+
+def reinforcement_batch_key(attempt, student):
+    """
+    Clave de lote de un refuerzo: mismo tutor, misma materia y mismos temas
+    débiles (los que usa generate_reinforcement_simulator). '' si el
+    estudiante no tiene temas débiles: ese trabajo corre solo.
+    """
+    subject = attempt.simulator.subject
+    topics = sorted({
+        normalize_key(topic)
+        for topic in StudentWeakTopicProfile.objects.filter(
+            student=student, subject=subject, cumulative_score_pct__lt=60,
+        ).order_by('cumulative_score_pct').values_list('topic_tag', flat=True)[:8]
+    })
+    if not topics:
+        return ''
+    raw = '|'.join([str(attempt.simulator.tutor_id), normalize_key(subject, max_length=200), *topics])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def enqueue_generation(kind, session, student, requested_by, attempt=None):
+    """
+    Encola la generación de un simulador.
+
+    Si ya hay un trabajo activo (en cola o en proceso) del mismo tipo para
+    la sesión y el estudiante, no se crea otro. Un refuerzo queda con su
+    clave de lote (reinforcement_batch_key).
+
+    Returns:
+        tuple: (success, job, error_message)
+    """
+    active = Job.objects.filter(
+        kind=kind, session=session, student=student,
+        status__in=Job.ACTIVE_STATUSES,
+    ).first()
+    if active:
+        return False, active, 'Ya hay un simulacro generándose para esta sesión.'
+
+    batch_key = ''
+    if kind == Job.Kind.REINFORCEMENT and attempt is not None:
+        batch_key = reinforcement_batch_key(attempt, student)
+    job = Job.objects.create(
+        kind=kind, session=session, student=student,
+        requested_by=requested_by, attempt=attempt,
+        batch_key=batch_key, progress_message='En cola',
+    )
+    logger.info('Generation job %s queued (%s, session %s)', job.pk, kind, session.pk)
+    return True, job, None
+
+
+# ─────────────────────────────────────────────────────────────
+# Worker
+# ─────────────────────────────────────────────────────────────
+
+def claim_next_job(worker_id):
+    """
+    Toma el trabajo en cola más antiguo, respetando el máximo global de
+    generaciones simultáneas (SIMULATOR_GENERATION_MAX_RUNNING). Los
+    refuerzos más recientes que la ventana de agrupación siguen esperando.
+
+    El máximo es un límite blando: se cuenta antes del UPDATE condicional,
+    así que varios workers que reclaman a la vez pueden pasarlo por uno
+    cada uno. El tope duro por proceso es SIMULATOR_AI_MAX_CONCURRENT_CALLS.
+
+    Returns:
+        SimulatorGenerationJob | None
+    """
+    max_running = _setting('SIMULATOR_GENERATION_MAX_RUNNING', 4)
+    if Job.objects.filter(status=Job.Status.RUNNING).count() >= max_running:
+        return None
+
+    window_cutoff = timezone.now() - timedelta(
+        seconds=_setting('SIMULATOR_REINFORCEMENT_BATCH_WINDOW_SECONDS', 30)
+    )
+    candidates = Job.objects.filter(
+        Q(kind=Job.Kind.DIAGNOSTIC) | Q(created_at__lte=window_cutoff),
+        status=Job.Status.QUEUED,
+    ).order_by('created_at').values_list('pk', flat=True)[:5]
+
+    for pk in candidates:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            worker=worker_id[:100],
+            started_at=now,
+            heartbeat_at=now,
+            tries=F('tries') + 1,
+            progress=0,
+            progress_message='Iniciando',
+        )
+        if claimed:
+            return Job.objects.select_related(
+                'session', 'student', 'requested_by', 'attempt__simulator__session'
+            ).get(pk=pk)
+    return None
+
+
+def _notify(job, message):
+    Notification.objects.create(recipient=job.requested_by, message=message[:255])
+
+
+def _claim_batch(job):
+    """
+    Toma los refuerzos en cola con la misma batch_key que job (hasta
+    SIMULATOR_REINFORCEMENT_BATCH_MAX en total), sin esperar la ventana.
+    """
+    limit = _setting('SIMULATOR_REINFORCEMENT_BATCH_MAX', 20) - 1
+    if not job.batch_key or limit <= 0:
+        return []
+    candidates = Job.objects.filter(
+        status=Job.Status.QUEUED, kind=Job.Kind.REINFORCEMENT, batch_key=job.batch_key,
+    ).exclude(pk=job.pk).order_by('created_at').values_list('pk', flat=True)[:limit]
+
+    claimed = []
+    for pk in candidates:
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            worker=job.worker,
+            started_at=now,
+            heartbeat_at=now,
+            tries=F('tries') + 1,
+            progress=0,
+            progress_message=f'Agrupado con el trabajo #{job.pk}',
+        ):
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).select_related(
+        'session', 'student', 'requested_by', 'attempt__simulator__session'
+    ).order_by('created_at'))
+
+
+def _beat(pks, worker, **fields):
+    """Latido (y avance) de los trabajos que este worker aún tiene."""
+    Job.objects.filter(pk__in=pks, status=Job.Status.RUNNING, worker=worker).update(
+        heartbeat_at=timezone.now(), **fields
+    )
+
+
+def run_generation_job(job):
+    """
+    Ejecuta un trabajo ya tomado por claim_next_job() y deja el resultado
+    (done/failed, mensaje, simulador) en la fila del trabajo. Un refuerzo
+    toma además los de su lote y los resuelve juntos.
+
+    El latido se renueva en cada avance y también mientras se espera turno
+    o respuesta del proveedor (ai_providers.heartbeat).
+    """
+    from .ai_generator import generate_simulator, generate_reinforcement_simulator
+
+    if job.kind == Job.Kind.REINFORCEMENT:
+        companions = _claim_batch(job)
+        if companions:
+            return _run_reinforcement_batch([job, *companions])
+
+    produced = {}
+
+    def on_progress(percent, message, simulator=None):
+        fields = {'progress': percent, 'progress_message': message[:200]}
+        if simulator is not None:
+            fields['simulator'] = simulator
+            produced['simulator_id'] = simulator.pk
+        _beat([job.pk], job.worker, **fields)
+
+    try:
+        with ai_providers.heartbeat(lambda: _beat([job.pk], job.worker)):
+            if job.kind == Job.Kind.REINFORCEMENT:
+                success, message = generate_reinforcement_simulator(
+                    job.attempt, job.student, on_progress=on_progress
+                )
+            else:
+                success, message = generate_simulator(
+                    job.session, job.student, on_progress=on_progress
+                )
+    except Exception as e:
+        logger.error('Generation job %s crashed: %s', job.pk, e, exc_info=True)
+        success, message = False, 'Error inesperado al generar el simulacro. Intenta de nuevo.'
+
+    return _finish_job(job, success, message, produced.get('simulator_id'))
+
+
+def _run_reinforcement_batch(jobs):
+    """Refuerzos de un mismo lote: una generación, un simulador por trabajo."""
+    from .ai_generator import generate_reinforcement_batch
+
+    pks = [job.pk for job in jobs]
+    worker = jobs[0].worker
+
+    def on_progress(percent, message, simulator=None):
+        _beat(pks, worker, progress=percent, progress_message=message[:200])
+
+    try:
+        with ai_providers.heartbeat(lambda: _beat(pks, worker)):
+            results = generate_reinforcement_batch(
+                [(job.attempt, job.student) for job in jobs], on_progress=on_progress
+            )
+    except Exception as e:
+        logger.error('Generation batch %s crashed: %s', pks, e, exc_info=True)
+        message = 'Error inesperado al generar el simulacro. Intenta de nuevo.'
+        results = [(False, message, None)] * len(jobs)
+
+    logger.info('Generation batch of %s jobs (lead %s)', len(jobs), jobs[0].pk)
+    for job, (success, message, simulator) in zip(jobs, results):
+        if simulator is not None:
+            _beat([job.pk], worker, simulator=simulator)
+        _finish_job(job, success, message, simulator.pk if simulator else None)
+    return jobs[0]
+
+
+def _finish_job(job, success, message, simulator_id=None):
+    """
+    Cierra el trabajo (done/failed), limpia su simulador y notifica.
+
+    El cierre es un UPDATE condicional (status='running' y el mismo
+    worker): si requeue_stuck_jobs() lo devolvió a la cola mientras
+    corría, ahora es de otro worker y este resultado se descarta, junto
+    con el simulador que produjo (simulator_id).
+    """
+    fields = {
+        'status': Job.Status.DONE if success else Job.Status.FAILED,
+        'progress_message': 'Listo' if success else 'Error',
+        'result_message': message,
+        'finished_at': timezone.now(),
+    }
+    if success:
+        fields['progress'] = 100
+    owned = Job.objects.filter(
+        pk=job.pk, status=Job.Status.RUNNING, worker=job.worker
+    ).update(**fields)
+    if not owned:
+        logger.warning('Generation job %s was taken over while running; result dropped', job.pk)
+        if simulator_id:
+            Simulator.objects.filter(pk=simulator_id).delete()
+        job.refresh_from_db()
+        return job
+
+    job.refresh_from_db()
+    if not success and job.simulator_id:
+        # Un error no controlado puede dejar el simulador en 'generating'
+        Simulator.objects.filter(
+            pk=job.simulator_id,
+            generation_status=Simulator.GenerationStatus.GENERATING,
+        ).update(
+            generation_status=Simulator.GenerationStatus.FAILED,
+            generation_error=message[:500],
+        )
+    if success and job.kind == Job.Kind.DIAGNOSTIC:
+        # El nuevo simulacro reemplaza a los rechazados de la misma sesión
+        Simulator.objects.filter(
+            session=job.session,
+            student=job.student,
+            status=Simulator.Status.REJECTED,
+        ).update(generation_status=Simulator.GenerationStatus.FAILED)
+
+    subject = job.session.subject
+    if success:
+        _notify(job, f'🤖 Simulacro de {subject} listo: {message}')
+    else:
+        _notify(job, f'⚠️ No se pudo generar el simulacro de {subject}: {message}')
+    logger.info('Generation job %s finished: %s', job.pk, job.status)
+    return job
+
+
+# ─────────────────────────────────────────────────────────────
+# Recuperación
+# ─────────────────────────────────────────────────────────────
+
+def requeue_stuck_jobs():
+    """
+    Recupera trabajos de workers caídos.
+
+    - Trabajos 'running' sin latido en SIMULATOR_JOB_STALE_SECONDS vuelven a
+      la cola (o fallan si agotaron SIMULATOR_JOB_MAX_TRIES). Su simulador a
+      medio generar se marca como fallido para liberar el cooldown.
+    - Simuladores 'generating' sin trabajo activo (p. ej. de un request que
+      murió por timeout) se marcan como fallidos y, si son diagnósticos, se
+      vuelven a encolar.
+
+    Returns:
+        tuple: (requeued, failed)
+    """
+    cutoff = timezone.now() - timedelta(
+        seconds=_setting('SIMULATOR_JOB_STALE_SECONDS', 600)
+    )
+    max_tries = _setting('SIMULATOR_JOB_MAX_TRIES', 3)
+    interrupted = 'Generación interrumpida: el worker dejó de responder.'
+    requeued = failed = 0
+
+    stuck = Job.objects.filter(
+        status=Job.Status.RUNNING, heartbeat_at__lt=cutoff
+    ).select_related('session', 'requested_by')
+    for job in stuck:
+        if job.tries >= max_tries:
+            updated = Job.objects.filter(
+                pk=job.pk, status=Job.Status.RUNNING, heartbeat_at__lt=cutoff
+            ).update(
+                status=Job.Status.FAILED, progress_message='Error',
+                result_message=interrupted, finished_at=timezone.now(),
+            )
+            if updated:
+                failed += 1
+                _notify(job, f'⚠️ No se pudo generar el simulacro de {job.session.subject}: {interrupted}')
+        else:
+            updated = Job.objects.filter(
+                pk=job.pk, status=Job.Status.RUNNING, heartbeat_at__lt=cutoff
+            ).update(
+                status=Job.Status.QUEUED, worker='', simulator=None,
+                progress=0, progress_message='En cola (reintento)',
+            )
+            requeued += updated
+        if updated and job.simulator_id:
+            Simulator.objects.filter(
+                pk=job.simulator_id,
+                generation_status=Simulator.GenerationStatus.GENERATING,
+            ).update(
+                generation_status=Simulator.GenerationStatus.FAILED,
+                generation_error=interrupted,
+            )
+
+    orphans = Simulator.objects.filter(
+        generation_status=Simulator.GenerationStatus.GENERATING,
+        updated_at__lt=cutoff,
+    ).exclude(
+        generation_jobs__status__in=Job.ACTIVE_STATUSES
+    ).select_related('session', 'tutor', 'student')
+    for simulator in orphans:
+        updated = Simulator.objects.filter(
+            pk=simulator.pk,
+            generation_status=Simulator.GenerationStatus.GENERATING,
+        ).update(
+            generation_status=Simulator.GenerationStatus.FAILED,
+            generation_error=interrupted,
+        )
+        if not updated:
+            continue
+        if simulator.simulator_type == Simulator.SimulatorType.DIAGNOSTIC:
+            queued, _, _ = enqueue_generation(
+                Job.Kind.DIAGNOSTIC, simulator.session,
+                simulator.student, simulator.tutor,
+            )
+            requeued += queued
+        else:
+            failed += 1
+
+    if requeued or failed:
+        logger.warning('Generation recovery: %s requeued, %s failed', requeued, failed)
+    return requeued, failed
+
+
+# ─────────────────────────────────────────────────────────────
+# Estado
+# ─────────────────────────────────────────────────────────────
+
+def job_status_payload(job):
+    simulator = job.simulator
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.result_message or job.progress_message,
+        'simulator_id': job.simulator_id,
+        'generation_status': simulator.generation_status if simulator else None,
+        'questions_ready': simulator.generated_question_count if simulator else 0,
+        'finished': not job.is_active,
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Intentos
+# ─────────────────────────────────────────────────────────────
+
+ANSWER_OPTIONS = {'A', 'B', 'C', 'D'}
+# Tope del tiempo por pregunta que reporta el navegador
+MAX_QUESTION_SECONDS = 3600
+
+
+def record_answer(attempt, question_id, selected, elapsed_seconds):
+    """
+    Guarda (o reemplaza) la respuesta a una pregunta de un intento en curso
+    con un solo upsert sobre (attempt, question). Es idempotente: reenviar
+    la misma respuesta deja la misma fila. elapsed_seconds es el tiempo
+    acumulado en la pregunta, no un incremento. La corrección sale del
+    payload compilado del simulador (attempt.simulator).
+
+    Returns:
+        tuple: (success, response, error_message)
+    """
+    if attempt.status != SimulatorAttempt.AttemptStatus.IN_PROGRESS:
+        return False, None, 'Este intento ya fue completado.'
+
+    selected = (selected or '').strip().upper() or None
+    if selected is not None and selected not in ANSWER_OPTIONS:
+        return False, None, 'Opción inválida.'
+    try:
+        elapsed = min(max(int(elapsed_seconds or 0), 0), MAX_QUESTION_SECONDS)
+    except (TypeError, ValueError):
+        return False, None, 'Tiempo inválido.'
+
+    correct_option = get_payload(attempt.simulator).correct_option(question_id)
+    if correct_option is None:
+        return False, None, 'La pregunta no pertenece a este simulacro.'
+
+    response = SimulatorResponse(
+        attempt=attempt,
+        question_id=question_id,
+        selected_option=selected,
+        is_correct=SimulatorResponse.grade(AnswerKey(question_id, correct_option), selected),
+        time_spent_seconds=elapsed,
+    )
+    SimulatorResponse.objects.bulk_create(
+        [response],
+        update_conflicts=True,
+        unique_fields=['attempt', 'question'],
+        update_fields=['selected_option', 'is_correct', 'time_spent_seconds'],
+    )
+    return True, response, None
+
+
+def submit_attempt(attempt, questions, answers):
+    """
+    Completa las respuestas de un intento y lo califica.
+
+    Las respuestas autoguardadas con record_answer() se conservan (con su
+    tiempo); una respuesta enviada en el formulario final las reemplaza.
+    La corrección se calcula en memoria con las preguntas ya cargadas, las
+    respuestas se insertan con un solo upsert sobre (attempt, question) y
+    el puntaje sale de una consulta agregada y los perfiles de temas
+    débiles se actualizan en bloque: el número de sentencias no depende
+    del número de preguntas ni de temas.
+
+    Args:
+        questions: preguntas activas (instancias o question_payload.AnswerKey)
+        answers: {question_id: 'A'|'B'|'C'|'D'|None}
+
+    Returns:
+        tuple: (success, attempt, error_message)
+    """
+    if attempt.status != SimulatorAttempt.AttemptStatus.IN_PROGRESS:
+        return False, attempt, 'Este intento ya fue completado.'
+
+    saved = {
+        question_id: (selected, seconds)
+        for question_id, selected, seconds in attempt.responses.values_list(
+            'question_id', 'selected_option', 'time_spent_seconds'
+        )
+    }
+    responses = []
+    for question in questions:
+        saved_selected, seconds = saved.get(question.id, (None, 0))
+        selected = answers.get(question.id) or saved_selected
+        responses.append(SimulatorResponse(
+            attempt=attempt,
+            question_id=question.id,
+            selected_option=selected,
+            is_correct=SimulatorResponse.grade(question, selected),
+            time_spent_seconds=seconds,
+        ))
+
+    now = timezone.now()
+    with transaction.atomic():
+        SimulatorResponse.objects.bulk_create(
+            responses,
+            update_conflicts=True,
+            unique_fields=['attempt', 'question'],
+            update_fields=['selected_option', 'is_correct', 'time_spent_seconds'],
+        )
+        attempt.total_time_seconds = int((now - attempt.started_at).total_seconds())
+        attempt.status = SimulatorAttempt.AttemptStatus.COMPLETED
+        attempt.finished_at = now
+        attempt.calculate_score(commit=False)
+        attempt.save(update_fields=[
+            'total_time_seconds', 'status', 'finished_at',
+            *SimulatorAttempt.SCORE_FIELDS,
+        ])
+        update_weak_topic_profile(attempt)
+    return True, attempt, None
+
+
+# ─────────────────────────────────────────────────────────────
+# Intentos adaptativos
+# ─────────────────────────────────────────────────────────────
+
+def served_answer_key(attempt):
+    """Clave de respuestas de las preguntas servidas en un intento adaptativo."""
+    payload = get_payload(attempt.simulator)
+    return [
+        AnswerKey(question_id, payload.correct_option(question_id))
+        for question_id in attempt.adaptive_state.get('served', [])
+    ]
+
+
+def answer_adaptive(attempt, question_id, selected, elapsed_seconds):
+    """
+    Responde la pregunta actual de un intento adaptativo (con el mismo
+    upsert que record_answer) y sirve la siguiente más informativa. Con
+    question_id=None solo devuelve la pregunta actual o sirve la primera.
+    Cuando la estimación converge se califica el intento con las
+    preguntas servidas.
+
+    Returns:
+        tuple: (success, result, error_message); result es
+        {'done', 'question', 'answered', 'standard_error'}
+    """
+    with transaction.atomic():
+        attempt = SimulatorAttempt.objects.select_for_update(of=('self',)).select_related(
+            'simulator'
+        ).get(pk=attempt.pk)
+        if attempt.status != SimulatorAttempt.AttemptStatus.IN_PROGRESS:
+            return False, None, 'Este intento ya fue completado.'
+        if not attempt.is_adaptive:
+            return False, None, 'Este intento no es adaptativo.'
+
+        state = attempt.adaptive_state
+        current = adaptive.pending_question(state)
+        if question_id is not None:
+            if question_id != current:
+                return False, None, 'La pregunta no es la actual.'
+            success, response, error = record_answer(
+                attempt, question_id, selected, elapsed_seconds
+            )
+            if not success:
+                return False, None, error
+            adaptive.record_result(state, question_id, response.is_correct)
+            current = None
+
+        if current is None and not adaptive.should_stop(state):
+            current = adaptive.next_question(state)
+            if current is not None:
+                state['served'].append(current)
+        attempt.save(update_fields=['adaptive_state'])
+
+        if current is None:
+            submit_attempt(attempt, served_answer_key(attempt), {})
+
+    return True, {
+        'done': current is None,
+        'question': current,
+        'answered': state['answered'],
+        'standard_error': adaptive.standard_error(state),
+    }, None
@@ -1,3 +1,1573 @@
+import json
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.academicTutoring.models import ClassSession, SessionMaterial
+from apps.accounts.models import Notification
+from apps.accounts.test_utils import UserFactory, QueryBudgetTestMixin
+from apps.simulators import (
+    adaptive, ai_generator, ai_providers, ai_usage, item_analysis, llm_cache, llm_output,
+    material_selection, question_bank, question_payload, response_store, services, tutor_topics,
+)
+from apps.simulators.models import (
+    AIProviderCall, AIProviderDailyUsage, BankedQuestion, BankedQuestionBand, LLMResponseCache, PackedResponses, QuestionStats, SimulatorResponse, Simulator, SimulatorAttempt, SimulatorGenerationJob,
+    SimulatorQuestion, StudentWeakTopicProfile, TutorTopicAggregate, update_weak_topic_profile,
+)
+
+
+class SimulatorListQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = UserFactory.create_tutor()
+        cls.student = UserFactory.create_client()
+        for i in range(12):
+            session = ClassSession.objects.create(
+                tutor=tutor, client=cls.student, subject=f'Materia {i}',
+                scheduled_date=date.today() - timedelta(days=i + 1),
+                scheduled_time=time(9, 0), status='completed',
+            )
+            simulator = Simulator.objects.create(
+                session=session, tutor=tutor, student=cls.student,
+                title=f'Simulador {i}', subject=session.subject, status='approved',
+            )
+            SimulatorAttempt.objects.create(
+                simulator=simulator, student=cls.student, attempt_number=1
+            )
+
+    def test_list_within_budget(self):
+        self.client.force_login(self.student)
+        self.assertWithinQueryBudget(reverse('simulators:list'))
+
+    def test_list_annotations(self):
+        simulator = Simulator.objects.get(title='Simulador 0')
+        simulator.max_attempts = 2
+        simulator.save(update_fields=['max_attempts'])
+        SimulatorAttempt.objects.filter(simulator=simulator).update(score=40)
+        SimulatorAttempt.objects.create(
+            simulator=simulator, student=self.student, attempt_number=2, score=75,
+        )
+
+        listed = {
+            sim.pk: sim for sim in Simulator.objects.get_student_simulators(
+                self.student, statuses=['approved']
+            )
+        }
+        self.assertEqual(len(listed), 12)
+        row = listed[simulator.pk]
+        self.assertEqual((row.attempt_count, row.can_attempt), (2, False))
+        self.assertEqual(float(row.last_attempt_score), 75.0)
+        other = next(sim for pk, sim in listed.items() if pk != simulator.pk)
+        self.assertEqual((other.attempt_count, other.can_attempt), (1, True))
+        self.assertIsNone(other.last_attempt_score)
+
+
+class GenerationJobQueueTest(TestCase):
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        self.session = ClassSession.objects.create(
+            tutor=self.tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        SessionMaterial.objects.create(
+            session=self.session, type='file', file='sessions/materials/guia.pdf'
+        )
+
+    def _enqueue(self):
+        return services.enqueue_generation(
+            SimulatorGenerationJob.Kind.DIAGNOSTIC,
+            self.session, self.student, self.tutor
+        )
+
+    def test_view_enqueues_without_generating(self):
+        self.client.force_login(self.tutor)
+        with mock.patch('apps.simulators.ai_generator.generate_simulator') as generate:
+            response = self.client.post(
+                reverse('simulators:generate', args=[self.session.pk]),
+                {'tutor_ai_context': 'Regla de la cadena'}
+            )
+        self.assertRedirects(response, reverse('tutor_session_history'),
+                             fetch_redirect_response=False)
+        generate.assert_not_called()
+        job = SimulatorGenerationJob.objects.get()
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.QUEUED)
+        self.assertEqual(job.requested_by, self.tutor)
+
+    def test_duplicate_active_job_is_not_created(self):
+        self._enqueue()
+        success, job, error = self._enqueue()
+        self.assertFalse(success)
+        self.assertIsNotNone(error)
+        self.assertEqual(SimulatorGenerationJob.objects.count(), 1)
+
+    def test_claim_is_exclusive(self):
+        self._enqueue()
+        job = services.claim_next_job('worker-a')
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.RUNNING)
+        self.assertEqual(job.tries, 1)
+        self.assertIsNone(services.claim_next_job('worker-b'))
+
+    @mock.patch('apps.simulators.ai_generator.generate_simulator')
+    def test_run_records_progress_result_and_notifies(self, generate):
+        simulator = Simulator.objects.create(
+            session=self.session, tutor=self.tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', generation_status='done',
+            status='pending_approval',
+        )
+
+        def fake_generate(session, student, on_progress=None):
+            on_progress(30, 'Generando preguntas con IA', simulator)
+            return True, 'Simulacro generado con 50 preguntas.'
+        generate.side_effect = fake_generate
+
+        self._enqueue()
+        job = services.run_generation_job(services.claim_next_job('worker-a'))
+
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.simulator, simulator)
+        self.assertTrue(Notification.objects.filter(
+            recipient=self.tutor, message__contains='listo').exists())
+
+    @mock.patch('apps.simulators.ai_generator.generate_simulator',
+                side_effect=RuntimeError('boom'))
+    def test_crash_marks_job_failed(self, generate):
+        self._enqueue()
+        job = services.run_generation_job(services.claim_next_job('worker-a'))
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.FAILED)
+        self.assertTrue(job.result_message)
+
+    def test_stale_running_job_is_requeued_and_simulator_released(self):
+        _, job, _ = self._enqueue()
+        simulator = Simulator.objects.create(
+            session=self.session, tutor=self.tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', generation_status='generating',
+        )
+        SimulatorGenerationJob.objects.filter(pk=job.pk).update(
+            status='running', tries=1, simulator=simulator,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        requeued, failed = services.requeue_stuck_jobs()
+
+        job.refresh_from_db()
+        simulator.refresh_from_db()
+        self.assertEqual((requeued, failed), (1, 0))
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.QUEUED)
+        self.assertEqual(simulator.generation_status, 'failed')
+
+    @mock.patch('apps.simulators.ai_generator.generate_simulator')
+    def test_job_taken_over_while_running_drops_its_result(self, generate):
+        simulator = Simulator.objects.create(
+            session=self.session, tutor=self.tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', generation_status='done',
+            status='pending_approval',
+        )
+
+        def fake_generate(session, student, on_progress=None):
+            on_progress(30, 'Generando preguntas con IA', simulator)
+            # Sin latido: otro worker la recupera mientras esta sigue
+            SimulatorGenerationJob.objects.update(
+                heartbeat_at=timezone.now() - timedelta(hours=1)
+            )
+            services.requeue_stuck_jobs()
+            services.claim_next_job('worker-b')
+            return True, 'Simulacro generado con 50 preguntas.'
+        generate.side_effect = fake_generate
+
+        self._enqueue()
+        job = services.run_generation_job(services.claim_next_job('worker-a'))
+
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.RUNNING)
+        self.assertEqual(job.worker, 'worker-b')
+        self.assertFalse(Simulator.objects.filter(pk=simulator.pk).exists())
+        self.assertFalse(Notification.objects.exists())
+
+    @mock.patch('apps.simulators.ai_generator.generate_simulator')
+    def test_waiting_for_provider_slot_beats_heartbeat(self, generate):
+        def fake_generate(session, student, on_progress=None):
+            SimulatorGenerationJob.objects.update(heartbeat_at=None)
+            with ai_providers.provider_slot():
+                pass
+            self.assertIsNotNone(SimulatorGenerationJob.objects.get().heartbeat_at)
+            return False, 'Sin material'
+        generate.side_effect = fake_generate
+
+        self._enqueue()
+        job = services.run_generation_job(services.claim_next_job('worker-a'))
+        self.assertEqual(job.status, SimulatorGenerationJob.Status.FAILED)
+
+    def test_orphan_generating_simulator_is_requeued(self):
+        simulator = Simulator.objects.create(
+            session=self.session, tutor=self.tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', generation_status='generating',
+        )
+        Simulator.objects.filter(pk=simulator.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        services.requeue_stuck_jobs()
+
+        simulator.refresh_from_db()
+        self.assertEqual(simulator.generation_status, 'failed')
+        self.assertTrue(SimulatorGenerationJob.objects.filter(
+            session=self.session, status='queued').exists())
+
+    def test_status_endpoint_reports_progress_to_owner_only(self):
+        _, job, _ = self._enqueue()
+        self.client.force_login(self.tutor)
+        data = self.client.get(reverse('simulators:job_status', args=[job.pk])).json()
+        self.assertEqual(data['status'], 'queued')
+        self.assertFalse(data['finished'])
+
+        self.client.force_login(UserFactory.create_tutor())
+        response = self.client.get(reverse('simulators:job_status', args=[job.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+def _question(i, **overrides):
+    q = {
+        'topic_tag': f'tema_{i % 5}', 'difficulty': 'medium',
+        'statement': f'Pregunta {i}', 'option_a': 'a', 'option_b': 'b',
+        'option_c': 'c', 'option_d': 'd', 'correct_option': 'B',
+        'explanation': 'Porque sí',
+    }
+    q.update(overrides)
+    return q
+
+
+class LLMOutputTest(TestCase):
+    """Parseo tolerante de la respuesta del LLM (llm_output)."""
+
+    def test_fences_and_surrounding_text_are_stripped(self):
+        payload = json.dumps({'questions': [_question(1)]})
+        for text in (f'```json\n{payload}\n```', f'Aquí está:\n{payload}\nSuerte.',
+                     payload.replace(']}', '],}')):
+            with self.subTest(text=text[:20]):
+                self.assertEqual(llm_output.loads(text)['questions'][0]['statement'], 'Pregunta 1')
+
+    def test_truncated_response_keeps_closed_questions(self):
+        payload = json.dumps({'questions': [_question(i) for i in range(3)]})
+        data = llm_output.loads(payload[:-40])
+        self.assertTrue(data['truncated'])
+        self.assertEqual(len(data['questions']), 2)
+        with self.assertRaises(ValueError):
+            llm_output.loads('{"questions": [{"statement": "sin cerrar')
+
+    def test_each_question_is_validated_and_normalized(self):
+        result = llm_output.salvage({'questions': [
+            _question(1, difficulty='Media', correct_option='b)', statement='  ¿Uno?  '),
+            _question(2, difficulty='extrema'),
+            _question(3, statement='¿UNO?'),
+            'no es una pregunta',
+        ]})
+        self.assertEqual(len(result.questions), 1)
+        q = result.questions[0]
+        self.assertEqual((q['difficulty'], q['correct_option'], q['statement']),
+                         ('medium', 'B', '¿Uno?'))
+        self.assertEqual(sum(result.dropped.values()), 3)
+
+    def test_partial_responses_are_not_cached(self):
+        questions = [_question(i) for i in range(3)] + [_question(3, correct_option='E')]
+        with self.settings(SIMULATOR_LLM_CACHE_ENABLED=True), \
+                mock.patch.object(ai_generator, 'call_llm', return_value={'questions': questions}):
+            ai_generator.call_ai_provider('system', 'prompt')
+        self.assertFalse(LLMResponseCache.objects.exists())
+
+
+class GeneratorPersistenceTest(TestCase):
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        self.session = ClassSession.objects.create(
+            tutor=self.tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        SessionMaterial.objects.create(
+            session=self.session, type='url', url='https://example.com/guia'
+        )
+
+    def _generate(self, questions):
+        with mock.patch.object(ai_generator, 'call_ai_provider',
+                               return_value={'questions': questions}):
+            return ai_generator.generate_simulator(self.session, self.student)
+
+    def test_questions_are_bulk_inserted_and_published(self):
+        with CaptureQueriesContext(connection) as ctx:
+            success, message = self._generate([
+                _question(i, difficulty=('low', 'medium', 'high')[min(2, i // 20)])
+                for i in range(50)
+            ])
+
+        self.assertTrue(success, message)
+        simulator = Simulator.objects.get()
+        self.assertEqual(simulator.status, 'pending_approval')
+        self.assertEqual(simulator.generation_status, 'done')
+        self.assertEqual(simulator.source_material_url, 'https://example.com/guia')
+        self.assertTrue(simulator.generation_prompt)
+        self.assertEqual(
+            list(simulator.questions.values_list('order', flat=True)),
+            list(range(1, 51))
+        )
+        inserts = [q for q in ctx.captured_queries
+                   if q['sql'].startswith('INSERT') and 'simulatorquestion' in q['sql']]
+        self.assertLessEqual(len(inserts), 2)
+        self.assertLess(len(ctx.captured_queries), 20)
+
+    def test_invalid_question_is_dropped_and_only_missing_ones_requested(self):
+        questions = [_question(i, difficulty='low') for i in range(20)]
+        questions += [_question(i, difficulty='medium') for i in range(20, 40)]
+        questions += [_question(i, difficulty='high') for i in range(40, 55)]
+        questions[25] = _question(25, difficulty='medium', option_c='   ')
+        questions.append(_question(0, difficulty='low'))  # enunciado repetido
+        top_up = [_question(100 + i, difficulty='medium') for i in range(3)]
+
+        with mock.patch.object(ai_generator, 'call_ai_provider', side_effect=[
+            {'questions': questions}, {'questions': top_up},
+        ]) as provider:
+            success, message = ai_generator.generate_simulator(self.session, self.student)
+
+        self.assertTrue(success, message)
+        self.assertEqual(provider.call_count, 2)
+        # Dos descartadas, pero solo falta una (medium) para el cupo 20/20/10
+        self.assertIn('SOLO 1 preguntas nuevas (1 de dificultad medium)',
+                      provider.call_args[0][1])
+        simulator = Simulator.objects.get()
+        self.assertEqual(
+            list(simulator.questions.order_by('order').values_list('difficulty', flat=True)),
+            ['low'] * 20 + ['medium'] * 20 + ['high'] * 10,
+        )
+
+    def test_complete_response_is_not_topped_up(self):
+        with mock.patch.object(ai_generator, 'call_ai_provider', return_value={
+            'questions': [_question(i) for i in range(8)],
+        }) as provider:
+            success, message = ai_generator.generate_simulator(self.session, self.student)
+
+        self.assertTrue(success, message)
+        provider.assert_called_once()
+
+    def test_topped_up_set_is_cached_for_the_original_prompt(self):
+        partial = [_question(i) for i in range(6)] + [_question(6, correct_option='E')]
+        with self.settings(SIMULATOR_LLM_CACHE_ENABLED=True), \
+                mock.patch.object(ai_generator, 'call_llm', side_effect=[
+                    {'questions': partial}, {'questions': [_question(50)]},
+                ]) as provider:
+            self.assertTrue(ai_generator.generate_simulator(self.session, self.student)[0])
+            Simulator.objects.update(status='rejected', generation_status='failed')
+            success, message = ai_generator.generate_simulator(self.session, self.student)
+
+        self.assertTrue(success, message)
+        self.assertEqual(provider.call_count, 2)
+        self.assertEqual(Simulator.objects.order_by('-pk').first().questions.count(), 7)
+
+    def test_response_without_valid_questions_saves_nothing(self):
+        success, _ = self._generate([_question(i, option_c='   ') for i in range(10)])
+
+        self.assertFalse(success)
+        self.assertFalse(SimulatorQuestion.objects.exists())
+        self.assertEqual(Simulator.objects.get().generation_status, 'failed')
+
+    def test_failed_insert_leaves_no_partial_simulator(self):
+        with mock.patch.object(SimulatorQuestion.objects, 'bulk_create',
+                               side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self._generate([_question(i) for i in range(5)])
+
+        self.assertFalse(SimulatorQuestion.objects.exists())
+        self.assertEqual(Simulator.objects.get().generation_status, 'generating')
+
+
+class SimulatorSubmitTest(TestCase):
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=self.tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        self.simulator = Simulator.objects.create(
+            session=session, tutor=self.tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', status='approved',
+            generation_status='done',
+        )
+        SimulatorQuestion.objects.bulk_create(
+            SimulatorQuestion(simulator=self.simulator, order=i + 1, **_question(i))
+            for i in range(50)
+        )
+        self.attempt = SimulatorAttempt.objects.create(
+            simulator=self.simulator, student=self.student, attempt_number=1
+        )
+        self.client.force_login(self.student)
+        cache.clear()
+
+    def _post(self, answers):
+        return self.client.post(
+            reverse('simulators:submit', args=[self.simulator.pk, self.attempt.pk]),
+            {f'question_{qid}': option for qid, option in answers.items()}
+        )
+
+    def test_submit_scores_with_constant_queries(self):
+        questions = list(self.simulator.questions.order_by('order'))
+        # 20 correctas, 20 incorrectas, 10 sin responder
+        answers = {q.pk: 'B' for q in questions[:20]}
+        answers.update({q.pk: 'C' for q in questions[20:40]})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post(answers)
+        self.assertEqual(response.status_code, 302)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'completed')
+        self.assertEqual(
+            (self.attempt.correct_count, self.attempt.incorrect_count,
+             self.attempt.unanswered_count),
+            (20, 20, 10)
+        )
+        self.assertEqual(self.attempt.score, 40.0)
+        self.assertEqual(sum(t['total'] for t in self.attempt.performance_by_topic.values()), 50)
+        self.assertEqual(self.attempt.responses.filter(is_correct=True).count(), 20)
+        self.assertEqual(StudentWeakTopicProfile.objects.filter(
+            student=self.student, subject='Cálculo').count(), 5)
+        response_writes = [q for q in ctx.captured_queries
+                           if 'simulatorresponse' in q['sql']
+                           and q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(response_writes), 1)
+
+    def test_resubmitting_same_attempt_is_rejected(self):
+        self._post({})
+        self._post({q.pk: 'B' for q in self.simulator.questions.all()})
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.correct_count, 0)
+        self.assertEqual(self.attempt.unanswered_count, 50)
+
+    def _answer(self, question_id, selected, elapsed=0):
+        return self.client.post(
+            reverse('simulators:answer', args=[self.simulator.pk, self.attempt.pk]),
+            json.dumps({'question': question_id, 'selected': selected, 'elapsed': elapsed}),
+            content_type='application/json',
+        )
+
+    def test_autosave_is_a_single_idempotent_upsert(self):
+        question = self.simulator.questions.get(order=1)
+        self._answer(question.pk, 'C', elapsed=12)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._answer(question.pk, 'b', elapsed=30)
+        self.assertEqual(response.json(), {'ok': True, 'question': question.pk, 'selected': 'B'})
+        # intento y upsert (la corrección sale del payload cacheado); el
+        # resto es la sesión de Django
+        simulator_queries = [q for q in ctx.captured_queries if 'simulators_' in q['sql']]
+        self.assertEqual(len(simulator_queries), 2)
+
+        saved = self.attempt.responses.get()
+        self.assertEqual((saved.selected_option, saved.is_correct, saved.time_spent_seconds),
+                         ('B', True, 30))
+
+    def test_autosave_rejects_foreign_questions_and_finished_attempts(self):
+        other = Simulator.objects.create(
+            session=self.simulator.session, tutor=self.tutor, student=self.student,
+            title='Otro', subject='Cálculo', status='approved',
+        )
+        foreign = SimulatorQuestion.objects.create(simulator=other, order=1, **_question(0))
+        self.assertEqual(self._answer(foreign.pk, 'B').status_code, 400)
+        self.assertEqual(self._answer(self.simulator.questions.first().pk, 'E').status_code, 400)
+
+        self._post({})
+        response = self._answer(self.simulator.questions.first().pk, 'B')
+        self.assertEqual(response.status_code, 409)
+
+    def test_attempt_and_grading_read_compiled_payload(self):
+        attempt_url = reverse('simulators:attempt', args=[self.simulator.pk, self.attempt.pk])
+        questions = list(self.simulator.questions.order_by('order'))
+        self.client.get(attempt_url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            page = self.client.get(attempt_url)
+            self._answer(questions[1].pk, 'B')
+            self._post({q.pk: 'B' for q in questions[:10]})
+
+        self.assertContains(page, 'Pregunta 49')
+        self.assertFalse([q for q in ctx.captured_queries
+                          if 'FROM "simulators_simulatorquestion"' in q['sql']])
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.correct_count, 10)
+
+    def test_admin_edit_invalidates_compiled_payload(self):
+        question = self.simulator.questions.get(order=1)
+        self.assertEqual(question_payload.get_payload(self.simulator).correct_option(question.pk), 'B')
+
+        question.correct_option = 'D'
+        admin.site._registry[SimulatorQuestion].save_model(None, question, None, True)
+
+        self.simulator.refresh_from_db()
+        payload = question_payload.get_payload(self.simulator)
+        self.assertEqual(payload.version, 2)
+        self.assertEqual(payload.correct_option(question.pk), 'D')
+
+    def test_final_submit_keeps_autosaved_answers_and_timings(self):
+        questions = list(self.simulator.questions.order_by('order'))
+        for q in questions[:3]:
+            self._answer(q.pk, 'B', elapsed=20)
+        self._answer(questions[3].pk, 'A', elapsed=5)
+
+        # El formulario final cambia una respuesta y no trae las demás
+        self._post({questions[3].pk: 'B'})
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.correct_count, 4)
+        self.assertEqual(self.attempt.responses.count(), 50)
+        self.assertEqual(
+            self.attempt.responses.get(question=questions[0]).time_spent_seconds, 20
+        )
+        self.assertEqual(
+            self.attempt.responses.get(question=questions[3]).time_spent_seconds, 5
+        )
+
+
+class WeakTopicProfileUpdateTest(TestCase):
+
+    def setUp(self):
+        tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        self.simulator = Simulator.objects.create(
+            session=session, tutor=tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', status='approved',
+        )
+
+    def _attempt(self, number, performance):
+        return SimulatorAttempt.objects.create(
+            simulator=self.simulator, student=self.student,
+            attempt_number=number, performance_by_topic=performance,
+        )
+
+    def test_profiles_are_upserted_in_constant_queries(self):
+        StudentWeakTopicProfile.objects.create(
+            student=self.student, subject='Cálculo', topic_tag='tema_0',
+            total_questions_seen=4, total_correct=4, cumulative_score_pct=100,
+            consecutive_failures=0,
+        )
+        performance = {
+            f'tema_{i}': {'correct': 1, 'total': 2, 'pct': 50.0} for i in range(30)
+        }
+        attempt = self._attempt(1, performance)
+
+        with CaptureQueriesContext(connection) as ctx:
+            update_weak_topic_profile(attempt)
+
+        # perfiles + agregados del tutor, sin depender del número de temas
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+        self.assertEqual(StudentWeakTopicProfile.objects.count(), 30)
+        self.assertEqual(TutorTopicAggregate.objects.get(topic_tag='tema_7').weak_count, 1)
+        existing = StudentWeakTopicProfile.objects.get(topic_tag='tema_0')
+        self.assertEqual((existing.total_questions_seen, existing.total_correct), (6, 5))
+        self.assertEqual(float(existing.cumulative_score_pct), 83.33)
+        self.assertEqual(existing.consecutive_failures, 1)
+        new = StudentWeakTopicProfile.objects.get(topic_tag='tema_7')
+        self.assertEqual(float(new.cumulative_score_pct), 50.0)
+
+    def test_consecutive_failures_reset_on_perfect_topic(self):
+        update_weak_topic_profile(self._attempt(1, {'límites': {'correct': 0, 'total': 3}}))
+        update_weak_topic_profile(self._attempt(2, {'límites': {'correct': 1, 'total': 3}}))
+        profile = StudentWeakTopicProfile.objects.get()
+        self.assertEqual(profile.consecutive_failures, 2)
+
+        update_weak_topic_profile(self._attempt(3, {'límites': {'correct': 3, 'total': 3}}))
+        profile.refresh_from_db()
+        self.assertEqual(profile.consecutive_failures, 0)
+        self.assertEqual(profile.total_questions_seen, 9)
+
+
+class TutorTopicAggregateTest(TestCase):
+    """Los temas débiles por tutor se mantienen por diferencia al cerrar intentos."""
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.students = [UserFactory.create_client() for _ in range(2)]
+        self.simulators = []
+        for student in self.students:
+            session = ClassSession.objects.create(
+                tutor=self.tutor, client=student, subject='Cálculo',
+                scheduled_date=date.today() - timedelta(days=1),
+                scheduled_time=time(9, 0), status='completed',
+            )
+            self.simulators.append(Simulator.objects.create(
+                session=session, tutor=self.tutor, student=student,
+                title='Simulacro', subject='Cálculo', status='approved',
+            ))
+
+    def _finish(self, index, number, performance):
+        attempt = SimulatorAttempt.objects.create(
+            simulator=self.simulators[index], student=self.students[index],
+            attempt_number=number, performance_by_topic=performance,
+            status=SimulatorAttempt.AttemptStatus.COMPLETED,
+        )
+        update_weak_topic_profile(attempt)
+        return attempt
+
+    def _values(self):
+        return {
+            a.topic_tag: (a.student_count, a.weak_count, float(a.mean_score_pct))
+            for a in TutorTopicAggregate.objects.filter(tutor=self.tutor)
+        }
+
+    def test_attempts_update_aggregates_incrementally(self):
+        self._finish(0, 1, {'límites': {'correct': 1, 'total': 4}})
+        self._finish(1, 1, {'límites': {'correct': 4, 'total': 4},
+                            'derivadas': {'correct': 0, 'total': 2}})
+        self.assertEqual(self._values(), {
+            'límites': (2, 1, 62.5),
+            'derivadas': (1, 1, 0.0),
+        })
+
+        # El mismo estudiante mejora: no se cuenta dos veces y la tendencia sube
+        self._finish(0, 2, {'límites': {'correct': 4, 'total': 4}})
+        aggregate = TutorTopicAggregate.objects.get(topic_tag='límites')
+        self.assertEqual((aggregate.student_count, aggregate.weak_count), (2, 0))
+        self.assertEqual(float(aggregate.mean_score_pct), 81.25)  # (62.5 + 100) / 2
+        self.assertGreater(aggregate.trend, 0)
+
+    def test_rebuild_matches_incremental(self):
+        self._finish(0, 1, {'límites': {'correct': 1, 'total': 4}})
+        self._finish(0, 2, {'límites': {'correct': 2, 'total': 4}})
+        self._finish(1, 1, {'límites': {'correct': 3, 'total': 4}})
+        incremental = self._values()
+
+        self.assertEqual(tutor_topics.rebuild_tutor_topic_aggregates(), 1)
+        self.assertEqual(self._values(), incremental)
+
+    def test_history_lists_weak_topics(self):
+        self._finish(0, 1, {'límites': {'correct': 0, 'total': 4}})
+        self.client.force_login(self.tutor)
+        response = self.client.get(reverse('tutor_session_history'))
+        self.assertContains(response, 'Temas Débiles de tus Estudiantes')
+        self.assertEqual(
+            [t.topic_tag for t in response.context['weak_topics']], ['límites']
+        )
+
+
+class LLMResponseCacheTest(TestCase):
+
+    def setUp(self):
+        self.payload = {'questions': [_question(i) for i in range(3)]}
+
+    def _call(self, user_prompt='Material: derivadas', **kwargs):
+        with mock.patch.object(ai_generator, 'call_llm',
+                               return_value=self.payload) as llm:
+            data = ai_generator.call_ai_provider('system', user_prompt, **kwargs)
+        return data, llm.call_count
+
+    def test_identical_request_is_served_from_cache(self):
+        _, calls = self._call()
+        self.assertEqual(calls, 1)
+
+        data, calls = self._call('Material:   derivadas\n')
+        self.assertEqual(calls, 0)
+        self.assertEqual(len(data['questions']), 3)
+        self.assertEqual(LLMResponseCache.objects.get().hits, 1)
+
+        _, calls = self._call(force_fresh=True)
+        self.assertEqual(calls, 1)
+
+    def test_invalid_response_is_not_cached(self):
+        self.payload = {'questions': [{'statement': 'incompleta'}]}
+        self._call()
+        self.assertFalse(LLMResponseCache.objects.exists())
+
+    def test_expired_entries_are_ignored_and_size_is_bounded(self):
+        self._call()
+        LLMResponseCache.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        _, calls = self._call()
+        self.assertEqual(calls, 1)
+
+        with self.settings(SIMULATOR_LLM_CACHE_MAX_ENTRIES=2):
+            for i in range(4):
+                self._call(f'Material {i}')
+        self.assertEqual(LLMResponseCache.objects.count(), 2)
+        self.assertEqual(llm_cache.stats()['entries'], 2)
+
+    def test_rejecting_simulator_forgets_cached_questions(self):
+        tutor = UserFactory.create_tutor()
+        student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=tutor, client=student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        prompt = 'Material: derivadas'
+        simulator = Simulator.objects.create(
+            session=session, tutor=tutor, student=student, title='Simulacro',
+            subject='Cálculo', status='pending_approval', generation_prompt=prompt,
+        )
+        with mock.patch.object(ai_generator, 'call_llm', return_value=self.payload):
+            ai_generator.call_ai_provider(ai_generator.build_system_prompt(), prompt)
+        self.assertTrue(LLMResponseCache.objects.exists())
+
+        self.client.force_login(tutor)
+        self.client.post(reverse('simulator_approve', args=[simulator.pk]), {'action': 'reject'})
+        self.assertFalse(LLMResponseCache.objects.exists())
+
+
+class StreamingGenerationTest(TestCase):
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        self.session = ClassSession.objects.create(
+            tutor=self.tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        SessionMaterial.objects.create(
+            session=self.session, type='url', url='https://example.com/guia'
+        )
+
+    @staticmethod
+    def _chunks(text, size=37):
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def test_parser_yields_questions_as_they_close(self):
+        questions = [_question(i, statement='¿Cuánto es {x} si "y" = \\\\}?')
+                     for i in range(3)]
+        text = json.dumps({'questions': questions}, ensure_ascii=False)
+        parser = ai_generator.QuestionStreamParser()
+        parsed = []
+        for chunk in self._chunks(text):
+            parsed.extend(parser.feed(chunk))
+        self.assertEqual(parsed, questions)
+        self.assertTrue(parser.finished)
+
+    def _generate(self, chunks, error=None):
+        def fake_stream(system_prompt, user_prompt):
+            yield from chunks
+            if error:
+                raise error
+
+        with self.settings(SIMULATOR_LLM_STREAMING=True, SIMULATOR_STREAM_MIN_QUESTIONS=3), \
+                mock.patch.object(ai_generator, 'stream_llm', side_effect=fake_stream):
+            return ai_generator.generate_simulator(self.session, self.student)
+
+    def test_truncated_stream_keeps_completed_questions(self):
+        text = json.dumps({'questions': [_question(i) for i in range(5)]})
+        truncated = text[:text.index('Pregunta 4')]
+
+        success, message = self._generate(self._chunks(truncated), error=TimeoutError('read timeout'))
+
+        self.assertTrue(success, message)
+        simulator = Simulator.objects.get()
+        self.assertEqual(simulator.status, 'pending_approval')
+        self.assertEqual(simulator.generated_question_count, 4)
+        self.assertEqual(simulator.questions.count(), 4)
+        # Una respuesta cortada no se cachea
+        self.assertFalse(LLMResponseCache.objects.exists())
+
+    def test_complete_stream_is_cached(self):
+        text = json.dumps({'questions': [_question(i) for i in range(5)]})
+        success, _ = self._generate(self._chunks(text))
+        self.assertTrue(success)
+        self.assertEqual(LLMResponseCache.objects.get().question_count, 5)
+
+    def test_stream_enforces_difficulty_mix_as_questions_arrive(self):
+        questions = [_question(i, difficulty='high') for i in range(15)]
+        questions += [_question(i, difficulty='low') for i in range(15, 20)]
+        text = json.dumps({'questions': questions})
+
+        success, message = self._generate(self._chunks(text))
+
+        self.assertTrue(success, message)
+        simulator = Simulator.objects.get()
+        self.assertEqual(simulator.generated_question_count, 15)
+        self.assertEqual(simulator.questions.filter(difficulty='high').count(), 10)
+        self.assertEqual(simulator.questions.filter(difficulty='low').count(), 5)
+
+    def test_too_few_questions_discards_partial_results(self):
+        text = json.dumps({'questions': [_question(i) for i in range(5)]})
+        truncated = text[:text.index('Pregunta 2')]
+
+        success, _ = self._generate(self._chunks(truncated), error=ConnectionError('reset'))
+
+        self.assertFalse(success)
+        simulator = Simulator.objects.get()
+        self.assertEqual(simulator.generation_status, 'failed')
+        self.assertEqual(simulator.generated_question_count, 0)
+        self.assertFalse(SimulatorQuestion.objects.exists())
+
+    def _reinforce(self, chunks, error=None):
+        diagnostic = Simulator.objects.create(
+            session=self.session, tutor=self.tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', status='published',
+        )
+        attempt = SimulatorAttempt.objects.create(
+            simulator=diagnostic, student=self.student, attempt_number=1,
+        )
+        StudentWeakTopicProfile.objects.create(
+            student=self.student, subject='Cálculo', topic_tag='tema_0',
+            total_questions_seen=4, total_correct=1, cumulative_score_pct=25,
+            consecutive_failures=1,
+        )
+
+        def fake_stream(system_prompt, user_prompt):
+            yield from chunks
+            if error:
+                raise error
+
+        # Mínimo por defecto (20): no aplica a un refuerzo de 10 preguntas
+        with self.settings(SIMULATOR_LLM_STREAMING=True), \
+                mock.patch.object(ai_generator, 'stream_llm', side_effect=fake_stream):
+            return ai_generator.generate_reinforcement_simulator(attempt, self.student)
+
+    def test_streamed_reinforcement_is_published(self):
+        text = json.dumps({'questions': [_question(i) for i in range(10)]})
+        success, message = self._reinforce(self._chunks(text))
+
+        self.assertTrue(success, message)
+        reinforcement = Simulator.objects.get(simulator_type='reinforcement')
+        self.assertEqual(reinforcement.generated_question_count, 10)
+
+    def test_interrupted_reinforcement_uses_reinforcement_minimum(self):
+        text = json.dumps({'questions': [_question(i) for i in range(10)]})
+        truncated = text[:text.index('Pregunta 6')]
+
+        success, message = self._reinforce(self._chunks(truncated), error=TimeoutError('read timeout'))
+
+        self.assertTrue(success, message)
+        reinforcement = Simulator.objects.get(simulator_type='reinforcement')
+        self.assertEqual(reinforcement.generated_question_count, 6)
+
+
+class MaterialSelectionTest(TestCase):
+
+    def test_relevant_passages_win_the_budget_in_original_order(self):
+        filler = 'El curso tiene reglas de asistencia y horarios de oficina. ' * 13
+        text = '\n\n'.join([
+            filler,
+            'La derivada implícita se obtiene derivando ambos lados de la ecuación.',
+            filler,
+            'Ejemplo de derivadas implícitas: x² + y² = 1 implica dy/dx = -x/y.',
+            filler,
+        ])
+        selected = material_selection.select_passages(
+            [text], 'Cálculo derivadas implícitas', budget=300
+        )[0]
+        self.assertEqual(len(selected), 2)
+        self.assertTrue(selected[0].startswith('La derivada implícita'))
+        self.assertTrue(selected[1].startswith('Ejemplo de derivadas'))
+
+    def test_long_paragraphs_are_split_under_passage_size(self):
+        passages = material_selection.split_passages('Una oración corta. ' * 200)
+        self.assertGreater(len(passages), 1)
+        self.assertTrue(all(len(p) <= material_selection.PASSAGE_CHARS for p in passages))
+
+    def test_prompt_keeps_closing_instructions_within_budget(self):
+        tutor = UserFactory.create_tutor()
+        student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=tutor, client=student, subject='Cálculo',
+            scheduled_date=date.today(), scheduled_time=time(9, 0),
+        )
+        material = SessionMaterial(session=session, type='file', filename='guia.pdf',
+                                   file='sessions/materials/guia.pdf')
+        with mock.patch.object(ai_generator, 'material_text',
+                               return_value='Texto de relleno sobre límites. ' * 2000):
+            prompt = ai_generator.build_user_prompt(
+                session, [material], ['límites laterales'], tutor_context='Enfócate en límites'
+            )
+        self.assertLessEqual(len(prompt), ai_generator.MAX_PROMPT_CHARS)
+        self.assertTrue(prompt.endswith('Responde SOLO con el JSON especificado en el system prompt.'))
+        self.assertIn('límites laterales', prompt)
+
+
+class QuestionBankTest(TestCase):
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        self.session = ClassSession.objects.create(
+            tutor=self.tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        SessionMaterial.objects.create(
+            session=self.session, type='url', url='https://example.com/guia'
+        )
+
+    @staticmethod
+    def _bank_question(i, **overrides):
+        overrides.setdefault(
+            'statement', f'¿Cuál es la derivada de x elevado a la potencia {i} en el punto uno?'
+        )
+        return _question(i, **overrides)
+
+    def _approved_simulator(self, questions, student=None):
+        simulator = Simulator.objects.create(
+            session=self.session, tutor=self.tutor, student=student or self.student,
+            title='Simulacro', subject='Cálculo', status='pending_approval',
+        )
+        SimulatorQuestion.objects.bulk_create(
+            ai_generator._build_questions(simulator, questions)
+        )
+        self.client.force_login(self.tutor)
+        self.client.post(reverse('simulator_approve', args=[simulator.pk]), {'action': 'approve'})
+        return simulator
+
+    def test_approval_banks_questions_without_near_duplicates(self):
+        self._approved_simulator([self._bank_question(i) for i in range(4)])
+        # Mismo enunciado con otro formato: se enlaza a la entrada existente
+        repeated = self._approved_simulator([
+            self._bank_question(0, statement='¿CUÁL es la derivada de x  elevado a la potencia 0 en el punto uno?'),
+            self._bank_question(9),
+        ])
+
+        self.assertEqual(BankedQuestion.objects.count(), 5)
+        self.assertEqual(BankedQuestion.objects.filter(topic_key='tema_0').count(), 1)
+        self.assertEqual(
+            repeated.questions.get(order=1).bank_question,
+            BankedQuestion.objects.get(source_simulator__isnull=False, topic_key='tema_0'),
+        )
+        self.assertFalse(repeated.questions.filter(bank_question__isnull=True).exists())
+
+    def test_banking_loads_only_entries_sharing_a_band(self):
+        unrelated = [
+            self._bank_question(i, statement=f'Enunciado distinto número {i} sobre el tema {i * 7} de física')
+            for i in range(20)
+        ]
+        self._approved_simulator(unrelated)
+        self.assertEqual(
+            BankedQuestionBand.objects.count(), 20 * question_bank.LSH_BANDS
+        )
+
+        with mock.patch.object(question_bank, 'DuplicateFilter',
+                               wraps=question_bank.DuplicateFilter) as dedup:
+            self._approved_simulator([
+                self._bank_question(0, statement='Enunciado distinto número 0 sobre el tema 0 de física.'),
+            ])
+
+        loaded = list(dedup.call_args.args[0])
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(BankedQuestion.objects.count(), 20)
+
+    def test_reinforcement_covered_by_bank_skips_llm(self):
+        other = UserFactory.create_client()
+        self._approved_simulator([self._bank_question(i) for i in range(15)], student=other)
+        attempt = SimulatorAttempt.objects.create(
+            simulator=Simulator.objects.get(), student=self.student, attempt_number=1,
+        )
+        for topic in ('tema_0', 'tema_1', 'tema_2'):
+            StudentWeakTopicProfile.objects.create(
+                student=self.student, subject='Cálculo', topic_tag=topic,
+                total_questions_seen=4, total_correct=1, cumulative_score_pct=25,
+                consecutive_failures=1,
+            )
+
+        with mock.patch.object(ai_generator, 'call_ai_provider') as provider:
+            success, message = ai_generator.generate_reinforcement_simulator(attempt, self.student)
+
+        self.assertTrue(success, message)
+        provider.assert_not_called()
+        reinforcement = Simulator.objects.get(simulator_type='reinforcement')
+        self.assertEqual(reinforcement.generated_question_count, 6)
+        self.assertFalse(reinforcement.generation_prompt)
+        self.assertEqual(
+            BankedQuestion.objects.filter(times_served=1).count(), 6
+        )
+
+    def test_diagnostic_drops_llm_near_duplicates_of_banked_questions(self):
+        other = UserFactory.create_client()
+        self._approved_simulator([self._bank_question(i) for i in range(10)], student=other)
+        StudentWeakTopicProfile.objects.create(
+            student=self.student, subject='Cálculo', topic_tag='tema_3',
+            total_questions_seen=4, total_correct=1, cumulative_score_pct=25,
+            consecutive_failures=1,
+        )
+        llm_questions = [self._bank_question(3)] + [_question(i) for i in range(10, 20)]
+
+        with mock.patch.object(ai_generator, 'call_ai_provider',
+                               return_value={'questions': llm_questions}) as provider:
+            success, message = ai_generator.generate_simulator(self.session, self.student)
+
+        self.assertTrue(success, message)
+        user_prompt = provider.call_args.args[1]
+        self.assertNotIn('tema_3', user_prompt)
+        simulator = Simulator.objects.get(student=self.student)
+        # 2 del banco (tema_3) + 10 del LLM; la repetida se descarta
+        self.assertEqual(simulator.questions.count(), 12)
+        self.assertEqual(
+            list(simulator.questions.filter(order__lte=2).values_list('topic_tag', flat=True)),
+            ['tema_3', 'tema_3'],
+        )
+
+    def test_minhash_similarity_tolerates_small_edits(self):
+        base = question_bank.minhash('La derivada de una constante es siempre igual a cero en todo punto')
+        edited = question_bank.minhash('La derivada de una constante es siempre igual a cero en cualquier punto')
+        unrelated = question_bank.minhash('El teorema de Pitágoras relaciona los lados de un triángulo rectángulo')
+        self.assertGreater(question_bank.similarity(base, edited), 0.5)
+        self.assertLess(question_bank.similarity(base, unrelated), 0.2)
+
+    def test_pick_limits_per_topic_in_the_query(self):
+        BankedQuestion.objects.bulk_create(
+            BankedQuestion(
+                subject_key='calculo', topic_key=f'tema_{i % 2}', signature=[],
+                times_served=i, **{f: v for f, v in _question(i).items()},
+            )
+            for i in range(40)
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            picked = question_bank.pick_for_topics('Cálculo', ['tema_0', 'Tema_1'], self.student, 3)
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([e.times_served for e in picked['tema_0']], [0, 2, 4])
+        self.assertEqual([e.times_served for e in picked['Tema_1']], [1, 3, 5])
+
+    def test_duplicate_filter_only_compares_band_candidates(self):
+        entries = [
+            (i, question_bank.minhash(f'Enunciado distinto número {i} sobre el tema {i * 7} de física'))
+            for i in range(200)
+        ]
+        dedup = question_bank.DuplicateFilter(entries)
+        near = question_bank.minhash('Enunciado distinto número 42 sobre el tema 294 de física')
+
+        with mock.patch.object(question_bank, 'similarity', wraps=question_bank.similarity) as compare:
+            self.assertEqual(dedup.find(near), 42)
+        self.assertLess(compare.call_count, 20)
+
+
+class AIProviderTest(TestCase):
+
+    def setUp(self):
+        tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        self.session = ClassSession.objects.create(
+            tutor=tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        SessionMaterial.objects.create(
+            session=self.session, type='url', url='https://example.com/guia'
+        )
+
+    def test_stub_provider_runs_whole_pipeline_offline(self):
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming), self.settings(
+                SIMULATOR_AI_PROVIDER='stub', SIMULATOR_LLM_STREAMING=streaming,
+                SIMULATOR_LLM_CACHE_ENABLED=False,
+            ):
+                Simulator.objects.all().delete()
+                success, message = ai_generator.generate_simulator(self.session, self.student)
+                self.assertTrue(success, message)
+                self.assertEqual(Simulator.objects.get().questions.count(), 50)
+
+        calls = AIProviderCall.objects.all()
+        self.assertEqual(
+            sorted(calls.values_list('streamed', flat=True)), [False, True]
+        )
+        self.assertTrue(all(c.success and c.prompt_tokens and c.cost_usd == 0 for c in calls))
+
+    def test_streamed_call_records_usage_from_final_event(self):
+        class UsageLastProvider:
+            name, model, billable = 'openai', 'gpt-test', True
+
+            def stream(self, system_prompt, user_prompt, usage):
+                text = json.dumps({'questions': [_question(i) for i in range(20)]})
+                for i in range(0, len(text), 300):
+                    yield text[i:i + 300]
+                # Como stream_options.include_usage: después del último contenido
+                usage.update(prompt_tokens=1500, completion_tokens=2500)
+
+        with self.settings(SIMULATOR_LLM_STREAMING=True, SIMULATOR_LLM_CACHE_ENABLED=False), \
+                mock.patch.object(ai_providers, 'get_provider', return_value=UsageLastProvider()):
+            success, message = ai_generator.generate_simulator(self.session, self.student)
+
+        self.assertTrue(success, message)
+        call = AIProviderCall.objects.get()
+        self.assertEqual((call.prompt_tokens, call.completion_tokens), (1500, 2500))
+        self.assertGreater(call.cost_usd, 0)
+        self.assertEqual(AIProviderDailyUsage.objects.get().completion_tokens, 2500)
+
+    def test_stub_output_is_deterministic(self):
+        provider = ai_providers.get_provider('stub')
+        first = provider.complete('system', 'prompt', {})
+        self.assertEqual(first, provider.complete('system', 'prompt', {}))
+        self.assertNotEqual(first, provider.complete('system', 'otro prompt', {}))
+        self.assertIsNotNone(ai_generator.validate_questions(json.loads(first)))
+
+    def test_failed_call_is_recorded_with_cost_of_reported_tokens(self):
+        def fail(self, system_prompt, user_prompt, usage):
+            usage.update(prompt_tokens=1000, completion_tokens=0)
+            raise TimeoutError('read timeout')
+
+        with mock.patch.object(ai_providers.DeepSeekProvider, 'complete', fail):
+            self.assertIsNone(ai_providers.call_llm('system', 'prompt'))
+
+        call = AIProviderCall.objects.get()
+        self.assertFalse(call.success)
+        self.assertEqual(call.outcome, AIProviderCall.Outcome.TIMEOUT)
+        self.assertEqual(call.provider, 'deepseek')
+        self.assertIn('read timeout', call.error)
+        self.assertEqual(str(call.cost_usd), '0.000270')
+
+    def test_daily_usage_is_updated_per_call(self):
+        with self.settings(SIMULATOR_AI_PROVIDER='stub', SIMULATOR_LLM_STREAMING=False,
+                           SIMULATOR_LLM_CACHE_ENABLED=False):
+            ai_providers.call_llm('system', 'prompt')
+            with mock.patch.object(ai_providers.StubProvider, 'complete',
+                                   return_value='Lo siento, no puedo ayudar con eso.'):
+                ai_providers.call_llm('system', 'otro prompt')
+            with mock.patch.object(ai_providers.StubProvider, 'complete',
+                                   return_value='{"questions": []}'):
+                ai_generator.generate_simulator(self.session, self.student)
+
+        usage = AIProviderDailyUsage.objects.get()
+        self.assertEqual((usage.provider, usage.model_name), ('stub', 'stub-v1'))
+        self.assertEqual((usage.calls, usage.ok_calls, usage.validation_failed_calls), (3, 1, 2))
+        self.assertEqual(
+            usage.prompt_tokens, sum(AIProviderCall.objects.values_list('prompt_tokens', flat=True))
+        )
+        self.assertEqual(
+            usage.latency_ms_max, max(AIProviderCall.objects.values_list('latency_ms', flat=True))
+        )
+
+        rebuilt = {
+            field: getattr(usage, field)
+            for field in ('calls', 'ok_calls', 'validation_failed_calls', 'prompt_tokens',
+                          'completion_tokens', 'cost_usd', 'latency_ms_total')
+        }
+        self.assertEqual(ai_usage.rebuild_daily_usage(), 1)
+        usage = AIProviderDailyUsage.objects.get()
+        self.assertEqual(
+            {field: getattr(usage, field) for field in rebuilt}, rebuilt
+        )
+
+    def test_concurrent_calls_are_capped_per_process(self):
+        import threading
+
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work():
+            with ai_providers.provider_slot():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                threading.Event().wait(0.02)
+                with lock:
+                    active[0] -= 1
+
+        with mock.patch.object(ai_providers, '_slots', None), \
+                self.settings(SIMULATOR_AI_MAX_CONCURRENT_CALLS=2, SIMULATOR_AI_SLOT_TIMEOUT_SECONDS=0):
+            threads = [threading.Thread(target=work) for _ in range(6)]
+            with ai_providers.provider_slot(), ai_providers.provider_slot():
+                with self.assertRaises(ai_providers.ProviderBusy):
+                    with ai_providers.provider_slot():
+                        pass
+            with self.settings(SIMULATOR_AI_SLOT_TIMEOUT_SECONDS=5):
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+
+        self.assertEqual(peak[0], 2)
+
+
+class ItemAnalysisTest(TestCase):
+
+    def setUp(self):
+        tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        self.simulator = Simulator.objects.create(
+            session=session, tutor=tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', status='approved', max_attempts=100,
+        )
+        self.good, self.broken, self.easy = SimulatorQuestion.objects.bulk_create(
+            SimulatorQuestion(simulator=self.simulator, order=i + 1, **_question(i))
+            for i in range(3)
+        )
+        self.attempts = 0
+
+    def _attempt(self, answers, correct_count, seconds=30):
+        """answers: {question: option}; la clave de todas es 'B'."""
+        self.attempts += 1
+        attempt = SimulatorAttempt.objects.create(
+            simulator=self.simulator, student=self.student,
+            attempt_number=self.attempts, status='completed',
+            correct_count=correct_count,
+        )
+        SimulatorResponse.objects.bulk_create(
+            SimulatorResponse(attempt=attempt, question=q, selected_option=option,
+                              is_correct=option == 'B', time_spent_seconds=seconds)
+            for q, option in answers.items()
+        )
+
+    def _cohort(self, size):
+        # La mitad fuerte (40/50 en el simulacro) acierta la buena; la clave
+        # de "broken" parece estar mal
+        for i in range(size):
+            strong = i % 2 == 0
+            self._attempt({
+                self.good: 'B' if strong else 'A',
+                self.broken: 'C' if strong else ('B' if i % 3 == 0 else 'D'),
+                self.easy: 'B',
+            }, correct_count=40 if strong else 15, seconds=10 + i)
+
+    def test_stats_are_computed_and_flags_set(self):
+        entry = BankedQuestion.objects.create(
+            subject_key='calculo', topic_key='tema_1', **{
+                f: getattr(self.broken, f) for f in question_bank.QUESTION_FIELDS
+            })
+        SimulatorQuestion.objects.filter(pk=self.broken.pk).update(bank_question=entry)
+        self._cohort(24)
+
+        attempts, _ = item_analysis.refresh_question_stats(batch_size=10)
+        self.assertEqual(attempts, 24)
+
+        good = QuestionStats.objects.get(question=self.good)
+        self.assertEqual((good.responses, good.correct), (24, 12))
+        self.assertEqual(good.p_value, 0.5)
+        self.assertGreater(good.discrimination, 0.5)
+        self.assertEqual(good.flag, '')
+        self.assertEqual(good.distractor_rates()['A'], 0.5)
+        self.assertEqual(good.median_time_seconds, 22)
+        self.assertEqual(QuestionStats.objects.get(question=self.broken).flag, 'key_suspect')
+        self.assertEqual(QuestionStats.objects.get(question=self.easy).flag, 'too_easy')
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_active)
+
+    def test_refresh_is_incremental(self):
+        self._cohort(6)
+        item_analysis.refresh_question_stats()
+        self.assertEqual(item_analysis.refresh_question_stats(), (0, 0))
+
+        self._cohort(6)
+        with CaptureQueriesContext(connection) as ctx:
+            item_analysis.refresh_question_stats()
+        read = [q for q in ctx.captured_queries
+                if 'FROM "simulators_simulatorresponse"' in q['sql']]
+        self.assertEqual(len(read), 1)
+        stats = QuestionStats.objects.get(question=self.good)
+        self.assertEqual(stats.responses, 12)
+        # Menos de SIMULATOR_ITEM_MIN_RESPONSES: sin bandera
+        self.assertEqual(QuestionStats.objects.get(question=self.easy).flag, '')
+
+
+class ResponseCompactionTest(TestCase):
+    """Intentos viejos pasan a PackedResponses y se leen igual que las filas."""
+
+    def setUp(self):
+        tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        self.simulator = Simulator.objects.create(
+            session=session, tutor=tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', status='approved', max_attempts=10,
+        )
+        self.questions = SimulatorQuestion.objects.bulk_create(
+            SimulatorQuestion(simulator=self.simulator, order=i + 1, **_question(i))
+            for i in range(11)
+        )
+
+    def _attempt(self, number, finished_hours_ago):
+        attempt = SimulatorAttempt.objects.create(
+            simulator=self.simulator, student=self.student, attempt_number=number,
+            status='completed', correct_count=5,
+            finished_at=timezone.now() - timedelta(hours=finished_hours_ago),
+        )
+        SimulatorResponse.objects.bulk_create(
+            SimulatorResponse(
+                attempt=attempt, question=q,
+                selected_option=[None, 'A', 'B', 'C', 'D'][i % 5],
+                is_correct=i % 5 == 2, time_spent_seconds=i * 7,
+            )
+            for i, q in enumerate(self.questions)
+        )
+        return attempt
+
+    def test_pack_roundtrip(self):
+        rows = [(9, 'D', False, 70000), (3, None, False, 0), (5, 'B', True, 12)]
+        packed = PackedResponses.from_rows(1, rows)
+        self.assertEqual(len(packed.options), 3)
+        self.assertEqual(packed.rows(), [
+            (3, None, False, 0), (5, 'B', True, 12), (9, 'D', False, 0xFFFF),
+        ])
+
+    def test_old_attempts_are_compacted_and_read_transparently(self):
+        old = self._attempt(1, finished_hours_ago=100)
+        recent = self._attempt(2, finished_hours_ago=1)
+        before = sorted(response_store.response_rows([old.pk, recent.pk]))
+        results_before = [
+            (r.question_id, r.selected_option, r.is_correct)
+            for r in response_store.attempt_responses(old)
+        ]
+
+        self.assertEqual(response_store.compact_responses(batch_size=1), (1, 11))
+        self.assertFalse(old.responses.exists())
+        self.assertEqual(recent.responses.count(), 11)
+        self.assertEqual(response_store.compact_responses(), (0, 0))
+
+        self.assertEqual(sorted(response_store.response_rows([old.pk, recent.pk])), before)
+        self.assertEqual([
+            (r.question_id, r.selected_option, r.is_correct)
+            for r in response_store.attempt_responses(old)
+        ], results_before)
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse(
+            'simulators:results', args=[self.simulator.pk, old.pk]
+        ))
+        self.assertEqual(len(response.context['result_rows']), 11)
+
+    def test_item_analysis_reads_compacted_attempts(self):
+        self._attempt(1, finished_hours_ago=100)
+        response_store.compact_responses()
+
+        item_analysis.refresh_question_stats()
+        stats = QuestionStats.objects.get(question=self.questions[2])
+        self.assertEqual((stats.responses, stats.correct, stats.count_b), (1, 1, 1))
+
+
+class AdaptiveAttemptTest(TestCase):
+    """Intento adaptativo: una pregunta a la vez hasta que la habilidad converge."""
+
+    def setUp(self):
+        cache.clear()
+        tutor = UserFactory.create_tutor()
+        self.student = UserFactory.create_client()
+        session = ClassSession.objects.create(
+            tutor=tutor, client=self.student, subject='Cálculo',
+            scheduled_date=date.today() - timedelta(days=1),
+            scheduled_time=time(9, 0), status='completed',
+        )
+        self.simulator = Simulator.objects.create(
+            session=session, tutor=tutor, student=self.student,
+            title='Simulacro', subject='Cálculo', status='approved',
+            generation_status='done',
+        )
+        SimulatorQuestion.objects.bulk_create(
+            SimulatorQuestion(
+                simulator=self.simulator, order=i + 1,
+                **_question(i, topic_tag=f'tema_{i % 3}',
+                            difficulty=('low', 'medium', 'high')[i // 3 % 3])
+            )
+            for i in range(30)
+        )
+        self.client.force_login(self.student)
+
+    def _start(self):
+        self.client.post(reverse('simulators:start', args=[self.simulator.pk]),
+                         {'mode': 'adaptive'})
+        return SimulatorAttempt.objects.get(student=self.student)
+
+    def _next(self, attempt, body):
+        return self.client.post(
+            reverse('simulators:adaptive_next', args=[self.simulator.pk, attempt.pk]),
+            data=json.dumps(body), content_type='application/json',
+        )
+
+    def test_selection_follows_topic_information_and_ability(self):
+        StudentWeakTopicProfile.objects.create(
+            student=self.student, subject='Cálculo', topic_tag='tema_0',
+            total_questions_seen=10, total_correct=9, cumulative_score_pct=90,
+        )
+        state = adaptive.start_state(
+            question_payload.get_payload(self.simulator), self.student, 'Cálculo'
+        )
+        self.assertGreater(state['topics']['tema_0'][0], 2)  # sembrado desde el perfil
+        first = adaptive.next_question(state)
+        self.assertEqual(state['items'][str(first)][0], 'tema_0')
+        self.assertEqual(state['items'][str(first)][1], 1.0)  # la más difícil
+
+        state['served'].append(first)
+        adaptive.record_result(state, first, is_correct=True)
+        second = adaptive.next_question(state)
+        self.assertNotEqual(state['items'][str(second)][0], 'tema_0')
+
+    def test_attempt_stops_early_and_grades_only_served_questions(self):
+        attempt = self._start()
+        self.assertTrue(attempt.is_adaptive)
+        data = self._next(attempt, {'question': None}).json()
+        # Pedir de nuevo no sirve otra pregunta
+        self.assertEqual(self._next(attempt, {'question': None}).json()['question']['id'],
+                         data['question']['id'])
+
+        served = 0
+        while not data['done']:
+            served += 1
+            data = self._next(attempt, {
+                'question': data['question']['id'], 'selected': 'B', 'elapsed': 5,
+            }).json()
+        self.assertEqual(data['results_url'], reverse(
+            'simulators:results', args=[self.simulator.pk, attempt.pk]
+        ))
+        self.assertLessEqual(served, 20)
+        self.assertGreaterEqual(served, 8)
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, 'completed')
+        self.assertEqual(attempt.responses.count(), served)
+        self.assertEqual((attempt.correct_count, attempt.unanswered_count), (served, 0))
+        self.assertEqual(float(attempt.score), 100.0)
+        self.assertEqual(self._next(attempt, {'question': None}).status_code, 409)
+
+    def test_only_the_current_question_is_accepted(self):
+        attempt = self._start()
+        current = self._next(attempt, {'question': None}).json()['question']['id']
+        other = SimulatorQuestion.objects.exclude(pk=current).first().pk
+        self.assertEqual(self._next(attempt, {'question': other, 'selected': 'B'}).status_code, 400)
+
+        fixed = self.client.post(
+            reverse('simulators:answer', args=[self.simulator.pk, attempt.pk]),
+            data=json.dumps({'question': current, 'selected': 'B'}),
+            content_type='application/json',
+        )
+        self.assertEqual(fixed.status_code, 400)
+
+    def test_finish_early_grades_served_questions(self):
+        attempt = self._start()
+        data = self._next(attempt, {'question': None}).json()
+        self._next(attempt, {'question': data['question']['id'], 'selected': 'A'})
+        self.client.post(reverse('simulators:submit', args=[self.simulator.pk, attempt.pk]))
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, 'completed')
+        # La respondida (incorrecta) y la servida sin responder
+        self.assertEqual(
+            (attempt.correct_count, attempt.incorrect_count, attempt.unanswered_count),
+            (0, 1, 1),
+        )
+
+
+class ReinforcementBatchTest(TestCase):
+    """Refuerzos con la misma materia y temas débiles: una sola llamada al LLM."""
+
+    def setUp(self):
+        self.tutor = UserFactory.create_tutor()
+        self.students = [UserFactory.create_client() for _ in range(3)]
+        weak_topics = [('tema_0', 'Tema_1'), ('tema_1', 'tema_0'), ('tema_2',)]
+        self.attempts = []
+        for student, topics in zip(self.students, weak_topics):
+            session = ClassSession.objects.create(
+                tutor=self.tutor, client=student, subject='Cálculo',
+                scheduled_date=date.today() - timedelta(days=1),
+                scheduled_time=time(9, 0), status='completed',
+            )
+            simulator = Simulator.objects.create(
+                session=session, tutor=self.tutor, student=student,
+                title='Simulacro', subject='Cálculo', status='approved',
+                generation_status='done',
+            )
+            self.attempts.append(SimulatorAttempt.objects.create(
+                simulator=simulator, student=student, attempt_number=1,
+                status='completed', performance_by_topic={t: {'pct': 25.0} for t in topics},
+            ))
+            for topic in topics:
+                StudentWeakTopicProfile.objects.create(
+                    student=student, subject='Cálculo', topic_tag=topic,
+                    total_questions_seen=4, total_correct=1, cumulative_score_pct=25,
+                    consecutive_failures=1,
+                )
+
+    def _enqueue_all(self):
+        return [
+            services.enqueue_generation(
+                SimulatorGenerationJob.Kind.REINFORCEMENT, attempt.simulator.session,
+                attempt.student, attempt.student, attempt=attempt,
+            )[1]
+            for attempt in self.attempts
+        ]
+
+    def test_batch_key_groups_same_subject_and_topics(self):
+        first, second, third = self._enqueue_all()
+        self.assertTrue(first.batch_key)
+        self.assertEqual(first.batch_key, second.batch_key)
+        self.assertNotEqual(first.batch_key, third.batch_key)
+
+    def test_reinforcement_waits_for_batch_window(self):
+        self._enqueue_all()
+        self.assertIsNone(services.claim_next_job('worker-a'))
+        SimulatorGenerationJob.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertIsNotNone(services.claim_next_job('worker-a'))
+
+    def test_group_shares_one_llm_call(self):
+        self._enqueue_all()
+        SimulatorGenerationJob.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        with mock.patch.object(ai_generator, 'call_ai_provider',
+                               return_value={'questions': [_question(i) for i in range(6)]}) as provider:
+            services.run_generation_job(services.claim_next_job('worker-a'))
+
+        provider.assert_called_once()
+        grouped = SimulatorGenerationJob.objects.filter(student__in=self.students[:2])
+        self.assertEqual(set(grouped.values_list('status', flat=True)), {'done'})
+        for job in grouped:
+            self.assertEqual(job.simulator.student, job.student)
+            self.assertEqual(job.simulator.simulator_type, 'reinforcement')
+            self.assertEqual(job.simulator.questions.count(), 6)
+        self.assertEqual(
+            SimulatorGenerationJob.objects.get(student=self.students[2]).status, 'queued'
+        )
+        self.assertEqual(Notification.objects.filter(message__contains='listo').count(), 2)
+
+    def test_batch_prompt_is_student_neutral(self):
+        Simulator.objects.filter(pk=self.attempts[0].simulator.pk).update(
+            source_material_text='Apuntes privados de tema_0 del primer estudiante'
+        )
+        with mock.patch.object(ai_generator, 'call_ai_provider',
+                               return_value={'questions': [_question(i) for i in range(6)]}) as provider:
+            results = ai_generator.generate_reinforcement_batch(
+                [(attempt, attempt.student) for attempt in self.attempts[:2]]
+            )
+
+        prompt = provider.call_args.args[1]
+        self.assertIn('tema_0', prompt)
+        self.assertIn('tema_1', prompt.lower())
+        self.assertNotIn('%', prompt)
+        self.assertNotIn('Apuntes privados', prompt)
+        first, second = (simulator for _, _, simulator in results)
+        self.assertEqual(first.generation_prompt, prompt)
+        self.assertCountEqual(first.weak_topics_context, ['tema_0', 'Tema_1'])
+        self.assertCountEqual(second.weak_topics_context, ['tema_1', 'tema_0'])
+
+    def test_cooldown_blocks_second_reinforcement(self):
+        attempt = self.attempts[0]
+        Simulator.objects.create(
+            session=attempt.simulator.session, tutor=self.tutor, student=attempt.student,
+            title='Refuerzo', subject='Cálculo', simulator_type='reinforcement',
+            generation_status='done', status='pending_approval',
+        )
+        with mock.patch.object(ai_generator, 'call_ai_provider',
+                               return_value={'questions': [_question(i) for i in range(6)]}) as provider:
+            results = ai_generator.generate_reinforcement_batch(
+                [(attempt, attempt.student), (self.attempts[1], self.attempts[1].student)]
+            )
 
-# Create your tests here.
+        provider.assert_called_once()
+        self.assertEqual((results[0][0], results[0][2]), (False, None))
+        self.assertTrue(results[1][0])
+        self.assertEqual(results[1][2].student, self.attempts[1].student)
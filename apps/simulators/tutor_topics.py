@@ -0,0 +1,162 @@
+"""
+Temas débiles por tutor (TutorTopicAggregate), materializados.
+
+- update_tutor_topic_aggregates() → suma un intento cerrado a los agregados
+                                    del tutor del simulador
+- rebuild_tutor_topic_aggregates() → recalcula todo desde los intentos y
+                                     perfiles (carga inicial o reparación)
+- topics_for_tutor()              → lo que muestra el historial del tutor
+
+Cada agregado guarda el último puntaje acumulado de cada estudiante
+(TutorTopicStudent), así que un intento nuevo lo actualiza por diferencia:
+se resta el puntaje anterior del estudiante y se suma el nuevo. Ninguna
+vista recorre StudentWeakTopicProfile.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    SimulatorAttempt, StudentWeakTopicProfile, TutorTopicAggregate, TutorTopicStudent,
+)
+
+WEAK_SCORE_PCT = Decimal('60')    # igual que StudentWeakTopicProfile.is_weak
+TREND_WEIGHT = Decimal('0.3')     # peso del último cambio en el promedio móvil
+CENTS = Decimal('0.01')
+
+
+def _pct(value):
+    return Decimal(str(value)).quantize(CENTS)
+
+
+def apply_score(aggregate, previous, score):
+    """
+    Reemplaza el puntaje anterior del estudiante (None si es nuevo en el
+    agregado) por el nuevo, sin guardar.
+    """
+    if previous is None:
+        aggregate.student_count += 1
+    else:
+        aggregate.score_sum -= previous
+        aggregate.weak_count -= previous < WEAK_SCORE_PCT
+        aggregate.trend += TREND_WEIGHT * (score - previous - aggregate.trend)
+        aggregate.trend = aggregate.trend.quantize(CENTS)
+    aggregate.score_sum += score
+    aggregate.weak_count += score < WEAK_SCORE_PCT
+    aggregate.mean_score_pct = (aggregate.score_sum / aggregate.student_count).quantize(CENTS)
+
+
+def update_tutor_topic_aggregates(attempt, profiles):
+    """
+    Actualiza los agregados del tutor con los perfiles que dejó el intento.
+    Número fijo de sentencias: crea los que falten, los bloquea, lee el
+    puntaje anterior del estudiante en cada uno y guarda en bloque.
+    Debe llamarse dentro de la transacción de update_weak_topic_profile().
+
+    Returns:
+        list[TutorTopicAggregate]: agregados actualizados
+    """
+    if not profiles:
+        return []
+    tutor_id = attempt.simulator.tutor_id
+    subject = attempt.simulator.subject
+    scores = {profile.topic_tag: _pct(profile.cumulative_score_pct) for profile in profiles}
+
+    TutorTopicAggregate.objects.bulk_create(
+        [
+            TutorTopicAggregate(tutor_id=tutor_id, subject=subject, topic_tag=topic)
+            for topic in scores
+        ],
+        ignore_conflicts=True,
+    )
+    aggregates = list(
+        TutorTopicAggregate.objects.select_for_update().filter(
+            tutor_id=tutor_id, subject=subject, topic_tag__in=list(scores)
+        ).order_by('topic_tag')
+    )
+    previous = dict(
+        TutorTopicStudent.objects.filter(
+            aggregate__in=aggregates, student_id=attempt.student_id
+        ).values_list('aggregate_id', 'score_pct')
+    )
+    now = timezone.now()
+    for aggregate in aggregates:
+        apply_score(aggregate, previous.get(aggregate.pk), scores[aggregate.topic_tag])
+        aggregate.updated_at = now
+
+    TutorTopicStudent.objects.bulk_create(
+        [
+            TutorTopicStudent(
+                aggregate=aggregate, student_id=attempt.student_id,
+                score_pct=scores[aggregate.topic_tag],
+            )
+            for aggregate in aggregates
+        ],
+        update_conflicts=True,
+        unique_fields=['aggregate', 'student'],
+        update_fields=['score_pct'],
+    )
+    TutorTopicAggregate.objects.bulk_update(
+        aggregates, TutorTopicAggregate.ACCUMULATED_FIELDS
+    )
+    return aggregates
+
+
+def rebuild_tutor_topic_aggregates():
+    """
+    Recalcula todos los agregados: un estudiante entra en el agregado
+    (tutor, materia, tema) si completó un simulador del tutor con ese tema,
+    con su puntaje acumulado actual. La tendencia vuelve a cero.
+
+    Returns:
+        int: agregados creados
+    """
+    members = defaultdict(set)  # (tutor, materia, tema) → estudiantes
+    attempts = SimulatorAttempt.objects.filter(
+        status=SimulatorAttempt.AttemptStatus.COMPLETED
+    ).values_list(
+        'simulator__tutor_id', 'student_id', 'simulator__subject', 'performance_by_topic'
+    ).order_by()
+    for tutor_id, student_id, subject, performance in attempts.iterator():
+        for topic in performance or {}:
+            members[(tutor_id, subject, topic)].add(student_id)
+
+    scores = {
+        (student_id, subject, topic): _pct(score)
+        for student_id, subject, topic, score in StudentWeakTopicProfile.objects.filter(
+            student_id__in={s for students in members.values() for s in students}
+        ).values_list('student_id', 'subject', 'topic_tag', 'cumulative_score_pct').iterator()
+    }
+
+    aggregates, rows = [], []
+    for (tutor_id, subject, topic), students in members.items():
+        aggregate = TutorTopicAggregate(tutor_id=tutor_id, subject=subject, topic_tag=topic)
+        for student_id in students:
+            score = scores.get((student_id, subject, topic))
+            if score is not None:
+                apply_score(aggregate, None, score)
+                rows.append((aggregate, student_id, score))
+        if aggregate.student_count:
+            aggregates.append(aggregate)
+
+    with transaction.atomic():
+        TutorTopicAggregate.objects.all().delete()
+        TutorTopicAggregate.objects.bulk_create(aggregates, batch_size=1000)
+        TutorTopicStudent.objects.bulk_create(
+            [
+                TutorTopicStudent(aggregate=aggregate, student_id=student_id, score_pct=score)
+                for aggregate, student_id, score in rows
+            ],
+            batch_size=1000,
+        )
+    return len(aggregates)
+
+
+def topics_for_tutor(tutor, limit=10):
+    """Temas con más estudiantes débiles primero (usa tutor_topic_weak_idx)."""
+    return list(
+        TutorTopicAggregate.objects.filter(tutor=tutor, weak_count__gt=0)
+        .order_by('-weak_count', 'mean_score_pct')[:limit]
+    )
@@ -24,6 +24,16 @@ urlpatterns = [
         views.SimulatorAttemptView.as_view(),
         name='attempt'
     ),
+    path(
+        '<int:pk>/attempt/<int:attempt_pk>/answer/',
+        views.SimulatorAnswerView.as_view(),
+        name='answer'
+    ),
+    path(
+        '<int:pk>/attempt/<int:attempt_pk>/next/',
+        views.SimulatorAdaptiveNextView.as_view(),
+        name='adaptive_next'
+    ),
     path(
         '<int:pk>/attempt/<int:attempt_pk>/submit/',
         views.SimulatorSubmitView.as_view(),
@@ -44,4 +54,9 @@ urlpatterns = [
         views.ReinforcementGenerateView.as_view(),
         name='reinforce'
     ),
+    path(
+        'jobs/<int:pk>/status/',
+        views.GenerationJobStatusView.as_view(),
+        name='job_status'
+    ),
 ]
@@ -1,52 +1,46 @@
+import json
+
 from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from apps.accounts.mixins.roles import ClientRequiredMixin, TutorRequiredMixin
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.views import View
 from django.views.generic import TemplateView
-from django.utils import timezone
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from apps.simulators.models import (
     Simulator, SimulatorQuestion, SimulatorAttempt,
-    SimulatorResponse, StudentWeakTopicProfile
+    SimulatorGenerationJob
 )
 from apps.accounts.models import User
 from apps.academicTutoring.models import ClassSession
 
-from .forms import SimulatorAttemptForm
-from .ai_generator import generate_simulator, generate_reinforcement_simulator
-
+from subjectSupport.query_budget import query_budget
 
-def update_weak_topic_profile(attempt):
-    for topic, stats in attempt.performance_by_topic.items():
-        profile, _ = StudentWeakTopicProfile.objects.get_or_create(
-            student=attempt.student,
-            subject=attempt.simulator.subject,
-            topic_tag=topic,
-        )
-        profile.update_from_attempt(
-            correct=stats['correct'],
-            questions_in_topic=stats['total']
-        )
+from .adaptive import max_questions as adaptive_max_questions, start_state as adaptive_start_state
+from .question_payload import get_payload, parse_answers
+from .response_store import attempt_responses
+from .services import (
+    answer_adaptive, enqueue_generation, job_status_payload, record_answer,
+    served_answer_key, submit_attempt,
+)
 
 
+@query_budget(queries=12)
 class SimulatorListView(ClientRequiredMixin, TemplateView):
     template_name = 'simulators/list.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        simulators = Simulator.objects.filter(
-            student=self.request.user,
-            status__in=['published', 'pending_approval', 'approved']
-        ).select_related('session', 'tutor').order_by('-created_at')
-
-        for sim in simulators:
-            sim.attempt_count = sim.attempts.filter(
-                student=self.request.user).count()
-            sim.can_attempt = sim.student_can_attempt
-            sim.last_attempt = sim.attempts.filter(
-                student=self.request.user).order_by('-started_at').first()
+        # Intentos, último puntaje y si puede intentar vienen anotados:
+        # se pagina primero y no hay consultas por simulador.
+        simulators = Simulator.objects.get_student_simulators(
+            self.request.user,
+            statuses=['published', 'pending_approval', 'approved'],
+        )
 
         paginator = Paginator(simulators, 9)
         page_number = self.request.GET.get('page', 1)
@@ -124,11 +118,16 @@ class SimulatorStartView(ClientRequiredMixin, View):
                 'Has alcanzado el máximo de intentos para este simulacro.')
             return redirect('simulators:detail', pk=self.simulator.pk)
 
+        adaptive = request.POST.get('mode') == 'adaptive'
         attempt = SimulatorAttempt.objects.create(
             simulator=self.simulator,
             student=request.user,
             attempt_number=attempt_count + 1,
-            status='in_progress'
+            status='in_progress',
+            is_adaptive=adaptive,
+            adaptive_state=adaptive_start_state(
+                get_payload(self.simulator), request.user, self.simulator.subject
+            ) if adaptive else {},
         )
         return redirect('simulators:attempt',
             pk=self.simulator.pk, attempt_pk=attempt.pk)
@@ -156,18 +155,32 @@ class SimulatorAttemptView(ClientRequiredMixin, TemplateView):
             return redirect('simulators:results',
                 pk=self.kwargs['pk'],
                 attempt_pk=self.kwargs['attempt_pk'])
+        if self.attempt.is_adaptive:
+            self.template_name = 'simulators/adaptive_attempt.html'
         return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        questions = self.simulator.questions.filter(
-            is_active=True).order_by('order')
-        form = SimulatorAttemptForm(questions=questions)
+        if self.attempt.is_adaptive:
+            # Las preguntas llegan una a una desde SimulatorAdaptiveNextView
+            context['simulator'] = self.simulator
+            context['attempt'] = self.attempt
+            context['max_questions'] = adaptive_max_questions(self.attempt.adaptive_state)
+            return context
+        questions = get_payload(self.simulator).for_display()
+        # Respuestas ya autoguardadas (p. ej. tras recargar la página)
+        saved = {
+            question_id: (selected, seconds)
+            for question_id, selected, seconds in self.attempt.responses.values_list(
+                'question_id', 'selected_option', 'time_spent_seconds')
+        }
+        for question in questions:
+            question['saved_answer'], question['saved_seconds'] = saved.get(
+                question['id'], (None, 0))
         context['simulator'] = self.simulator
         context['attempt'] = self.attempt
         context['questions'] = questions
-        context['form'] = form
-        context['total_questions'] = questions.count()
+        context['total_questions'] = len(questions)
         context['time_limit'] = self.simulator.time_limit_per_question
         return context
 
@@ -194,39 +207,13 @@ class SimulatorSubmitView(ClientRequiredMixin, View):
             return redirect('simulators:results',
                 pk=self.simulator.pk, attempt_pk=self.attempt.pk)
 
-        questions = self.simulator.questions.filter(
-            is_active=True).order_by('order')
-        form = SimulatorAttemptForm(questions=questions, data=request.POST)
-
-        if not form.is_valid():
-            messages.error(request, 'Error al procesar respuestas.')
-            return redirect('simulators:attempt',
-                pk=self.simulator.pk, attempt_pk=self.attempt.pk)
-
-        answers = form.get_answers()
-        now = timezone.now()
-        total_seconds = int((now - self.attempt.started_at).total_seconds())
-
-        for question in questions:
-            selected = answers.get(question.id)
-            SimulatorResponse.objects.update_or_create(
-                attempt=self.attempt,
-                question=question,
-                defaults={
-                    'selected_option': selected,
-                    'time_spent_seconds': 0,
-                }
-            )
-
-        self.attempt.total_time_seconds = total_seconds
-        self.attempt.status = 'completed'
-        self.attempt.finished_at = now
-        self.attempt.save(update_fields=[
-            'total_time_seconds', 'status', 'finished_at'
-        ])
-
-        self.attempt.calculate_score()
-        update_weak_topic_profile(self.attempt)
+        if self.attempt.is_adaptive:
+            # Terminar antes: se califican solo las preguntas servidas
+            submit_attempt(self.attempt, served_answer_key(self.attempt), {})
+        else:
+            payload = get_payload(self.simulator)
+            submit_attempt(self.attempt, payload.answer_key(),
+                           parse_answers(payload, request.POST))
 
         messages.success(request,
             f'Simulacro completado. Puntaje: {self.attempt.score:.1f}%')
@@ -238,6 +225,92 @@ class SimulatorSubmitView(ClientRequiredMixin, View):
             pk=self.kwargs['pk'], attempt_pk=self.kwargs['attempt_pk'])
 
 
+class SimulatorAnswerView(ClientRequiredMixin, View):
+    """
+    Autoguardado (JSON) de una respuesta y su tiempo durante el intento.
+    Cuerpo: {"question": id, "selected": "A"-"D" | null, "elapsed": segundos}
+    """
+
+    def post(self, request, pk, attempt_pk):
+        attempt = get_object_or_404(
+            SimulatorAttempt.objects.select_related('simulator').only(
+                'pk', 'status', 'is_adaptive', 'simulator__questions_version',
+                'simulator__generation_status',
+            ),
+            pk=attempt_pk,
+            simulator_id=pk,
+            simulator__status__in=['published', 'pending_approval', 'approved'],
+            student=request.user,
+        )
+        try:
+            data = json.loads(request.body)
+            question_id = int(data['question'])
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'ok': False, 'error': 'Solicitud inválida.'}, status=400)
+        if attempt.is_adaptive:
+            return JsonResponse(
+                {'ok': False, 'error': 'Este intento es adaptativo.'}, status=400
+            )
+
+        success, response, error = record_answer(
+            attempt, question_id, data.get('selected'), data.get('elapsed')
+        )
+        if not success:
+            status = 409 if attempt.status != 'in_progress' else 400
+            return JsonResponse({'ok': False, 'error': error}, status=status)
+        return JsonResponse({
+            'ok': True,
+            'question': question_id,
+            'selected': response.selected_option,
+        })
+
+
+class SimulatorAdaptiveNextView(ClientRequiredMixin, View):
+    """
+    Intento adaptativo (JSON): responde la pregunta actual y devuelve la
+    siguiente, o done=true con la URL de resultados al converger.
+    Cuerpo: {"question": id | null, "selected": "A"-"D" | null, "elapsed": segundos}
+    (question null: solo pide la pregunta actual, p. ej. al cargar la página)
+    """
+
+    def post(self, request, pk, attempt_pk):
+        attempt = get_object_or_404(
+            SimulatorAttempt,
+            pk=attempt_pk,
+            simulator_id=pk,
+            simulator__status__in=['published', 'pending_approval', 'approved'],
+            student=request.user,
+        )
+        try:
+            data = json.loads(request.body or b'{}')
+            question_id = data.get('question')
+            question_id = int(question_id) if question_id is not None else None
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({'ok': False, 'error': 'Solicitud inválida.'}, status=400)
+
+        success, result, error = answer_adaptive(
+            attempt, question_id, data.get('selected'), data.get('elapsed')
+        )
+        if not success:
+            status = 409 if attempt.status != 'in_progress' else 400
+            return JsonResponse({'ok': False, 'error': error}, status=status)
+
+        body = {
+            'ok': True,
+            'done': result['done'],
+            'answered': result['answered'],
+            'standard_error': result['standard_error'],
+        }
+        if result['done']:
+            body['results_url'] = reverse(
+                'simulators:results', kwargs={'pk': pk, 'attempt_pk': attempt_pk}
+            )
+        else:
+            questions = {q['id']: q for q in get_payload(attempt.simulator).for_display()}
+            body['question'] = questions[result['question']]
+        return JsonResponse(body)
+
+
 class SimulatorResultsView(ClientRequiredMixin, TemplateView):
     template_name = 'simulators/results.html'
 
@@ -260,8 +333,8 @@ class SimulatorResultsView(ClientRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        responses = self.attempt.responses.select_related(
-            'question').order_by('question__order')
+        # Filas o forma compacta (ver response_store.py)
+        responses = attempt_responses(self.attempt)
 
         result_rows = []
         for resp in responses:
@@ -313,19 +386,18 @@ class SimulatorGenerateView(TutorRequiredMixin, View):
             session.tutor_ai_context = tutor_context
             session.save(update_fields=['tutor_ai_context'])
 
-        success, message = generate_simulator(session, student=session.client)
+        # La generación corre en el worker (run_generation_worker); aquí solo se encola
+        success, job, error = enqueue_generation(
+            SimulatorGenerationJob.Kind.DIAGNOSTIC,
+            session, session.client, request.user
+        )
         if success:
-            from apps.simulators.models import Simulator as Sim
-            Sim.objects.filter(
-                session=session,
-                student=session.client,
-                status='rejected'
-            ).update(generation_status='failed')
-            messages.success(request, message)
-            return redirect('tutor_session_history')
+            messages.info(request,
+                'Generando el simulacro con IA. Puedes seguir trabajando: '
+                'te avisaremos cuando esté listo para tu revisión.')
         else:
-            messages.error(request, message)
-            return redirect('tutor_session_history')
+            messages.warning(request, error)
+        return redirect('tutor_session_history')
 
     def get(self, request, session_pk):
         return redirect('tutor_session_history')
@@ -348,17 +420,39 @@ class ReinforcementGenerateView(ClientRequiredMixin, View):
             student=request.user,
             status='completed'
         )
-        success, message = generate_reinforcement_simulator(
-            attempt, request.user
+        success, job, error = enqueue_generation(
+            SimulatorGenerationJob.Kind.REINFORCEMENT,
+            simulator.session, request.user, request.user,
+            attempt=attempt
         )
         if success:
-            messages.success(request, message)
+            messages.info(request,
+                'Estamos generando tu simulacro de refuerzo. '
+                'Te avisaremos cuando esté listo.')
             return redirect('simulators:list')
         else:
-            messages.error(request, message)
+            messages.warning(request, error)
             return redirect('simulators:results',
                 pk=pk, attempt_pk=attempt_pk)
 
     def get(self, request, pk, attempt_pk):
         return redirect('simulators:results',
-            pk=pk, attempt_pk=attempt_pk)
\ No newline at end of file
+            pk=pk, attempt_pk=attempt_pk)
+
+
+class GenerationJobStatusView(LoginRequiredMixin, View):
+    """
+    Estado de un trabajo de generación (JSON) para el polling del navegador.
+    Visible para quien lo solicitó, el tutor de la sesión y el estudiante.
+    """
+
+    def get(self, request, pk):
+        job = get_object_or_404(
+            SimulatorGenerationJob.objects.select_related('session', 'simulator'),
+            pk=pk
+        )
+        if request.user.pk not in (
+            job.requested_by_id, job.student_id, job.session.tutor_id
+        ):
+            raise PermissionDenied
+        return JsonResponse(job_status_payload(job))
@@ -39,5 +39,17 @@ echo "=== Collecting Static Files ==="
 python manage.py collectstatic --noinput --clear
 
 # Start the application
+# SERVER_MODE=worker procesa la cola de generación de simuladores (servicio aparte)
+if [ "$SERVER_MODE" = "worker" ]; then
+    echo "=== Starting simulator generation worker ==="
+    exec python manage.py run_generation_worker
+fi
+
+# SERVER_MODE=asgi habilita el stream SSE de notificaciones (conexiones largas)
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "=== Starting Uvicorn (ASGI) ==="
+    exec uvicorn subjectSupport.asgi:application --host 0.0.0.0 --port 8080 --workers 4 --proxy-headers
+fi
+
 echo "=== Starting Gunicorn ==="
 exec gunicorn subjectSupport.wsgi:application --bind 0.0.0.0:8080 --workers 4 --timeout 120
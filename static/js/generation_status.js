@@ -0,0 +1,39 @@
+/*
+ * Progreso de la generación de simulacros en el historial del tutor.
+ * Consulta periódicamente el estado de cada [data-generation-job] y recarga
+ * la página cuando el trabajo termina para mostrar el simulacro.
+ */
+(function () {
+  var badges = document.querySelectorAll('[data-generation-job]');
+  if (!badges.length || !window.fetch) {
+    return;
+  }
+
+  var POLL_MS = 3000;
+
+  function poll(badge) {
+    fetch(badge.dataset.generationJob, { credentials: 'same-origin' })
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.json();
+      })
+      .then(function (job) {
+        var progress = badge.querySelector('[data-generation-progress]');
+        if (progress) {
+          progress.textContent = job.progress + '% · ' + job.message;
+        }
+        if (job.finished) {
+          window.location.reload();
+          return;
+        }
+        setTimeout(function () { poll(badge); }, POLL_MS);
+      })
+      .catch(function () {
+        setTimeout(function () { poll(badge); }, POLL_MS * 5);
+      });
+  }
+
+  badges.forEach(poll);
+})();
@@ -0,0 +1,54 @@
+/*
+ * Notificaciones en vivo para los dashboards.
+ * Abre un EventSource contra /accounts/notifications/stream/ y agrega cada
+ * notificación nueva al contenedor [data-notification-stream].
+ */
+(function () {
+  var container = document.querySelector('[data-notification-stream]');
+  if (!container || !window.EventSource) {
+    return;
+  }
+
+  var streamUrl = container.dataset.streamUrl;
+  var readUrlTemplate = container.dataset.readUrl;  // termina en /0/
+  var csrfToken = container.dataset.csrf;
+
+  function render(notif) {
+    if (container.querySelector('[data-notification-id="' + notif.id + '"]')) {
+      return;
+    }
+    var alert = document.createElement('div');
+    alert.className = 'alert alert-warning alert-dismissible fade show d-flex justify-content-between align-items-center';
+    alert.setAttribute('role', 'alert');
+    alert.dataset.notificationId = notif.id;
+    alert.appendChild(document.createTextNode('🔔 ' + notif.message));
+
+    var form = document.createElement('form');
+    form.method = 'post';
+    form.action = readUrlTemplate.replace(/0\/$/, notif.id + '/');
+    form.className = 'd-inline ms-3';
+    var csrf = document.createElement('input');
+    csrf.type = 'hidden';
+    csrf.name = 'csrfmiddlewaretoken';
+    csrf.value = csrfToken;
+    var close = document.createElement('button');
+    close.type = 'submit';
+    close.className = 'btn-close';
+    close.setAttribute('aria-label', 'Cerrar');
+    form.appendChild(csrf);
+    form.appendChild(close);
+    alert.appendChild(form);
+
+    container.insertBefore(alert, container.firstChild);
+  }
+
+  var lastId = container.dataset.lastId || '';
+  var source = new EventSource(streamUrl + (lastId ? '?last_id=' + lastId : ''));
+  source.addEventListener('notification', function (e) {
+    render(JSON.parse(e.data));
+  });
+  source.addEventListener('resync', function () {
+    source.close();
+    window.location.reload();
+  });
+})();
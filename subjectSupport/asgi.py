@@ -3,6 +3,11 @@ ASGI config for subjectSupport project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Sirve el mismo proyecto que wsgi.py, pero permite mantener abiertas las
+conexiones de larga duración (stream SSE de notificaciones en
+/accounts/notifications/stream/). Las vistas síncronas siguen funcionando
+igual; Django las ejecuta en un thread pool.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
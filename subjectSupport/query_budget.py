@@ -0,0 +1,128 @@
+"""
+Presupuesto de consultas SQL por vista.
+
+- query_budget()          → decorador que declara el presupuesto de una vista
+- get_view_budget()       → presupuesto registrado para una vista (o None)
+- QueryBudgetMiddleware   → mide consultas y tiempo de BD de cada request
+
+El middleware envuelve todas las conexiones con `execute_wrapper`, así que
+cuenta también las consultas hechas en la plantilla. El resultado se
+registra en el log y, si QUERY_BUDGET_SERVER_TIMING está activo, se expone
+en la cabecera `Server-Timing` (visible en la pestaña Network del navegador).
+
+Los tests verifican los presupuestos con
+`apps.accounts.test_utils.QueryBudgetTestMixin` sobre datos sembrados.
+"""
+import logging
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    queries: int
+    db_ms: float | None = None
+
+
+# 'modulo.NombreVista' → QueryBudget
+_registry = {}
+
+
+def _view_key(view):
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def query_budget(queries, db_ms=None):
+    """
+    Declara el máximo de consultas (y opcionalmente de ms de BD) de una vista.
+
+    Sirve tanto para vistas basadas en clase como para funciones:
+
+        @query_budget(queries=12)
+        class TutorDashboardView(...):
+    """
+    budget = QueryBudget(queries=queries, db_ms=db_ms)
+
+    def decorator(view):
+        _registry[_view_key(view)] = budget
+        return view
+    return decorator
+
+
+def get_view_budget(view_func):
+    """Presupuesto de la vista resuelta por el URLconf, o None."""
+    view = getattr(view_func, 'view_class', view_func)
+    return _registry.get(_view_key(view))
+
+
+class QueryStats:
+    """Acumula número de consultas y tiempo de BD de un request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    @property
+    def db_ms(self):
+        return self.duration * 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """
+    Cuenta las consultas de cada request y avisa cuando una vista con
+    presupuesto declarado lo supera.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', True):
+            return self.get_response(request)
+
+        stats = QueryStats()
+        request.query_budget = None
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        self._report(request, stats)
+        if getattr(settings, 'QUERY_BUDGET_SERVER_TIMING', False):
+            response['Server-Timing'] = (
+                f'db;dur={stats.db_ms:.1f};desc="{stats.count} queries"'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func)
+
+    def _report(self, request, stats):
+        budget = request.query_budget
+        over = budget is not None and (
+            stats.count > budget.queries
+            or (budget.db_ms is not None and stats.db_ms > budget.db_ms)
+        )
+        if over:
+            logger.warning(
+                'Query budget exceeded on %s: %d queries / %.1f ms (budget %d / %s ms)',
+                request.path, stats.count, stats.db_ms,
+                budget.queries, budget.db_ms if budget.db_ms is not None else '-',
+            )
+        else:
+            logger.debug('%s: %d queries / %.1f ms', request.path,
+                         stats.count, stats.db_ms)
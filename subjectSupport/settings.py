@@ -179,6 +179,9 @@ INSTALLED_APPS += [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Debe ir justo después de SecurityMiddleware
+    # Conteo de consultas / tiempo de BD por request, incluye sesión y auth
+    # (ver subjectSupport/query_budget.py)
+    'subjectSupport.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -207,6 +210,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'subjectSupport.wsgi.application'
+ASGI_APPLICATION = 'subjectSupport.asgi.application'
 
 
 
@@ -390,6 +394,87 @@ SESSION_COOKIE_AGE = 3600
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_SAVE_EVERY_REQUEST = True
 
+# ─── Notificaciones en vivo (SSE) ─────────────────────────────────────────────
+# El stream solo se mantiene abierto bajo ASGI (ver start.sh, SERVER_MODE=asgi)
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = int(os.getenv('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '20'))
+NOTIFICATION_STREAM_POLL_SECONDS = int(os.getenv('NOTIFICATION_STREAM_POLL_SECONDS', '3'))
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv('NOTIFICATION_STREAM_QUEUE_SIZE', '50'))
+NOTIFICATION_STREAM_RETRY_MS = 5000
+NOTIFICATION_STREAM_WSGI_RETRY_MS = 30000
+
+# ─── Presupuesto de consultas por vista ──────────────────────────────────────
+# Las vistas declaran su máximo con @query_budget; el middleware avisa en el
+# log al superarlo. Server-Timing expone el conteo al navegador (solo debug).
+QUERY_BUDGET_ENABLED = os.getenv('QUERY_BUDGET_ENABLED', 'True') == 'True'
+QUERY_BUDGET_SERVER_TIMING = os.getenv('QUERY_BUDGET_SERVER_TIMING', str(DEBUG)) == 'True'
+
+# ─── Cola de generación de simuladores ───────────────────────────────────────
+# Worker: python manage.py run_generation_worker (SERVER_MODE=worker en start.sh)
+SIMULATOR_WORKER_CONCURRENCY = int(os.getenv('SIMULATOR_WORKER_CONCURRENCY', '2'))
+# Límite blando: se cuenta antes de tomar el trabajo (services.claim_next_job)
+SIMULATOR_GENERATION_MAX_RUNNING = int(os.getenv('SIMULATOR_GENERATION_MAX_RUNNING', '4'))
+SIMULATOR_JOB_STALE_SECONDS = int(os.getenv('SIMULATOR_JOB_STALE_SECONDS', '600'))
+SIMULATOR_JOB_MAX_TRIES = 3
+# Refuerzos: espera en cola para juntar pedidos con los mismos temas débiles
+# y máximo de estudiantes resueltos con una sola llamada al LLM
+SIMULATOR_REINFORCEMENT_BATCH_WINDOW_SECONDS = int(os.getenv('SIMULATOR_REINFORCEMENT_BATCH_WINDOW_SECONDS', '30'))
+SIMULATOR_REINFORCEMENT_BATCH_MAX = int(os.getenv('SIMULATOR_REINFORCEMENT_BATCH_MAX', '20'))
+
+# Caché de respuestas del LLM (tabla LLMResponseCache, compartida web/worker)
+SIMULATOR_LLM_CACHE_ENABLED = os.getenv('SIMULATOR_LLM_CACHE_ENABLED', 'True') == 'True'
+SIMULATOR_LLM_CACHE_TTL_HOURS = int(os.getenv('SIMULATOR_LLM_CACHE_TTL_HOURS', '168'))
+SIMULATOR_LLM_CACHE_MAX_ENTRIES = int(os.getenv('SIMULATOR_LLM_CACHE_MAX_ENTRIES', '500'))
+
+# Streaming: cada pregunta se guarda apenas llega; una respuesta cortada se
+# publica si trae al menos SIMULATOR_STREAM_MIN_QUESTIONS preguntas válidas
+# (diagnósticos; un refuerzo usa ai_generator.REINFORCEMENT_MIN_QUESTIONS)
+SIMULATOR_LLM_STREAMING = os.getenv('SIMULATOR_LLM_STREAMING', 'False') == 'True'
+SIMULATOR_STREAM_MIN_QUESTIONS = int(os.getenv('SIMULATOR_STREAM_MIN_QUESTIONS', '20'))
+
+# Respuesta completa: las preguntas inválidas o repetidas se descartan y se
+# piden solo las que faltan, en hasta SIMULATOR_LLM_TOP_UP_ROUNDS llamadas
+SIMULATOR_LLM_TOP_UP_ROUNDS = int(os.getenv('SIMULATOR_LLM_TOP_UP_ROUNDS', '1'))
+
+# Proveedor de LLM: 'deepseek', 'openai' (cualquier endpoint compatible, con
+# OPENAI_BASE_URL/OPENAI_API_KEY/OPENAI_MODEL) o 'stub' (local, para pruebas
+# de carga). Cada llamada queda registrada en AIProviderCall.
+SIMULATOR_AI_PROVIDER = os.getenv('SIMULATOR_AI_PROVIDER', 'deepseek')
+SIMULATOR_AI_MAX_CONCURRENT_CALLS = int(os.getenv('SIMULATOR_AI_MAX_CONCURRENT_CALLS', '4'))
+SIMULATOR_AI_SLOT_TIMEOUT_SECONDS = int(os.getenv('SIMULATOR_AI_SLOT_TIMEOUT_SECONDS', '300'))
+SIMULATOR_AI_INPUT_COST_PER_MTOK = float(os.getenv('SIMULATOR_AI_INPUT_COST_PER_MTOK', '0.27'))
+SIMULATOR_AI_OUTPUT_COST_PER_MTOK = float(os.getenv('SIMULATOR_AI_OUTPUT_COST_PER_MTOK', '1.10'))
+SIMULATOR_AI_STUB_LATENCY_MS = int(os.getenv('SIMULATOR_AI_STUB_LATENCY_MS', '0'))
+SIMULATOR_AI_STUB_QUESTIONS = int(os.getenv('SIMULATOR_AI_STUB_QUESTIONS', '50'))
+
+# Preguntas compiladas de cada simulador (caché de Django, versionada)
+SIMULATOR_PAYLOAD_CACHE_SECONDS = int(os.getenv('SIMULATOR_PAYLOAD_CACHE_SECONDS', '86400'))
+
+# Análisis de ítems (manage.py compute_item_stats): respuestas mínimas para
+# marcar una pregunta como fácil, difícil o defectuosa
+SIMULATOR_ITEM_MIN_RESPONSES = int(os.getenv('SIMULATOR_ITEM_MIN_RESPONSES', '20'))
+
+# Intentos adaptativos: se detienen con el error estándar de la habilidad
+# estimada por debajo de TARGET_SE (tras MIN preguntas) o al llegar a MAX
+SIMULATOR_ADAPTIVE_MIN_QUESTIONS = int(os.getenv('SIMULATOR_ADAPTIVE_MIN_QUESTIONS', '8'))
+SIMULATOR_ADAPTIVE_MAX_QUESTIONS = int(os.getenv('SIMULATOR_ADAPTIVE_MAX_QUESTIONS', '20'))
+SIMULATOR_ADAPTIVE_TARGET_SE = float(os.getenv('SIMULATOR_ADAPTIVE_TARGET_SE', '0.5'))
+
+# Compactación (manage.py compact_responses): los intentos completados hace más
+# de estas horas guardan sus respuestas en una sola fila (PackedResponses)
+SIMULATOR_COMPACT_RESPONSES_AFTER_HOURS = int(os.getenv('SIMULATOR_COMPACT_RESPONSES_AFTER_HOURS', '72'))
+
+# Banco de preguntas: las de simulacros aprobados se reutilizan por materia y
+# tema; el LLM solo genera los temas débiles que el banco no cubre
+SIMULATOR_BANK_ENABLED = os.getenv('SIMULATOR_BANK_ENABLED', 'True') == 'True'
+SIMULATOR_BANK_PER_TOPIC = int(os.getenv('SIMULATOR_BANK_PER_TOPIC', '2'))
+SIMULATOR_BANK_DUPLICATE_THRESHOLD = float(os.getenv('SIMULATOR_BANK_DUPLICATE_THRESHOLD', '0.8'))
+
+# Extracción de texto de materiales (PDF/DOCX/TXT), la hace el mismo worker
+MATERIAL_EXTRACTION_PROCESSES = int(os.getenv('MATERIAL_EXTRACTION_PROCESSES', '2'))
+MATERIAL_EXTRACTION_MAX_PAGES = int(os.getenv('MATERIAL_EXTRACTION_MAX_PAGES', '100'))
+MATERIAL_EXTRACTION_MAX_CHARS = 200000
+MATERIAL_EXTRACTION_TIMEOUT = 120
+
 # ─── Email ───────────────────────────────────────────────────────────────────
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'